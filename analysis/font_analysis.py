@@ -12,9 +12,10 @@ Subcommands:
   compare                      Compare widths between two fonts
   ranges                       Analyze widths by Unicode ranges
   symbols                      Analyze symbol-category widths
-  mismatch                     Report glyphs that match a width pattern
+  mismatch                     Report glyphs that match a width pattern (or differ from width_policy)
   diagnose                     Diagnose a single font (basic info, widths)
   check-ranges                 Compare M+/Yasashisa widths for specific Unicode ranges (excludes Ubuntu chars)
+  batch                        Run a script of subcommands against one set of loaded fonts
 
 Examples:
   fontforge -lang=py -script analysis/font_analysis.py list-fonts
@@ -23,12 +24,18 @@ Examples:
   fontforge -lang=py -script analysis/font_analysis.py ranges --fonts mplus,ubuntu --ranges ひらがな,カタカナ --max-samples 5
   fontforge -lang=py -script analysis/font_analysis.py symbols --fonts mplus,ubuntu,yasashisa --categories 幾何図形,矢印 --brief
   fontforge -lang=py -script analysis/font_analysis.py mismatch --base mplus --target utatane --pattern 500 1000 --format markdown
+  fontforge -lang=py -script analysis/font_analysis.py mismatch --target utatane --against-policy --format csv
   fontforge -lang=py -script analysis/font_analysis.py diagnose --font NotoSansMonoCJKjp-VF --max-samples 20
   fontforge -lang=py -script analysis/font_analysis.py check-ranges --ranges Control,Currency --show-chars --show-details
+  fontforge -lang=py -script analysis/font_analysis.py batch jobs.txt --output-dir tmp/batch
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
+import contextlib
+import os
+import shlex
 import sys
+import traceback
 
 try:
     import argparse
@@ -41,12 +48,37 @@ except Exception:
 # Shared utils
 from font_analysis_utils import (
     create_analyzer_with_error_handling,
+    resolve_font_paths,
     ReportGenerator,
     FontAnalyzer,
     list_available_fonts,
 )
 
 
+def open_analyzer(args, font_selection: List[str]) -> Optional[FontAnalyzer]:
+    """サブコマンド用のFontAnalyzerを取得
+
+    batch実行中は共有のFontAnalyzerに必要なフォントだけ追加で読み込み、
+    それ以外は従来どおり都度作成する。
+    """
+    shared = getattr(args, "shared_analyzer", None)
+    if shared is None:
+        return create_analyzer_with_error_handling(font_selection)
+
+    paths = resolve_font_paths(font_selection)
+    if paths is None:
+        return None
+    for name, path in paths.items():
+        shared.load_font(name, path)
+    return shared
+
+
+def release_analyzer(args, analyzer: FontAnalyzer):
+    """open_analyzer()で取得したFontAnalyzerを解放（共有分は閉じない）"""
+    if analyzer is not getattr(args, "shared_analyzer", None):
+        analyzer.close_fonts()
+
+
 def cmd_list_fonts(_args):
     list_available_fonts()
 
@@ -55,7 +87,7 @@ def cmd_info(args):
     font_name = args.font
     show_samples = args.samples
 
-    analyzer = create_analyzer_with_error_handling([font_name])
+    analyzer = open_analyzer(args, [font_name])
     if not analyzer:
         return 1
 
@@ -119,7 +151,7 @@ def cmd_info(args):
                 if len(hira_u) > 1:
                     print(f"  ひらがな幅のばらつき: {hira_u}")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
 
 
 def cmd_compare(args):
@@ -128,7 +160,7 @@ def cmd_compare(args):
     names = args.names
     max_display = args.max_display
 
-    analyzer = create_analyzer_with_error_handling([base, target])
+    analyzer = open_analyzer(args, [base, target])
     if not analyzer:
         return 1
 
@@ -177,7 +209,7 @@ def cmd_compare(args):
         for rn, items in breakdown.items():
             print(f"{rn}: {len(items)}件")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
 
 
 def cmd_ranges(args):
@@ -186,7 +218,7 @@ def cmd_ranges(args):
     show_samples = not args.no_samples
     max_samples = args.max_samples
 
-    analyzer = create_analyzer_with_error_handling(fonts)
+    analyzer = open_analyzer(args, fonts)
     if not analyzer:
         return 1
 
@@ -233,7 +265,7 @@ def cmd_ranges(args):
         else:
             print("分析対象なし")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
 
 
 def cmd_symbols(args):
@@ -241,7 +273,7 @@ def cmd_symbols(args):
     categories = args.categories.split(",") if args.categories else None
     brief = args.brief
 
-    analyzer = create_analyzer_with_error_handling(fonts)
+    analyzer = open_analyzer(args, fonts)
     if not analyzer:
         return 1
 
@@ -287,17 +319,75 @@ def cmd_symbols(args):
             if mism:
                 print(f"  → {mism}件の幅不統一を発見")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
+
+
+def load_width_policy():
+    """ビルドと同じ文字幅の方針表（リポジトリ直下の width_policy.py）"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import width_policy
+    return width_policy.default_policy()
+
+
+def cmd_mismatch_policy(args):
+    """ビルドの文字幅の方針（width_policy）と送り幅が違うグリフを報告"""
+    target = args.target
+    fmt = args.format
+
+    analyzer = open_analyzer(args, [target])
+    if not analyzer:
+        return 1
+
+    try:
+        policy = load_width_policy()
+        half = analyzer.get_font_info(target)["em_square"] // 2
+
+        hits = []
+        for code in sorted(analyzer.get_glyph_set(target)):
+            cells, source = policy.decide(code)
+            width = analyzer.get_glyph_width(target, code)
+            if cells is not None and width != cells * half:
+                hits.append((code, cells, source, width))
+
+        if fmt == "csv":
+            print("Unicode,Character,Name,EastAsianWidth,Wcwidth,PolicyWidth,Source,TargetWidth")
+        if fmt == "markdown":
+            print(f"## 文字幅の方針と異なるグリフ一覧（{len(hits)}件, Unicode {policy.unicode_version}）")
+            print()
+
+        for code, cells, source, width in hits:
+            ch = FontAnalyzer._format_char(code)
+            name = get_unicode_name(code)
+            eaw = policy.east_asian_width(code)
+            expected = cells * half
+            if fmt == "csv":
+                def esc(s: str) -> str:
+                    return s.replace(",", "\\,")
+                print(f"U+{code:04X},{esc(ch)},{esc(name)},{eaw},{policy.wcwidth(code)},{expected},{source},{width}")
+            elif fmt == "text":
+                print(f"U+{code:04X} '{ch}' {name} [{eaw}/{source}] {expected}->{width}")
+            else:
+                print(f"- U+{code:04X} '{ch}' {name} (EAW {eaw}, {source}: {expected} → {width})")
+
+        if fmt == "markdown" and not hits:
+            print("方針と異なるグリフはありませんでした。")
+    finally:
+        release_analyzer(args, analyzer)
 
 
 def cmd_mismatch(args):
+    if args.against_policy:
+        return cmd_mismatch_policy(args)
+
     base = args.base
     target = args.target
     bw = args.pattern[0]
     tw = args.pattern[1]
     fmt = args.format
 
-    analyzer = create_analyzer_with_error_handling([base, target])
+    analyzer = open_analyzer(args, [base, target])
     if not analyzer:
         return 1
 
@@ -338,7 +428,7 @@ def cmd_mismatch(args):
         if fmt == "markdown" and not hits:
             print("一致するグリフはありませんでした。")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
 
 
 def cmd_diagnose(args):
@@ -346,7 +436,7 @@ def cmd_diagnose(args):
     show_samples = not args.no_samples
     max_samples = args.max_samples
 
-    analyzer = create_analyzer_with_error_handling([font_name])
+    analyzer = open_analyzer(args, [font_name])
     if not analyzer:
         return 1
 
@@ -387,7 +477,7 @@ def cmd_diagnose(args):
         for w, c in sorted(widths.items(), key=lambda x: -x[1])[:10]:
             print(f"  幅{w}: {c}件")
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
 
 def cmd_check_ranges(args):
     """指定したUnicode範囲でUbuntu、M+、やさしさゴシックの存在文字と幅を比較"""
@@ -409,7 +499,7 @@ def cmd_check_ranges(args):
         target_ranges = {k: v for k, v in target_ranges.items() if any(sr in k for sr in selected_ranges)}
     
     fonts = ["ubuntu", "mplus", "yasashisa"]
-    analyzer = create_analyzer_with_error_handling(fonts)
+    analyzer = open_analyzer(args, fonts)
     if not analyzer:
         return 1
         
@@ -536,11 +626,97 @@ def cmd_check_ranges(args):
                           f"やさしさ={candidate['yasashisa_width']} ({candidate['range']})")
         
     finally:
-        analyzer.close_fonts()
+        release_analyzer(args, analyzer)
     
     return 0
 
 
+def parse_batch_line(line: str):
+    """batchスクリプトの1行を (argv, 出力先) に分解する
+
+    書式: `<subcommand> [options] [> output.txt]`（`#` 以降はコメント）
+    """
+    tokens = shlex.split(line, comments=True)
+    if not tokens:
+        return None, None
+    output = None
+    if ">" in tokens:
+        pos = tokens.index(">")
+        if pos + 1 < len(tokens):
+            output = tokens[pos + 1]
+        tokens = tokens[:pos]
+    return tokens, output
+
+
+def cmd_batch(args):
+    """サブコマンドのスクリプトを1回のフォント読み込みで連続実行する"""
+    if args.script == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.script, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    parser = build_parser()
+    analyzer = FontAnalyzer({})
+    worst = 0
+    jobs = 0
+    try:
+        for lineno, line in enumerate(lines, 1):
+            try:
+                argv, output = parse_batch_line(line)
+            except ValueError as e:
+                print(f"✗ {lineno}行目: 行を解釈できません: {e}")
+                worst = max(worst, 2)
+                continue
+            if not argv:
+                continue
+            if argv[0] == "batch":
+                print(f"✗ {lineno}行目: batchは入れ子にできません")
+                worst = max(worst, 2)
+                continue
+
+            try:
+                job_args = parser.parse_args(argv)
+            except SystemExit:
+                print(f"✗ {lineno}行目: 引数を解釈できません: {line.strip()}")
+                worst = max(worst, 2)
+                continue
+            if not hasattr(job_args, "func"):
+                continue
+
+            jobs += 1
+            if output is None:
+                output = f"{jobs:02d}_{argv[0]}.txt"
+            if not os.path.isabs(output):
+                output = os.path.join(args.output_dir, output)
+            out_dir = os.path.dirname(output)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+
+            job_args.shared_analyzer = analyzer
+            error = None
+            with open(output, "w", encoding="utf-8") as out, contextlib.redirect_stdout(out):
+                try:
+                    rc = job_args.func(job_args) or 0
+                except Exception as e:
+                    # 1件の失敗で残りのジョブを止めない（詳細は出力ファイルに残す）
+                    traceback.print_exc(file=out)
+                    error = e
+                    rc = 1
+            worst = max(worst, rc)
+            status = "✓" if rc == 0 else "✗"
+            print(f"{status} [{jobs}] {' '.join(argv)} -> {output}")
+            if error is not None:
+                print(f"  {lineno}行目: {type(error).__name__}: {error}")
+    finally:
+        loaded = len(analyzer.fonts)
+        analyzer.close_fonts()
+
+    print(f"\n{jobs}件のサブコマンドを実行（フォント読み込み: {loaded}件）")
+    return worst
+
+
 # Helpers
 
 def get_unicode_name(code: int) -> str:
@@ -650,6 +826,8 @@ def build_parser():
     s.add_argument("--target", default="utatane")
     s.add_argument("--pattern", nargs=2, type=int, default=[500, 1000])
     s.add_argument("--format", choices=["markdown", "text", "csv"], default="markdown")
+    s.add_argument("--against-policy", action="store_true",
+                   help="--base/--pattern の代わりにビルドの文字幅の方針（width_policy.py）と比較")
     s.set_defaults(func=cmd_mismatch)
 
     s = sub.add_parser("diagnose", help="フォント診断")
@@ -665,6 +843,11 @@ def build_parser():
     s.add_argument("--max-chars", type=int, default=50, help="文字表示の最大数")
     s.set_defaults(func=cmd_check_ranges)
 
+    s = sub.add_parser("batch", help="サブコマンドのスクリプトをフォント読み込み1回で一括実行")
+    s.add_argument("script", nargs="?", default="-", help="1行1サブコマンドのスクリプト（省略時・'-'は標準入力）")
+    s.add_argument("--output-dir", default="tmp/batch", help="各サブコマンドの出力先ディレクトリ")
+    s.set_defaults(func=cmd_batch)
+
     return p
 
 
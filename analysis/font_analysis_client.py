@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thin client for font_analysis_server.py
+
+FontForge不要。通常のPythonで実行できる。
+
+Examples:
+  python analysis/font_analysis_client.py width U+2400 U+20A9 --fonts mplus,utatane
+  python analysis/font_analysis_client.py presence ─ │ --fonts mplus,yasashisa
+  python analysis/font_analysis_client.py provenance U+2500 U+3042
+  python analysis/font_analysis_client.py mismatch --base mplus --target utatane --pattern 500 1000
+  python analysis/font_analysis_client.py --socket tmp/analysis.sock fonts
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import sys
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlparse
+
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """Unixソケット経由のHTTP接続"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class AnalysisClient:
+    """解析サーバへの問い合わせ（接続は使い回す）"""
+
+    def __init__(self, url: str = DEFAULT_URL, socket_path: Optional[str] = None, timeout: float = 30.0):
+        if socket_path:
+            self.conn = UnixHTTPConnection(socket_path, timeout=timeout)
+        else:
+            parsed = urlparse(url)
+            self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+
+    def query(self, endpoint: str, **params) -> Dict:
+        params = {k: v for k, v in params.items() if v is not None}
+        path = f"/{endpoint}"
+        if params:
+            path += "?" + urlencode(params)
+        self.conn.request("GET", path)
+        res = self.conn.getresponse()
+        body = json.loads(res.read().decode("utf-8"))
+        if res.status != 200:
+            raise RuntimeError(body.get("error", f"HTTP {res.status}"))
+        return body
+
+    def width(self, codes, fonts) -> Dict:
+        return self.query("width", codes=",".join(codes), fonts=",".join(fonts))
+
+    def presence(self, codes, fonts) -> Dict:
+        return self.query("presence", codes=",".join(codes), fonts=",".join(fonts))
+
+    def provenance(self, codes) -> Dict:
+        return self.query("provenance", codes=",".join(codes))
+
+    def mismatch(self, base: str, target: str, pattern) -> Dict:
+        return self.query("mismatch", base=base, target=target, pattern=",".join(str(w) for w in pattern))
+
+    def close(self):
+        self.conn.close()
+
+
+def format_codes(codes):
+    """1文字指定をそのまま渡せるよう U+XXXX 形式に揃える"""
+    return [f"U+{ord(c):04X}" if len(c) == 1 else c for c in codes]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Utatane Font Analysis Client")
+    p.add_argument("--url", default=DEFAULT_URL, help="サーバURL")
+    p.add_argument("--socket", help="Unixソケットのパス")
+    sub = p.add_subparsers(dest="cmd")
+
+    sub.add_parser("fonts", help="読み込み済みフォント一覧")
+
+    for name in ("width", "presence"):
+        s = sub.add_parser(name)
+        s.add_argument("codes", nargs="+", help="U+XXXX または文字")
+        s.add_argument("--fonts", default="utatane", help="カンマ区切りフォント")
+
+    s = sub.add_parser("provenance", help="Utataneグリフの由来フォント")
+    s.add_argument("codes", nargs="+", help="U+XXXX または文字")
+
+    s = sub.add_parser("mismatch", help="幅パターンの不一致")
+    s.add_argument("--base", default="mplus")
+    s.add_argument("--target", default="utatane")
+    s.add_argument("--pattern", nargs=2, type=int, default=[500, 1000])
+
+    s = sub.add_parser("reload", help="フォントを開き直す")
+    s.add_argument("--fonts", default=None, help="カンマ区切りフォント（省略時は全フォント）")
+
+    args = p.parse_args()
+    if not args.cmd:
+        p.print_help()
+        return 2
+
+    client = AnalysisClient(args.url, args.socket)
+    try:
+        if args.cmd == "fonts":
+            result = client.query("fonts")
+        elif args.cmd == "width":
+            result = client.width(format_codes(args.codes), args.fonts.split(","))
+        elif args.cmd == "presence":
+            result = client.presence(format_codes(args.codes), args.fonts.split(","))
+        elif args.cmd == "provenance":
+            result = client.provenance(format_codes(args.codes))
+        elif args.cmd == "mismatch":
+            result = client.mismatch(args.base, args.target, args.pattern)
+        else:
+            result = client.query("reload", fonts=args.fonts)
+    except (OSError, RuntimeError) as e:
+        print(f"エラー: {e}")
+        return 1
+    finally:
+        client.close()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
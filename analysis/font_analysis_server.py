@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local analysis server for the Utatane project
+
+FontAnalyzer を常駐させ、幅・存在・由来・不一致の問い合わせに JSON で応答する。
+フォントは初回の問い合わせ時（または --preload 指定時）に読み込み、
+走査結果は FontAnalyzer のキャッシュに保持されるため、2回目以降は辞書引きのみで応答する。
+
+Run with FontForge Python:
+  fontforge -lang=py -script analysis/font_analysis_server.py [--port 8765 | --socket PATH] [--preload mplus,utatane]
+
+Endpoints (GET, クエリ文字列で指定):
+  /fonts                                   読み込み済みフォントの基本情報
+  /width?fonts=mplus,utatane&codes=U+2400,U+20A9
+  /presence?fonts=mplus,utatane&codes=U+2400
+  /provenance?codes=U+2400,U+2500          Utataneのグリフがどの元フォント由来か（utatane.pyの処理順を再現）
+  /mismatch?base=mplus&target=utatane&pattern=500,1000
+  /reload?fonts=utatane                    フォントを開き直してキャッシュを破棄
+
+Client:
+  python analysis/font_analysis_client.py width U+2400 U+20A9 --fonts mplus,utatane
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from font_analysis_utils import FontAnalyzer, resolve_font_paths
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# 由来判定に使う元フォント（Regular）
+PROVENANCE_FONTS = {
+    "latin": "ubuntu",
+    "mplus": "mplus",
+    "japanese": "yasashisa",
+}
+
+# utatane.py でM+へ置き換えている範囲を再現
+# （罫線素片・ブロック要素・ローマ数字・矢印・特殊句読点）
+MPLUS_REPLACED_CODES = (
+    set(range(0x2500, 0x257F + 1)) |
+    set(range(0x2580, 0x259F + 1)) |
+    set(range(0x2160, 0x2188 + 1)) |
+    set(range(0x2190, 0x21FF + 1)) |
+    {0x2010, 0x2015}
+)
+
+
+class AnalysisError(Exception):
+    """問い合わせ内容の誤り（HTTP 400 で返す）"""
+
+
+def parse_code(text: str) -> int:
+    """U+XXXX / 0xXXXX / XXXX / 1文字 をコードポイントに変換"""
+    text = text.strip()
+    if len(text) == 1:
+        return ord(text)
+    if text[:2].upper() in ("U+", "0X"):
+        text = text[2:]
+    try:
+        code = int(text, 16)
+    except ValueError:
+        raise AnalysisError(f"不正なコード指定: {text}")
+    if not 0 <= code <= 0x10FFFF:
+        raise AnalysisError(f"コードポイントの範囲外です: {text}")
+    return code
+
+
+def split_list(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [v for v in value.split(",") if v]
+
+
+class AnalysisService:
+    """FontAnalyzer を保持して問い合わせを処理する"""
+
+    def __init__(self):
+        self.analyzer = FontAnalyzer({})
+
+    def ensure_fonts(self, names: List[str]) -> List[str]:
+        """フォントキー（またはパス）を読み込み済みにする"""
+        for name in names:
+            if name in self.analyzer.fonts:
+                continue
+            if os.path.isfile(name):
+                self.analyzer.load_font(name, name)
+                continue
+            paths = resolve_font_paths([name])
+            if paths is None:
+                raise AnalysisError(f"フォント '{name}' が見つかりません")
+            self.analyzer.load_font(name, paths[name])
+        return names
+
+    def fonts(self, _query) -> Dict:
+        return {name: self.analyzer.get_font_info(name) for name in self.analyzer.fonts}
+
+    def width(self, query) -> Dict:
+        fonts = self.ensure_fonts(split_list(query.get("fonts")) or ["utatane"])
+        codes = [parse_code(c) for c in split_list(query.get("codes"))]
+        return {
+            f"U+{code:04X}": {fn: self.analyzer.get_glyph_width(fn, code) for fn in fonts}
+            for code in codes
+        }
+
+    def presence(self, query) -> Dict:
+        fonts = self.ensure_fonts(split_list(query.get("fonts")) or ["utatane"])
+        codes = [parse_code(c) for c in split_list(query.get("codes"))]
+        glyph_sets = {fn: self.analyzer.get_glyph_set(fn) for fn in fonts}
+        return {
+            f"U+{code:04X}": {fn: code in glyph_sets[fn] for fn in fonts}
+            for code in codes
+        }
+
+    def provenance(self, query) -> Dict:
+        codes = [parse_code(c) for c in split_list(query.get("codes"))]
+        self.ensure_fonts(list(PROVENANCE_FONTS.values()))
+        latin = self.analyzer.get_glyph_set(PROVENANCE_FONTS["latin"])
+        mplus = self.analyzer.get_glyph_set(PROVENANCE_FONTS["mplus"])
+        japanese = self.analyzer.get_glyph_set(PROVENANCE_FONTS["japanese"])
+
+        results = {}
+        for code in codes:
+            # mergeFonts は先にマージした英字フォントを優先する
+            if code in latin:
+                source = PROVENANCE_FONTS["latin"]
+            elif code in MPLUS_REPLACED_CODES and code in mplus:
+                source = PROVENANCE_FONTS["mplus"]
+            elif code in japanese:
+                source = PROVENANCE_FONTS["japanese"]
+            else:
+                source = None
+            results[f"U+{code:04X}"] = source
+        return results
+
+    def mismatch(self, query) -> Dict:
+        base = query.get("base", "mplus")
+        target = query.get("target", "utatane")
+        try:
+            pattern = [int(w) for w in split_list(query.get("pattern"))] or [500, 1000]
+        except ValueError:
+            raise AnalysisError(f"pattern は整数で指定してください: {query.get('pattern')}")
+        if len(pattern) != 2:
+            raise AnalysisError("pattern は 'base幅,target幅' で指定してください")
+        self.ensure_fonts([base, target])
+
+        common = self.analyzer.get_glyph_set(base) & self.analyzer.get_glyph_set(target)
+        hits = [
+            f"U+{code:04X}" for code in sorted(common)
+            if self.analyzer.get_glyph_width(base, code) == pattern[0]
+            and self.analyzer.get_glyph_width(target, code) == pattern[1]
+        ]
+        return {"base": base, "target": target, "pattern": pattern, "count": len(hits), "codes": hits}
+
+    def reload(self, query) -> Dict:
+        names = split_list(query.get("fonts")) or list(self.analyzer.fonts)
+        for name in names:
+            self.analyzer.reload_font(name)
+        return {"reloaded": names}
+
+    def close(self):
+        self.analyzer.close_fonts()
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """GET /<endpoint>?... を AnalysisService のメソッドへ振り分ける"""
+
+    endpoints = ("fonts", "width", "presence", "provenance", "mismatch", "reload")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.strip("/")
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        start = time.perf_counter()
+        if endpoint not in self.endpoints:
+            status, body = 404, {"error": f"不明なエンドポイント: /{endpoint}"}
+        else:
+            try:
+                status, body = 200, getattr(self.server.service, endpoint)(query)
+            except AnalysisError as e:
+                status, body = 400, {"error": str(e)}
+            except (ValueError, KeyError) as e:
+                # 指定された値から起きた誤り（不明なフォント名など）。サーバーの不具合とは分ける
+                status, body = 400, {"error": f"{type(e).__name__}: {e}"}
+            except Exception as e:
+                status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-Elapsed-Ms", f"{elapsed_ms:.3f}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self):
+        # Unixソケットでは client_address が空文字になる
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.UnixStreamServer):
+    """Unixソケット版のHTTPサーバ（FontForgeはスレッド非対応なので逐次処理）"""
+
+
+def create_server(args, service: AnalysisService):
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, AnalysisRequestHandler)
+        address = f"unix:{args.socket}"
+    else:
+        server = HTTPServer((args.host, args.port), AnalysisRequestHandler)
+        address = f"http://{args.host}:{args.port}"
+    server.service = service
+    server.verbose = args.verbose
+    return server, address
+
+
+def main():
+    p = argparse.ArgumentParser(description="Utatane Font Analysis Server")
+    p.add_argument("--host", default=DEFAULT_HOST, help="待ち受けホスト（localhost推奨）")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--socket", help="Unixソケットのパス（指定時はTCPを使わない）")
+    p.add_argument("--preload", help="起動時に読み込んで走査しておくフォント（カンマ区切り）")
+    p.add_argument("--verbose", action="store_true", help="リクエストログを表示")
+    args = p.parse_args(sys.argv[1:])
+
+    service = AnalysisService()
+    try:
+        for name in service.ensure_fonts(split_list(args.preload)):
+            service.analyzer.get_glyph_set(name)
+
+        server, address = create_server(args, service)
+        print(f"解析サーバを起動しました: {address}  (Ctrl+Cで終了)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n解析サーバを終了します")
+        finally:
+            server.server_close()
+            if args.socket and os.path.exists(args.socket):
+                os.remove(args.socket)
+    except AnalysisError as e:
+        print(f"✗ {e}")
+        return 1
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,9 @@ FontForgeベースのフォント分析用共通ユーティリティ関数群
 
 import sys
 import os
-from typing import Dict, List, Tuple, Optional, Any, Set, Union
+from typing import Dict, List, Tuple, Optional, Any, Set, FrozenSet, Union
+
+from font_catalog import get_catalog
 
 try:
     import fontforge
@@ -26,20 +28,58 @@ class FontAnalyzer:
         Args:
             font_paths: フォント名とパスの辞書 {"name": "path/to/font.ttf"}
         """
-        self.font_paths = font_paths
+        self.font_paths = dict(font_paths)
         self.fonts = {}
+        # フォント全体を走査した結果のキャッシュ（フォント名ごと）
+        #   _worth_cache: 出力対象グリフの {encoding: width}
+        #   _glyph_set_cache: 出力対象グリフのエンコーディング集合
+        #   _info_cache: get_font_info() の結果
+        self._worth_cache: Dict[str, Dict[int, int]] = {}
+        self._glyph_set_cache: Dict[str, FrozenSet[int]] = {}
+        self._info_cache: Dict[str, Dict[str, Any]] = {}
         self._load_fonts()
     
     def _load_fonts(self):
         """フォントファイルを読み込む"""
         for name, path in self.font_paths.items():
-            try:
-                self.fonts[name] = fontforge.open(path)
-                print(f"✓ {name}フォントを読み込みました: {path}")
-            except Exception as e:
-                print(f"✗ {name}フォントの読み込みに失敗: {path}")
-                print(f"  エラー: {e}")
-                raise
+            self._open_font(name, path)
+    
+    def _open_font(self, name: str, path: str):
+        """1フォントを読み込む（キャッシュは破棄する）"""
+        try:
+            self.fonts[name] = fontforge.open(path)
+            self.invalidate_cache(name)
+            print(f"✓ {name}フォントを読み込みました: {path}")
+        except Exception as e:
+            print(f"✗ {name}フォントの読み込みに失敗: {path}")
+            print(f"  エラー: {e}")
+            raise
+    
+    def load_font(self, name: str, path: str):
+        """フォントを追加で読み込む（読み込み済みなら何もしない）"""
+        if name in self.fonts and self.font_paths.get(name) == path:
+            return
+        if name in self.fonts:
+            self.fonts[name].close()
+        self.font_paths[name] = path
+        self._open_font(name, path)
+    
+    def reload_font(self, name: str):
+        """フォントを開き直す（ファイル更新後に使用）"""
+        if name not in self.font_paths:
+            raise ValueError(f"フォント '{name}' が見つかりません")
+        if name in self.fonts:
+            self.fonts[name].close()
+        self._open_font(name, self.font_paths[name])
+    
+    def invalidate_cache(self, font_name: Optional[str] = None):
+        """走査結果のキャッシュを破棄する（font_name省略時は全フォント）"""
+        caches = (self._worth_cache, self._glyph_set_cache, self._info_cache)
+        for cache in caches:
+            if font_name is None:
+                cache.clear()
+            else:
+                cache.pop(font_name, None)
     
     def close_fonts(self):
         """開いているフォントをすべて閉じる"""
@@ -47,38 +87,51 @@ class FontAnalyzer:
             if font:
                 font.close()
         self.fonts.clear()
+        self.invalidate_cache()
     
-    def get_font_info(self, font_name: str) -> Dict[str, Any]:
-        """フォントの基本情報を取得"""
+    def _get_font(self, font_name: str):
         if font_name not in self.fonts:
             raise ValueError(f"フォント '{font_name}' が見つかりません")
+        return self.fonts[font_name]
+    
+    def _scan_font(self, font_name: str) -> Dict[int, int]:
+        """フォント全体を1回だけ走査し、出力対象グリフの幅を記録する"""
+        if font_name in self._worth_cache:
+            return self._worth_cache[font_name]
         
-        font = self.fonts[font_name]
-        return {
+        font = self._get_font(font_name)
+        worth = {}
+        worth_count = 0
+        for g in font.glyphs():
+            if g.isWorthOutputting:
+                worth_count += 1
+                if g.encoding >= 0:
+                    worth[g.encoding] = g.width
+        
+        self._worth_cache[font_name] = worth
+        self._glyph_set_cache[font_name] = frozenset(worth)
+        self._info_cache[font_name] = {
             'path': self.font_paths[font_name],
             'em_square': font.em,
             'ascent': font.ascent,
             'descent': font.descent,
-            'glyph_count': len([g for g in font.glyphs() if g.isWorthOutputting])
+            'glyph_count': worth_count
         }
+        return worth
     
-    def get_glyph_set(self, font_name: str) -> Set[int]:
-        """フォント内のグリフのエンコーディング一覧を取得"""
-        if font_name not in self.fonts:
-            raise ValueError(f"フォント '{font_name}' が見つかりません")
-        
-        font = self.fonts[font_name]
-        return {g.encoding for g in font.glyphs() if g.isWorthOutputting and g.encoding >= 0}
+    def get_font_info(self, font_name: str) -> Dict[str, Any]:
+        """フォントの基本情報を取得"""
+        self._scan_font(font_name)
+        return dict(self._info_cache[font_name])
+    
+    def get_glyph_set(self, font_name: str) -> FrozenSet[int]:
+        """フォント内のグリフのエンコーディング一覧を取得（変更不可の共有集合）"""
+        self._scan_font(font_name)
+        return self._glyph_set_cache[font_name]
     
     def get_glyph_width(self, font_name: str, char_code: int) -> Optional[int]:
         """指定した文字コードの幅を取得"""
-        if font_name not in self.fonts:
-            raise ValueError(f"フォント '{font_name}' が見つかりません")
-        
-        font = self.fonts[font_name]
-        if char_code in font and font[char_code].isWorthOutputting:
-            return font[char_code].width
-        return None
+        return self._scan_font(font_name).get(char_code)
     
     def compare_widths(self, char_codes: List[int], font_names: List[str] = None) -> List[Dict]:
         """複数フォント間で文字幅を比較"""
@@ -115,7 +168,8 @@ class FontAnalyzer:
             font_names = list(self.fonts.keys())
         
         # 共通のグリフを取得
-        common_glyphs = set.intersection(*[self.get_glyph_set(name) for name in font_names])
+        glyph_sets = [self.get_glyph_set(name) for name in font_names]
+        common_glyphs = glyph_sets[0].intersection(*glyph_sets[1:])
         
         # Unicode範囲定義
         unicode_ranges = self.get_unicode_ranges()
@@ -299,33 +353,8 @@ def get_default_font_paths() -> Dict[str, str]:
     }
 
 def find_available_fonts() -> Dict[str, str]:
-    """利用可能なフォントファイルを動的に検索"""
-    import glob
-    
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    patterns = [
-        "dist/*.ttf",
-        "dist/*.otf",
-        "dist/*/*.ttf", 
-        "sourceFonts/*.ttf"
-    ]
-    
-    fonts = {}
-    for pattern in patterns:
-        for font_path in glob.glob(os.path.join(base_dir, pattern)):
-            rel_path = os.path.relpath(font_path, base_dir)
-            font_name = os.path.splitext(os.path.basename(font_path))[0]
-            
-            # バージョン情報を含む場合
-            dir_name = os.path.dirname(rel_path)
-            if dir_name and dir_name not in ['dist', 'sourceFonts']:
-                key = f"{os.path.basename(dir_name)}_{font_name}"
-            else:
-                key = font_name
-                
-            fonts[key] = rel_path
-    
-    return fonts
+    """利用可能なフォントファイルを検索（font_catalogの索引を使用）"""
+    return get_catalog().fonts()
 
 
 def get_all_font_paths() -> Dict[str, str]:
@@ -354,9 +383,13 @@ def list_available_fonts() -> None:
         else:
             missing_fonts[name] = path
     
+    catalog = get_catalog()
     print("利用可能なフォント:")
     for name, path in sorted(existing_fonts.items()):
-        print(f"  ✓ {name:<20} -> {path}")
+        entry = catalog.entry(path)
+        count = entry.get("glyph_count") if entry else None
+        detail = f"  ({count}グリフ)" if count is not None else ""
+        print(f"  ✓ {name:<20} -> {path}{detail}")
     
     if missing_fonts:
         print("\n見つからないフォント:")
@@ -366,11 +399,8 @@ def list_available_fonts() -> None:
     print(f"\n合計: {len(existing_fonts)} 個のフォントが利用可能")
 
 
-def create_analyzer_with_error_handling(font_selection: List[str] = None) -> Optional[FontAnalyzer]:
-    """エラーハンドリング付きでFontAnalyzerを作成"""
-    if font_selection is None:
-        font_selection = ['mplus', 'ubuntu', 'yasashisa']
-    
+def resolve_font_paths(font_selection: List[str]) -> Optional[Dict[str, str]]:
+    """フォント名をパスに解決する（不明・欠損があればメッセージを出してNone）"""
     all_font_paths = get_all_font_paths()
     selected_paths = {}
     unknown_fonts = []
@@ -402,6 +432,18 @@ def create_analyzer_with_error_handling(font_selection: List[str] = None) -> Opt
             print(f"  ✗ {missing}")
         return None
     
+    return selected_paths
+
+
+def create_analyzer_with_error_handling(font_selection: List[str] = None) -> Optional[FontAnalyzer]:
+    """エラーハンドリング付きでFontAnalyzerを作成"""
+    if font_selection is None:
+        font_selection = ['mplus', 'ubuntu', 'yasashisa']
+    
+    selected_paths = resolve_font_paths(font_selection)
+    if selected_paths is None:
+        return None
+    
     try:
         return FontAnalyzer(selected_paths)
     except Exception as e:
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Font catalog index for the Utatane project
+
+dist/ と sourceFonts/ のフォントを一覧化し、パス・サイズ・更新時刻・内容ハッシュ・
+ファミリ/スタイル名・グリフ数を tmp/font_catalog.json に保存する。
+サイズと更新時刻が変わったファイルだけを読み直すため、2回目以降はstatのみで済む。
+
+FontForge不要。通常のPythonでも実行できる:
+  python analysis/font_catalog.py            # 一覧表示（必要なら索引を更新）
+  python analysis/font_catalog.py --rebuild  # 索引を作り直す
+"""
+
+import glob
+import hashlib
+import json
+import os
+import struct
+import sys
+from typing import Dict, List, Optional
+
+from sfnt_reader import SfntError, SfntReader
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG_PATH = os.path.join(BASE_DIR, "tmp", "font_catalog.json")
+CACHE_DIR = os.path.join(BASE_DIR, "tmp", "cache")
+CATALOG_VERSION = 1
+
+FONT_PATTERNS = [
+    "dist/*.ttf",
+    "dist/*.otf",
+    "dist/*/*.ttf",
+    "sourceFonts/*.ttf",
+]
+
+
+def font_key_for(rel_path: str) -> str:
+    """相対パスからフォントキーを作る（バージョンディレクトリは接頭辞にする）"""
+    font_name = os.path.splitext(os.path.basename(rel_path))[0]
+    dir_name = os.path.dirname(rel_path)
+    if dir_name and dir_name not in ["dist", "sourceFonts"]:
+        return f"{os.path.basename(dir_name)}_{font_name}"
+    return font_name
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FontCatalog:
+    """フォントファイルの索引（変更のあったファイルだけ再読込）"""
+
+    def __init__(self, base_dir: str = BASE_DIR, catalog_path: str = CATALOG_PATH):
+        self.base_dir = base_dir
+        self.catalog_path = catalog_path
+        self.entries: Dict[str, Dict] = {}  # 相対パス -> エントリ
+        self._dirty = False
+        self._refreshed = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.catalog_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CATALOG_VERSION:
+            self.entries = data.get("fonts", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        tmp_path = self.catalog_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CATALOG_VERSION, "fonts": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.catalog_path)
+        self._dirty = False
+
+    def _discover(self) -> List[str]:
+        paths = []
+        for pattern in FONT_PATTERNS:
+            for font_path in glob.glob(os.path.join(self.base_dir, pattern)):
+                paths.append(os.path.relpath(font_path, self.base_dir))
+        return paths
+
+    def _scan(self, rel_path: str, st: os.stat_result) -> Dict:
+        abs_path = os.path.join(self.base_dir, rel_path)
+        entry = {
+            "key": font_key_for(rel_path),
+            "path": rel_path,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": hash_file(abs_path),
+            "family": None,
+            "style": None,
+            "glyph_count": None,
+        }
+        try:
+            reader = SfntReader.from_file(abs_path)
+            entry["family"], entry["style"] = reader.family_and_style()
+            entry["glyph_count"] = reader.num_glyphs()
+        except (SfntError, struct.error) as e:
+            entry["error"] = str(e)
+        return entry
+
+    def refresh(self, force: bool = False) -> "FontCatalog":
+        """索引を更新（サイズ・更新時刻が変わったファイルのみ読み直す）"""
+        seen = set()
+        for rel_path in self._discover():
+            seen.add(rel_path)
+            try:
+                st = os.stat(os.path.join(self.base_dir, rel_path))
+            except OSError:
+                continue
+            entry = self.entries.get(rel_path)
+            if (not force and entry is not None
+                    and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime):
+                continue
+            self.entries[rel_path] = self._scan(rel_path, st)
+            self._dirty = True
+
+        for rel_path in list(self.entries):
+            if rel_path not in seen:
+                del self.entries[rel_path]
+                self._dirty = True
+
+        self._refreshed = True
+        self.save()
+        return self
+
+    def _ensure_refreshed(self):
+        if not self._refreshed:
+            self.refresh()
+
+    def fonts(self) -> Dict[str, str]:
+        """フォントキー -> 相対パス（find_available_fonts() 互換）"""
+        self._ensure_refreshed()
+        return {e["key"]: e["path"] for e in sorted(self.entries.values(), key=lambda e: e["path"])}
+
+    def entry(self, key_or_path: str) -> Optional[Dict]:
+        """フォントキーまたはパスからエントリを引く"""
+        self._ensure_refreshed()
+        rel_path = os.path.relpath(os.path.abspath(key_or_path), self.base_dir) \
+            if os.path.exists(key_or_path) else None
+        if rel_path in self.entries:
+            return self.entries[rel_path]
+        for e in self.entries.values():
+            if e["key"] == key_or_path:
+                return e
+        return None
+
+    def content_hash(self, key_or_path: str) -> Optional[str]:
+        e = self.entry(key_or_path)
+        return e["sha256"] if e else None
+
+    def find(self, family: Optional[str] = None, style: Optional[str] = None) -> List[Dict]:
+        """ファミリ名・スタイル名でフォントを絞り込む"""
+        self._ensure_refreshed()
+        return [
+            e for e in self.entries.values()
+            if (family is None or e.get("family") == family)
+            and (style is None or e.get("style") == style)
+        ]
+
+    def cache_path(self, key_or_path: str, kind: str, suffix: str) -> Optional[str]:
+        """フォント内容ハッシュで区別したキャッシュファイルのパス
+
+        同じ内容のフォントはパスが変わっても同じキャッシュを使う。
+        索引対象外の場所にあるフォントファイルは、その場で内容ハッシュを計算する。
+        """
+        digest = self.content_hash(key_or_path)
+        if digest is None and os.path.isfile(key_or_path):
+            digest = hash_file(key_or_path)
+        if digest is None:
+            return None
+        return os.path.join(CACHE_DIR, kind, f"{digest[:16]}{suffix}")
+
+
+_default_catalog: Optional[FontCatalog] = None
+
+
+def get_catalog() -> FontCatalog:
+    """プロセス内で共有するカタログ"""
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = FontCatalog()
+    return _default_catalog
+
+
+def main():
+    rebuild = "--rebuild" in sys.argv[1:]
+    catalog = FontCatalog().refresh(force=rebuild)
+    print(f"{'キー':<32} {'グリフ数':>8}  {'ファミリ / スタイル':<36} パス")
+    for e in sorted(catalog.entries.values(), key=lambda e: e["path"]):
+        name = f"{e.get('family')} / {e.get('style')}"
+        count = e.get("glyph_count")
+        print(f"{e['key']:<32} {count if count is not None else '-':>8}  {name:<36} {e['path']}")
+    print(f"\n合計: {len(catalog.entries)} 個のフォント（索引: {os.path.relpath(catalog.catalog_path, BASE_DIR)}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Minimal sfnt (TTF/OTF/TTC) reader
+
+FontForge を使わずに、フォントファイルのテーブルを直接読む軽量リーダー。
+フォント一覧の作成や送り幅の検査など、グリフ形状が不要な処理で使う。
+"""
+
+import struct
+from typing import Dict, List, Optional, Tuple
+
+# cmapのサブテーブルの優先順 (platformID, encodingID)。Unicode全域 > BMPのみ
+CMAP_PREFERENCE = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0))
+
+
+class SfntError(Exception):
+    """sfntとして解釈できないファイル"""
+
+
+class SfntReader:
+    """sfntのテーブルディレクトリと一部テーブルを読む"""
+
+    def __init__(self, data: bytes, font_index: int = 0):
+        self.data = data
+        self.offset = self._font_offset(font_index)
+        self.tables = self._read_table_directory()
+
+    @classmethod
+    def from_file(cls, path: str, font_index: int = 0) -> "SfntReader":
+        with open(path, "rb") as f:
+            return cls(f.read(), font_index)
+
+    def _font_offset(self, font_index: int) -> int:
+        if len(self.data) < 12:
+            raise SfntError("ファイルが短すぎます")
+        if self.data[:4] != b"ttcf":
+            return 0
+        num_fonts = struct.unpack_from(">I", self.data, 8)[0]
+        if font_index >= num_fonts:
+            raise SfntError(f"TTCのフォント番号が範囲外です: {font_index}/{num_fonts}")
+        return struct.unpack_from(">I", self.data, 12 + 4 * font_index)[0]
+
+    def _read_table_directory(self) -> Dict[str, Tuple[int, int]]:
+        sfnt_version = self.data[self.offset:self.offset + 4]
+        if sfnt_version not in (b"\x00\x01\x00\x00", b"OTTO", b"true"):
+            raise SfntError(f"未対応のsfntバージョン: {sfnt_version!r}")
+        num_tables = struct.unpack_from(">H", self.data, self.offset + 4)[0]
+        tables = {}
+        for i in range(num_tables):
+            tag, _checksum, offset, length = struct.unpack_from(">4sIII", self.data, self.offset + 12 + 16 * i)
+            tables[tag.decode("latin-1")] = (offset, length)
+        return tables
+
+    def table(self, tag: str) -> Optional[memoryview]:
+        """テーブルの生データ（無ければNone）"""
+        if tag not in self.tables:
+            return None
+        offset, length = self.tables[tag]
+        return memoryview(self.data)[offset:offset + length]
+
+    @property
+    def is_cff(self) -> bool:
+        return "CFF " in self.tables or "CFF2" in self.tables
+
+    def num_glyphs(self) -> Optional[int]:
+        maxp = self.table("maxp")
+        if maxp is None:
+            return None
+        return struct.unpack_from(">H", maxp, 4)[0]
+
+    def names(self) -> Dict[int, str]:
+        """nameテーブルを {nameID: 文字列} で返す（Windows英語 > Windows > Mac の優先順）"""
+        name = self.table("name")
+        if name is None:
+            return {}
+        _fmt, count, string_offset = struct.unpack_from(">HHH", name, 0)
+
+        ranked: Dict[int, Tuple[int, str]] = {}
+        for i in range(count):
+            platform_id, encoding_id, language_id, name_id, length, offset = \
+                struct.unpack_from(">HHHHHH", name, 6 + 12 * i)
+            raw = bytes(name[string_offset + offset:string_offset + offset + length])
+            if platform_id == 3:
+                rank = 0 if language_id == 0x409 else 1
+                text = raw.decode("utf-16-be", errors="replace")
+            elif platform_id == 1 and encoding_id == 0:
+                rank = 2
+                text = raw.decode("mac-roman", errors="replace")
+            else:
+                continue
+            if name_id not in ranked or rank < ranked[name_id][0]:
+                ranked[name_id] = (rank, text)
+        return {name_id: text for name_id, (_rank, text) in ranked.items()}
+
+    def family_and_style(self) -> Tuple[Optional[str], Optional[str]]:
+        """ファミリ名とスタイル名（Preferred Family/Styles を優先）"""
+        names = self.names()
+        family = names.get(16) or names.get(1)
+        style = names.get(17) or names.get(2)
+        return family, style
+
+    def units_per_em(self) -> Optional[int]:
+        head = self.table("head")
+        if head is None:
+            return None
+        return struct.unpack_from(">H", head, 18)[0]
+
+    def advance_widths(self) -> List[int]:
+        """グリフ番号順の送り幅（hhea.numberOfHMetrics 以降は最後の値が続く）"""
+        hhea = self.table("hhea")
+        hmtx = self.table("hmtx")
+        num_glyphs = self.num_glyphs()
+        if hhea is None or hmtx is None or num_glyphs is None:
+            raise SfntError("hhea/hmtx/maxp テーブルがありません")
+        num_metrics = struct.unpack_from(">H", hhea, 34)[0]
+        if num_metrics == 0 or len(hmtx) < 4 * num_metrics:
+            raise SfntError(f"hmtxが壊れています: numberOfHMetrics={num_metrics}")
+        # (advanceWidth, lsb) の組から advanceWidth だけ取り出す
+        advances = list(struct.unpack_from(f">{2 * num_metrics}H", hmtx, 0)[0::2])
+        advances.extend([advances[-1]] * (num_glyphs - num_metrics))
+        return advances
+
+    def cmap(self) -> Dict[int, int]:
+        """Unicodeのcmapを {コードポイント: グリフ番号} で返す（format 4 と 12 に対応）"""
+        cmap = self.table("cmap")
+        if cmap is None:
+            return {}
+        _version, num_subtables = struct.unpack_from(">HH", cmap, 0)
+        subtables = {}
+        for i in range(num_subtables):
+            platform_id, encoding_id, offset = struct.unpack_from(">HHI", cmap, 4 + 8 * i)
+            subtables.setdefault((platform_id, encoding_id), offset)
+
+        for key in CMAP_PREFERENCE:
+            if key not in subtables:
+                continue
+            offset = subtables[key]
+            fmt = struct.unpack_from(">H", cmap, offset)[0]
+            if fmt == 12:
+                return self._cmap_format12(cmap, offset)
+            if fmt == 4:
+                return self._cmap_format4(cmap, offset)
+        return {}
+
+    @staticmethod
+    def _cmap_format4(cmap: memoryview, offset: int) -> Dict[int, int]:
+        seg_count = struct.unpack_from(">H", cmap, offset + 6)[0] // 2
+        ends_offset = offset + 14
+        starts_offset = ends_offset + 2 * seg_count + 2  # reservedPad を飛ばす
+        deltas_offset = starts_offset + 2 * seg_count
+        range_offsets_offset = deltas_offset + 2 * seg_count
+        ends = struct.unpack_from(f">{seg_count}H", cmap, ends_offset)
+        starts = struct.unpack_from(f">{seg_count}H", cmap, starts_offset)
+        deltas = struct.unpack_from(f">{seg_count}H", cmap, deltas_offset)
+        range_offsets = struct.unpack_from(f">{seg_count}H", cmap, range_offsets_offset)
+
+        mapping = {}
+        for i in range(seg_count):
+            start, end, delta, range_offset = starts[i], ends[i], deltas[i], range_offsets[i]
+            if start == 0xFFFF:
+                continue
+            if range_offset == 0:
+                for code in range(start, end + 1):
+                    gid = (code + delta) & 0xFFFF
+                    if gid:
+                        mapping[code] = gid
+                continue
+            # idRangeOffset は自分自身の位置からの相対オフセット
+            base = range_offsets_offset + 2 * i + range_offset
+            glyph_ids = struct.unpack_from(f">{end - start + 1}H", cmap, base)
+            for code, gid in zip(range(start, end + 1), glyph_ids):
+                if gid:
+                    mapping[code] = (gid + delta) & 0xFFFF
+        return mapping
+
+    @staticmethod
+    def _cmap_format12(cmap: memoryview, offset: int) -> Dict[int, int]:
+        num_groups = struct.unpack_from(">I", cmap, offset + 12)[0]
+        groups = struct.unpack_from(f">{3 * num_groups}I", cmap, offset + 16)
+        mapping = {}
+        for i in range(0, len(groups), 3):
+            start, end, start_gid = groups[i:i + 3]
+            mapping.update(zip(range(start, end + 1), range(start_gid, start_gid + end - start + 1)))
+        return mapping
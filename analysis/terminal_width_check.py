@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Terminal width cross-check for the Utatane project
+
+生成したTTFの cmap/hmtx を sfnt_reader で直接読み、文字ごとの送り幅（半角=1, 全角=2）を
+端末が使う文字幅表と比べて、表ごとに幅が食い違う文字を報告する。
+端末は表の幅でカーソルを進めるので、食い違う文字は表示が崩れたり再描画がずれたりする。
+
+文字幅表は data/terminal_widths.json に保存したもの（スナップショット）を使う:
+  glibc       glibc の wcwidth（--update-snapshot を実行した環境の glibc に C.UTF-8 ロケールで問い合わせた値）
+  xterm       xterm の wcwidth.c（Markus Kuhn の mk_wcwidth。全角は Unicode 5.0 時点の固定範囲）
+  eaw-narrow  East_Asian_Width の W/F を全角、曖昧(A)を半角とする設定
+  eaw-wide    East_Asian_Width の W/F/A を全角とする設定（曖昧を全角にする端末設定）
+
+食い違いのうち、data/width_overrides.txt で幅を決めた文字と、曖昧などで元グリフの幅に
+従った文字は Utatane の設計どおり（known）として、それ以外（unexpected）と分けて数える。
+
+FontForge不要。通常のPythonでも実行できる:
+  python analysis/terminal_width_check.py dist/Utatane-Regular.ttf
+  python analysis/terminal_width_check.py dist/Utatane-Regular.ttf --tables glibc,xterm --show-known
+  python analysis/terminal_width_check.py dist/Utatane-Regular.ttf --json tmp/terminal_widths.json --strict
+  python analysis/terminal_width_check.py --update-snapshot   # 実行中のPythonのUnicodeと glibc で表を作り直す
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import locale
+import os
+import sys
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sfnt_reader import SfntError, SfntReader
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_PATH = os.path.join(BASE_DIR, "data", "terminal_widths.json")
+SNAPSHOT_VERSION = 1
+
+MAX_CODEPOINT = 0x10FFFF
+
+# mk_wcwidth() (xterm の wcwidth.c) が全角とする範囲。Unicode 5.0 時点のもので更新されていない
+XTERM_WIDE_RANGES = [
+    (0x1100, 0x115F), (0x2329, 0x232A), (0x2E80, 0x303E), (0x3040, 0xA4CF),
+    (0xAC00, 0xD7A3), (0xF900, 0xFAFF), (0xFE10, 0xFE19), (0xFE30, 0xFE6F),
+    (0xFF00, 0xFF60), (0xFFE0, 0xFFE6), (0x20000, 0x2FFFD), (0x30000, 0x3FFFD),
+]
+
+TABLE_DESCRIPTIONS = {
+    "glibc": "glibc wcwidth (C.UTF-8)",
+    "xterm": "xterm wcwidth.c / mk_wcwidth (Unicode 5.0 wide ranges)",
+    "eaw-narrow": "East_Asian_Width, ambiguous as narrow",
+    "eaw-wide": "East_Asian_Width, ambiguous as wide",
+}
+
+
+def _is_zero_width(code: int, category: str) -> bool:
+    """wcwidth() 実装が共通して幅0にする文字（結合文字・書式制御文字・ハングル中声/終声・ZWSP）"""
+    if code == 0x00AD:  # SOFT HYPHEN は表示される
+        return False
+    return category in ("Mn", "Me", "Cf") or 0x1160 <= code <= 0x11FF or code == 0x200B
+
+
+def rule_width(table: str, code: int) -> int:
+    """スナップショット作成用: 表の規則による文字幅（-1 は制御文字）"""
+    ch = chr(code)
+    category = unicodedata.category(ch)
+    if code == 0:
+        return 0
+    if category == "Cc":
+        return -1
+    eaw = unicodedata.east_asian_width(ch)
+
+    if table == "xterm":
+        if _is_zero_width(code, category):
+            return 0
+        return 2 if any(start <= code <= end for start, end in XTERM_WIDE_RANGES) else 1
+    if table == "eaw-narrow":
+        return 2 if eaw in ("W", "F") else 1
+    if table == "eaw-wide":
+        return 2 if eaw in ("W", "F", "A") else 1
+    raise ValueError(f"unknown table: {table}")
+
+
+def glibc_wcwidth() -> Optional[Tuple[str, Callable[[int], int]]]:
+    """実行中の glibc の wcwidth() -> (glibcのバージョン, 関数)。glibc や C.UTF-8 ロケールがなければ None
+
+    glibc の幅データは localedata/unicode-gen で生成されて C.UTF-8 ロケールに入っているので、
+    そのロケールで wcwidth() を呼ぶ（関数は LC_CTYPE を C.UTF-8 にしてから使う）。
+    未割り当ての文字は -1 になる。
+    """
+    path = ctypes.util.find_library("c")
+    if path is None:
+        return None
+    libc = ctypes.CDLL(path)
+    if not hasattr(libc, "gnu_get_libc_version"):
+        return None
+    libc.gnu_get_libc_version.restype = ctypes.c_char_p
+    libc.wcwidth.argtypes = [ctypes.c_int]
+    libc.wcwidth.restype = ctypes.c_int
+    version = libc.gnu_get_libc_version().decode()
+    saved = locale.setlocale(locale.LC_CTYPE)
+    try:
+        locale.setlocale(locale.LC_CTYPE, "C.UTF-8")
+    except locale.Error:
+        return None
+    locale.setlocale(locale.LC_CTYPE, saved)
+
+    def width(code: int) -> int:
+        return libc.wcwidth(code)
+    return version, width
+
+
+def _ranges(width_of: Callable[[int], int]) -> Dict[str, List[str]]:
+    """文字幅を「幅 -> 範囲の列」にまとめる（幅1は既定値なので持たない）"""
+    ranges: Dict[str, List[str]] = {}
+    run_start, run_width = 0, width_of(0)
+    for code in range(1, MAX_CODEPOINT + 2):
+        width = width_of(code) if code <= MAX_CODEPOINT else None
+        if width == run_width:
+            continue
+        if run_width != 1:
+            text = f"{run_start:04X}" if run_start == code - 1 else f"{run_start:04X}..{code - 1:04X}"
+            ranges.setdefault(str(run_width), []).append(text)
+        run_start, run_width = code, width
+    return ranges
+
+
+def build_snapshot(previous: Optional[Dict] = None) -> Dict:
+    """各表を「幅 -> 範囲の列」にまとめる
+
+    glibc の表は実行中の glibc から取る。glibc でない環境では previous（既存のスナップショット）の
+    表をそのまま残し、無ければ表を作らない（規則から推測した表を glibc と称さない）。
+    """
+    tables = {}
+    for table, description in TABLE_DESCRIPTIONS.items():
+        if table != "glibc":
+            ranges = _ranges(lambda code: rule_width(table, code))
+            tables[table] = {"description": description, "default": 1, "ranges": ranges}
+            continue
+
+        glibc = glibc_wcwidth()
+        if glibc is None:
+            if previous and table in previous.get("tables", {}):
+                tables[table] = previous["tables"][table]
+            else:
+                print(f"glibc が見つからないため {table} の表は作りません", file=sys.stderr)
+            continue
+        version, width = glibc
+        saved = locale.setlocale(locale.LC_CTYPE)
+        locale.setlocale(locale.LC_CTYPE, "C.UTF-8")
+        try:
+            ranges = _ranges(width)
+        finally:
+            locale.setlocale(locale.LC_CTYPE, saved)
+        tables[table] = {"description": f"glibc {version} wcwidth (C.UTF-8)", "default": 1, "ranges": ranges}
+    return {
+        "version": SNAPSHOT_VERSION,
+        "unicode_version": unicodedata.unidata_version,
+        "generated_by": "python analysis/terminal_width_check.py --update-snapshot",
+        "tables": tables,
+    }
+
+
+def save_snapshot(path: str = SNAPSHOT_PATH) -> Dict:
+    previous = None
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f)
+    snapshot = build_snapshot(previous)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    return snapshot
+
+
+class WidthTable:
+    """端末の文字幅表（コードポイントを添字にした bytearray。値は幅+1）"""
+
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.description = spec.get("description", name)
+        self._widths = bytearray([spec.get("default", 1) + 1]) * (MAX_CODEPOINT + 1)
+        for width, ranges in spec["ranges"].items():
+            value = bytes([int(width) + 1])
+            for text in ranges:
+                start, _, end = text.partition("..")
+                start, end = int(start, 16), int(end or start, 16)
+                self._widths[start:end + 1] = value * (end - start + 1)
+
+    def width(self, code: int) -> int:
+        return self._widths[code] - 1
+
+
+def load_tables(path: str = SNAPSHOT_PATH, names: Optional[List[str]] = None) -> Tuple[str, List[WidthTable]]:
+    """スナップショットを読む -> (Unicodeバージョン, [WidthTable])"""
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: 未対応のスナップショット形式です: {snapshot.get('version')}")
+    specs = snapshot["tables"]
+    names = names or list(specs)
+    unknown = [name for name in names if name not in specs]
+    if unknown:
+        raise ValueError(f"未知の文字幅表: {', '.join(unknown)}（{', '.join(specs)} から選択）")
+    return snapshot.get("unicode_version", "?"), [WidthTable(name, specs[name]) for name in names]
+
+
+def load_width_policy():
+    """ビルドの文字幅の方針（リポジトリ直下の width_policy.py）"""
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    import width_policy
+    return width_policy.default_policy()
+
+
+def font_cells(path: str, font_index: int = 0) -> Dict[int, Optional[int]]:
+    """{コードポイント: 送り幅のセル数}（半角の倍数でない送り幅は None）"""
+    reader = SfntReader.from_file(path, font_index)
+    half = reader.units_per_em() / 2
+    advances = reader.advance_widths()
+    cells = {}
+    for code, gid in reader.cmap().items():
+        advance = advances[gid] if gid < len(advances) else advances[-1]
+        cells[code] = int(advance // half) if advance % half == 0 else None
+    return cells
+
+
+def check_font(cells: Dict[int, Optional[int]], tables: List[WidthTable], policy=None) -> Dict[str, Dict]:
+    """表ごとの食い違い -> {表名: {"known": [...], "unexpected": [...]}}
+
+    各要素は (コードポイント, 表の幅, フォントの幅, 幅の決め方)。
+    表の幅が0（結合文字など）や-1（制御文字）の文字は端末が送り幅を使わないので比べない。
+    """
+    results = {}
+    for table in tables:
+        known, unexpected = [], []
+        for code in sorted(cells):
+            expected = table.width(code)
+            actual = cells[code]
+            if expected <= 0 or actual == expected:
+                continue
+            source = policy.decide(code)[1] if policy else "eaw"
+            entry = (code, expected, actual, source)
+            if actual is not None and source in ("override", "glyph"):
+                known.append(entry)
+            else:
+                unexpected.append(entry)
+        results[table.name] = {"known": known, "unexpected": unexpected}
+    return results
+
+
+def format_entry(entry: Tuple) -> str:
+    code, expected, actual, source = entry
+    name = unicodedata.name(chr(code), "-")
+    actual_text = "?" if actual is None else actual
+    return f"    U+{code:04X} {chr(code)!r:<5} {name:<40} table={expected} font={actual_text} ({source})"
+
+
+def print_results(path: str, unicode_version: str, tables: List[WidthTable],
+                  results: Dict[str, Dict], show_known: bool, max_display: int):
+    print(f"{path}: 端末の文字幅表との比較（Unicode {unicode_version}）")
+    for table in tables:
+        result = results[table.name]
+        print(f"\n[{table.name}] {table.description}")
+        print(f"  known: {len(result['known'])}, unexpected: {len(result['unexpected'])}")
+        groups = [("unexpected", result["unexpected"])]
+        if show_known:
+            groups.append(("known", result["known"]))
+        for label, entries in groups:
+            if not entries:
+                continue
+            print(f"  {label}:")
+            for entry in entries[:max_display]:
+                print(format_entry(entry))
+            if len(entries) > max_display:
+                print(f"    ... 他 {len(entries) - max_display} 件")
+
+
+def results_to_json(results: Dict[str, Dict]) -> Dict:
+    return {
+        table: {
+            label: [{"code": f"U+{code:04X}", "table": expected, "font": actual, "source": source}
+                    for code, expected, actual, source in entries]
+            for label, entries in result.items()
+        }
+        for table, result in results.items()
+    }
+
+
+def check(path: str, table_names: Optional[List[str]] = None,
+          snapshot_path: str = SNAPSHOT_PATH) -> Tuple[str, List[WidthTable], Dict[str, Dict]]:
+    """フォントを表と比べる -> (Unicodeバージョン, 表, 表ごとの食い違い)"""
+    unicode_version, tables = load_tables(snapshot_path, table_names)
+    results = check_font(font_cells(path), tables, load_width_policy())
+    return unicode_version, tables, results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="端末の文字幅表とフォントの送り幅の食い違いを調べる")
+    parser.add_argument("fonts", nargs="*", help="対象のTTF/OTF")
+    parser.add_argument("--tables", help=f"カンマ区切りの文字幅表（既定: すべて。{', '.join(TABLE_DESCRIPTIONS)}）")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="文字幅表のスナップショット")
+    parser.add_argument("--show-known", action="store_true", help="設計どおりの食い違いも一覧表示")
+    parser.add_argument("--max-display", type=int, default=50, help="表ごとの最大表示件数")
+    parser.add_argument("--json", help="食い違いをJSONで保存するパス")
+    parser.add_argument("--strict", action="store_true", help="unexpected があれば終了コード1")
+    parser.add_argument("--update-snapshot", action="store_true",
+                        help="実行中のPythonのunicodedataと glibc からスナップショットを作り直す")
+    args = parser.parse_args()
+
+    if args.update_snapshot:
+        snapshot = save_snapshot(args.snapshot)
+        print(f"{args.snapshot}: {len(snapshot['tables'])} tables (Unicode {snapshot['unicode_version']})")
+        if not args.fonts:
+            return 0
+    elif not args.fonts:
+        parser.error("フォントを指定してください")
+
+    table_names = args.tables.split(",") if args.tables else None
+    report = {}
+    failed = False
+    for path in args.fonts:
+        try:
+            unicode_version, tables, results = check(path, table_names, args.snapshot)
+        except (OSError, SfntError, ValueError) as e:
+            print(f"{path}: {e}")
+            return 1
+        print_results(path, unicode_version, tables, results, args.show_known, args.max_display)
+        report[path] = results_to_json(results)
+        failed = failed or any(result["unexpected"] for result in results.values())
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\nJSONを保存しました: {args.json}")
+
+    return 1 if args.strict and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
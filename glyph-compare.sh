@@ -54,7 +54,7 @@ check_environment() {
     if [ ! -d ".venv" ]; then
         echo_warning "uv仮想環境が見つかりません。作成します..."
         uv venv
-        uv add matplotlib
+        uv add matplotlib pypdf
         echo_success "uv環境を作成しました"
     fi
     
@@ -96,6 +96,7 @@ show_help() {
   --unicode U+XXXX      Unicode指定（複数指定可能）
   --range U+XXXX-U+YYYY Unicode範囲指定（複数指定可能）
   --chars CHARS         文字直接指定
+  --baseline PATH       前回ビルド（例: dist/v1.3.1）から輪郭・幅が変わったグリフのみ比較
   
 フォント指定オプション:
   --mplus PATH          M+フォントパス
@@ -104,8 +105,13 @@ show_help() {
 
 出力オプション:
   --output PATH         PDF出力ファイル名
-  --json-only           JSONデータのみ出力（PDF生成しない）
-  --keep-json           中間JSONファイルを保持
+  --json-only           グリフデータのみ出力（PDF生成しない）
+  --keep-json           中間グリフデータファイルを保持
+  --jobs N              中間ファイル経由で、PDFを N プロセスで並列描画（0: CPUコア数）
+                        （指定しない場合は抽出結果をパイプで渡し、抽出と描画を並行して行う）
+  --layout grid         複数グリフを1ページに並べる（デフォルト: page = 1グリフ1ページ）
+  --grid RxC            グリッド表示の1ページあたりのグリフ数（デフォルト: 4x6）
+  --skip-unchanged      Utataneが元フォントと同一のグリフをPDFから除く
 
 その他:
   --list-categories     利用可能なカテゴリ一覧表示
@@ -135,16 +141,25 @@ show_help() {
 
   # カスタム出力ファイル名
   $0 --priority high --output high_impact_glyphs.pdf
+
+  # 範囲全体をグリッド表示で、変更のあるグリフだけ確認
+  $0 --range U+2000-U+27FF --layout grid --skip-unchanged
+
+  # 前回リリースから変わったグリフだけ確認
+  $0 --range U+0000-U+FFFF --baseline dist/v1.3.1 --layout grid
 EOF
 }
 
 # メイン処理
 main() {
     local args=("$@")
-    local json_file
+    local data_file
     local pdf_file
     local keep_json=false
     local json_only=false
+    local jobs=0
+    local jobs_set=false
+    local vis_args=()
     
     # ヘルプまたはバージョン表示
     for arg in "$@"; do
@@ -165,7 +180,8 @@ main() {
     mkdir -p tmp
     
     # 出力ファイル名とオプション解析
-    json_file="tmp/glyph_data_$(date +%Y%m%d_%H%M%S).json"
+    # 中間データはバイナリ形式（.utgd）。JSONより小さく、可視化側で読み込みが速い
+    data_file="tmp/glyph_data_$(date +%Y%m%d_%H%M%S).utgd"
     pdf_file=""
     
     new_args=()
@@ -184,6 +200,22 @@ main() {
             --json-only)
                 json_only=true
                 ;;
+            --jobs)
+                if [ $((i+1)) -lt ${#args[@]} ]; then
+                    jobs="${args[$((i+1))]}"
+                    jobs_set=true
+                    i=$((i+1))
+                fi
+                ;;
+            --layout|--grid)
+                if [ $((i+1)) -lt ${#args[@]} ]; then
+                    vis_args+=("${args[i]}" "${args[$((i+1))]}")
+                    i=$((i+1))
+                fi
+                ;;
+            --skip-unchanged)
+                vis_args+=("${args[i]}")
+                ;;
             *)
                 new_args+=("${args[i]}")
                 ;;
@@ -196,20 +228,45 @@ main() {
     
     echo_info "グリフ形状比較を開始します..."
     
+    # 中間ファイルが不要な場合は、抽出結果をパイプで渡して抽出と描画を並行させる
+    if [ "$keep_json" = false ] && [ "$json_only" = false ] && [ "$jobs_set" = false ]; then
+        if [ -z "$pdf_file" ]; then
+            pdf_file="tmp/glyph_comparison_$(date +%Y%m%d_%H%M%S).pdf"
+        fi
+        
+        echo_info "グリフデータ抽出とPDF可視化を並行して実行中..."
+        source .venv/bin/activate
+        if ! (set -o pipefail
+              ./fontforge/build/bin/fontforge -lang=py -script test/glyph_data_extractor.py "${new_args[@]}" --output - \
+                  | uv run python test/glyph_visualizer.py - --output "$pdf_file" "${vis_args[@]}"); then
+            echo_error "グリフデータ抽出またはPDF生成に失敗しました"
+            exit 1
+        fi
+        
+        if [ -f "$pdf_file" ]; then
+            echo_success "PDF生成完了: $pdf_file"
+            echo_success "グリフ形状比較が完了しました！"
+            echo_info "結果を確認してください: $pdf_file"
+        else
+            echo_info "比較するグリフがないため、PDFは生成されませんでした"
+        fi
+        return 0
+    fi
+    
     # ステップ1: FontForgeでグリフデータ抽出
     echo_info "ステップ1: グリフデータ抽出中..."
-    ./fontforge/build/bin/fontforge -lang=py -script test/glyph_data_extractor.py "${new_args[@]}" --output "$json_file"
+    ./fontforge/build/bin/fontforge -lang=py -script test/glyph_data_extractor.py "${new_args[@]}" --output "$data_file"
     
-    if [ ! -f "$json_file" ]; then
+    if [ ! -f "$data_file" ]; then
         echo_error "グリフデータ抽出に失敗しました"
         exit 1
     fi
     
-    echo_success "グリフデータ抽出完了: $json_file"
+    echo_success "グリフデータ抽出完了: $data_file"
     
-    # JSON のみの場合はここで終了
+    # データのみの場合はここで終了
     if [ "$json_only" = true ]; then
-        echo_success "JSONデータ抽出完了"
+        echo_success "グリフデータのみ出力しました"
         exit 0
     fi
     
@@ -217,26 +274,28 @@ main() {
     echo_info "ステップ2: PDF可視化中..."
     
     if [ -z "$pdf_file" ]; then
-        pdf_file="tmp/${json_file##*/}"
-        pdf_file="${pdf_file%.json}_comparison.pdf"
+        pdf_file="tmp/${data_file##*/}"
+        pdf_file="${pdf_file%.utgd}_comparison.pdf"
     fi
     
     source .venv/bin/activate
-    uv run python test/glyph_visualizer.py "$json_file" --output "$pdf_file"
-    
-    if [ ! -f "$pdf_file" ]; then
+    if ! uv run python test/glyph_visualizer.py "$data_file" --output "$pdf_file" --jobs "$jobs" "${vis_args[@]}"; then
         echo_error "PDF生成に失敗しました"
         exit 1
     fi
     
-    echo_success "PDF生成完了: $pdf_file"
+    if [ -f "$pdf_file" ]; then
+        echo_success "PDF生成完了: $pdf_file"
+    else
+        echo_info "比較するグリフがないため、PDFは生成されませんでした"
+    fi
     
-    # 中間JSONファイルのクリーンアップ
+    # 中間データファイルのクリーンアップ
     if [ "$keep_json" = false ]; then
-        rm -f "$json_file"
-        echo_info "中間JSONファイルを削除しました"
+        rm -f "$data_file"
+        echo_info "中間データファイルを削除しました"
     else
-        echo_info "中間JSONファイルを保持しました: $json_file"
+        echo_info "中間データファイルを保持しました: $data_file"
     fi
     
     echo_success "グリフ形状比較が完了しました！"
@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生成後のフォントファイルを fontTools で仕上げる処理
+
+utatane.py の build_font() から呼ばれるほか、単体でも実行できる:
+
+    python post_generate.py tables dist/Utatane-Regular.ttf dist/Utatane-Bold.ttf
+    python post_generate.py tables --ppem 8-64 dist/Utatane-Regular.ttf
+    python post_generate.py cmap dist/Utatane-Regular.ttf
+    python post_generate.py hmtx --widths 500,1000 dist/Utatane-Regular.ttf
+    python post_generate.py rename JIS0208 dist/jis0208/Utatane-Regular.ttf
+    python post_generate.py ttc dist/Utatane-Regular.ttc dist/Utatane-Regular.ttf dist/jis0208/Utatane-Regular.ttf
+
+require: `sudo pip install fonttools` or `uv tool install fonttools`
+tables はヒンティング後の送り幅を確かめるため matplotlib (FreeType) も使う（無ければテーブルを追加しない）
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+
+from fontTools.ttLib import TTCollection, TTFont, newTable
+from fontTools.ttLib.reorderGlyphs import reorderGlyphs
+
+# ヒンティング後の送り幅の確認に FreeType（matplotlib のバインディング）を使う
+try:
+    from matplotlib.ft2font import FT2Font, LoadFlags
+    FT2FONT_AVAILABLE = True
+except ImportError:
+    FT2FONT_AVAILABLE = False
+
+# hdmx/LTSH/VDMX を生成する既定のppem範囲
+DEFAULT_PPEMS = list(range(8, 64+1))
+
+# LTSH の yPel（このppem以上では送り幅が線形）が表せる範囲。書く前にすべて FreeType で確かめる
+LTSH_PPEMS = list(range(1, 255+1))
+
+# 半角・全角の送り幅
+DEFAULT_WIDTH_CLASSES = (500, 1000)
+# 送り幅0を許す文字（結合文字・書式制御文字）
+ZERO_WIDTH_CATEGORIES = ('Mn', 'Me', 'Cf')
+
+# グリフ番号で内容を持つ FontForge 独自のテーブル（並べ替えると壊れるので削除する）
+FONTFORGE_PRIVATE_TABLES = ('PfEd',)
+
+# head.flags bit 4: 命令で送り幅が変わる（送り幅が線形に拡大縮小されない）
+HEAD_FLAG_INSTRUCTIONS_ALTER_ADVANCE = 1 << 4
+
+
+def device_advance(_advance, _ppem, _upem):
+    '''ppemでの送り幅（ピクセル）。ヒンティングで送り幅を変えないので線形に拡大して丸めた値'''
+    return int(math.floor(_advance * _ppem / _upem + 0.5))
+
+
+def add_device_tables(_font, _ppems, _ypels=None):
+    '''hdmx・LTSH・VDMX を追加し、head.flags の bit 4 を落とす
+
+    FontForge の autoInstr は送り幅（phantom point）を動かさないため、
+    各ppemの送り幅は線形に拡大して丸めた値になる（tables() で FreeType を使って確かめる）。これを hdmx に、
+    「このppem以上では線形」(yPel) を LTSH に書いておくと、Windowsは送り幅を知るために
+    グリフごとにヒンティングを実行しなくてよくなる。
+    _ypels: グリフ名 -> yPel（無いグリフは1）。None なら LTSH を作らない。
+    VDMX は usWinAscent/usWinDescent（Windowsの描画範囲）から各ppemの高さを求める。
+    '''
+    upem = _font['head'].unitsPerEm
+    metrics = _font['hmtx'].metrics
+    glyph_order = _font.getGlyphOrder()
+
+    # hdmxの送り幅は1バイトなので、255ピクセルを超えるppemは含めない
+    max_advance = max(advance for advance, _ in metrics.values())
+    ppems = [ppem for ppem in _ppems if 0 < ppem <= 255 and device_advance(max_advance, ppem, upem) <= 255]
+
+    hdmx = newTable('hdmx')
+    hdmx.hdmx = {
+        ppem: {name: device_advance(metrics[name][0], ppem, upem) for name in glyph_order}
+        for ppem in ppems
+    }
+    _font['hdmx'] = hdmx
+
+    if _ypels is not None:
+        ltsh = newTable('LTSH')
+        ltsh.yPels = {name: _ypels.get(name, 1) for name in glyph_order}
+        _font['LTSH'] = ltsh
+    elif 'LTSH' in _font:
+        del _font['LTSH']
+
+    os2 = _font['OS/2']
+    vdmx = newTable('VDMX')
+    vdmx.version = 1
+    # 全てのアスペクト比(0:0:0)に同じグループを使う
+    vdmx.ratRanges = [{'bCharSet': 0, 'xRatio': 0, 'yStartRatio': 0, 'yEndRatio': 0, 'groupIndex': 0}]
+    vdmx.groups = [{
+        ppem: (int(math.ceil(os2.usWinAscent * ppem / upem)), -int(math.ceil(os2.usWinDescent * ppem / upem)))
+        for ppem in ppems
+    }]
+    _font['VDMX'] = vdmx
+
+    _font['head'].flags &= ~HEAD_FLAG_INSTRUCTIONS_ALTER_ADVANCE
+    return ppems
+
+
+def save_font(_font, _path):
+    tmp_path = _path + '.tmp'
+    _font.save(tmp_path)
+    _font.close()
+    os.replace(tmp_path, _path)
+
+
+def hinted_advance_mismatches(_fontpath, _ppems):
+    '''ヒンティング後の送り幅が線形に拡大して丸めた値と違うグリフ -> [(グリフ名, ppem, ヒンティング後, 線形)]
+
+    FreeType で各ppemの全グリフをヒンティングして確かめる。白黒描画（TARGET_MONO）では
+    命令による送り幅（phantom point）の変更がそのまま反映されるので、Windowsと同じ条件になる。
+    '''
+    font = TTFont(_fontpath, lazy=True)
+    upem = font['head'].unitsPerEm
+    metrics = font['hmtx'].metrics
+    glyph_order = font.getGlyphOrder()
+    font.close()
+
+    ft_font = FT2Font(_fontpath)
+    mismatches = []
+    for ppem in _ppems:
+        ft_font.set_size(ppem, 72)  # 72dpi で pt = px
+        for gid, name in enumerate(glyph_order):
+            hinted = ft_font.load_glyph(gid, LoadFlags.TARGET_MONO).horiAdvance / 64
+            linear = device_advance(metrics[name][0], ppem, upem)
+            if hinted != linear:
+                mismatches.append((name, ppem, hinted, linear))
+    return mismatches
+
+
+def linear_ypels(_mismatches):
+    '''ヒンティング後の送り幅が線形でないppem -> グリフごとの LTSH の yPel（それより上は線形）
+
+    表せない（255 ppem でも線形でない）グリフがあれば None。
+    '''
+    ypels = {}
+    for name, ppem, _hinted, _linear in _mismatches:
+        ypels[name] = max(ypels.get(name, 1), ppem + 1)
+    if any(ypel > LTSH_PPEMS[-1] for ypel in ypels.values()):
+        return None
+    return ypels
+
+
+def tables(_fontpath, _ppems=DEFAULT_PPEMS):
+    '''フォントファイルに hdmx・LTSH・VDMX を追加して上書き保存する
+
+    hdmx は「ヒンティングで送り幅が変わらない」ことを前提にした値なので、
+    先に FreeType で全ppemのヒンティング後の送り幅を確かめ、hdmx の範囲で違うグリフがあれば ValueError。
+    LTSH の yPel は LTSH_PPEMS (1-255) のすべてを確かめ、グリフごとに線形でない最大のppemの次にする。
+    FreeType（matplotlib）が使えず確かめられないときはテーブルを追加しない。
+    '''
+    if not FT2FONT_AVAILABLE:
+        print('hdmx/LTSH/VDMX: skipped (ヒンティング後の送り幅を確かめる FreeType (matplotlib) がありません)')
+        return []
+    hdmx_ppems = [ppem for ppem in _ppems if 0 < ppem <= 255]
+    mismatches = hinted_advance_mismatches(_fontpath, sorted(set(hdmx_ppems) | set(LTSH_PPEMS)))
+    hdmx_mismatches = [m for m in mismatches if m[1] in hdmx_ppems]
+    if hdmx_mismatches:
+        lines = ['{} ppem {}: hinted {:g}px, linear {}px'.format(name, ppem, hinted, linear)
+                 for name, ppem, hinted, linear in hdmx_mismatches[:20]]
+        if len(hdmx_mismatches) > 20:
+            lines.append('... and {} more'.format(len(hdmx_mismatches) - 20))
+        raise ValueError('ヒンティングで送り幅が変わるグリフがあるため hdmx を作れません '
+                         '({} 件):\n  {}'.format(len(hdmx_mismatches), '\n  '.join(lines)))
+
+    ypels = linear_ypels(mismatches)
+    font = TTFont(_fontpath)
+    ppems = add_device_tables(font, _ppems, ypels)
+    save_font(font, _fontpath)
+    if ppems:
+        print('hdmx/VDMX: {} ({}-{} ppem)'.format(_fontpath, ppems[0], ppems[-1]))
+    if ypels is None:
+        print('LTSH: skipped ({}: 255 ppem でも送り幅が線形にならないグリフがあります)'.format(_fontpath))
+    else:
+        print('LTSH: {} ({} glyphs with yPel > 1)'.format(_fontpath, len(ypels)))
+        for name, ypel in sorted(ypels.items())[:20]:
+            print('  {} yPel={}'.format(name, ypel))
+    return ppems
+
+
+def codepoint_glyph_order(_font):
+    '''連続するコードポイントが連続するグリフ番号になるグリフ順
+
+    先頭の符号化されていないグリフ（.notdef など）はそのまま、続けて符号化されたグリフを
+    最小のコードポイント順に、最後に符号化されていないグリフを元の順で並べる。
+    '''
+    glyph_order = _font.getGlyphOrder()
+    first_code = {}
+    for code, name in sorted(_font.getBestCmap().items(), reverse=True):
+        first_code[name] = code
+
+    head = leading_unencoded_glyphs(_font)
+    encoded = sorted(first_code, key=first_code.get)
+    rest = [name for name in glyph_order[len(head):] if name not in first_code]
+    return head + encoded + rest
+
+
+def leading_unencoded_glyphs(_font):
+    '''先頭の符号化されていないグリフ（.notdef, .null, CR）'''
+    encoded = set(_font.getBestCmap().values())
+    head = []
+    for name in _font.getGlyphOrder():
+        if name in encoded:
+            break
+        head.append(name)
+    return head
+
+
+def stray_widths(_font, _width_classes):
+    '''送り幅が半角・全角のどちらでもないグリフ -> [(グリフ名, 送り幅, コードポイント)]
+
+    先頭の .notdef などと、結合文字・書式制御文字の送り幅0は除く。
+    '''
+    metrics = _font['hmtx'].metrics
+    codes = {}
+    for code, name in _font.getBestCmap().items():
+        codes.setdefault(name, []).append(code)
+    exempt = set(leading_unencoded_glyphs(_font))
+
+    strays = []
+    for name in _font.getGlyphOrder():
+        advance = metrics[name][0]
+        if name in exempt or advance in _width_classes:
+            continue
+        glyph_codes = codes.get(name, [])
+        if advance == 0 and glyph_codes and all(
+                unicodedata.category(chr(code)) in ZERO_WIDTH_CATEGORIES for code in glyph_codes):
+            continue
+        strays.append((name, advance, min(glyph_codes) if glyph_codes else None))
+    return strays
+
+
+def hmtx_glyph_order(_font):
+    '''最も多い送り幅のグリフを末尾にまとめたグリフ順（それぞれの中はコードポイント順）
+
+    hmtx は末尾の同じ送り幅の並びを省略できる（numberOfHMetrics 以降は左サイドベアリングのみ）。
+    CJKのブロックはすべて全角なので、cmap の連続範囲もほとんど崩れない。
+    '''
+    metrics = _font['hmtx'].metrics
+    order = codepoint_glyph_order(_font)
+    head = leading_unencoded_glyphs(_font)
+    body = order[len(head):]
+    dominant = Counter(metrics[name][0] for name in body).most_common(1)[0][0]
+    return (head
+            + [name for name in body if metrics[name][0] != dominant]
+            + [name for name in body if metrics[name][0] == dominant])
+
+
+def optimize_hmtx(_font, _width_classes=DEFAULT_WIDTH_CLASSES):
+    '''送り幅を検査し、hmtx が小さくなるようグリフを並べ替える
+
+    半角・全角以外の送り幅のグリフがあれば ValueError。
+    '''
+    strays = stray_widths(_font, _width_classes)
+    if strays:
+        lines = ['  {} width={}{}'.format(name, advance, ' (U+{:04X})'.format(code) if code is not None else '')
+                 for name, advance, code in strays]
+        raise ValueError('{} glyphs have a width other than {}:\n{}'.format(
+            len(strays), _width_classes, '\n'.join(lines)))
+
+    for tag in FONTFORGE_PRIVATE_TABLES:
+        if tag in _font:
+            del _font[tag]
+    reorderGlyphs(_font, hmtx_glyph_order(_font))
+    # compile() で numberOfHMetrics が更新される
+    return len(_font['hmtx'].compile(_font))
+
+
+def hmtx(_fontpath, _width_classes=DEFAULT_WIDTH_CLASSES):
+    '''フォントファイルの送り幅を検査し、hmtxを小さくして上書き保存する'''
+    font = TTFont(_fontpath)
+    before = font['hhea'].numberOfHMetrics
+    size = optimize_hmtx(font, _width_classes)
+    after = font['hhea'].numberOfHMetrics
+    save_font(font, _fontpath)
+    print('hmtx: {} (numberOfHMetrics {} -> {}, {} bytes)'.format(_fontpath, before, after, size))
+    return after
+
+
+def cmap_summary(_font):
+    '''cmapサブテーブルごとの (platformID, platEncID, format, 範囲数)'''
+    summary = []
+    for table in _font['cmap'].tables:
+        codes = sorted(table.cmap)
+        runs = 0
+        previous = None
+        for code in codes:
+            gid = _font.getGlyphID(table.cmap[code])
+            if previous is None or code != previous[0] + 1 or gid != previous[1] + 1:
+                runs += 1
+            previous = (code, gid)
+        summary.append((table.platformID, table.platEncID, table.format, runs))
+    return summary
+
+
+def optimize_cmap(_font, _drop_format4=False):
+    '''グリフをコードポイント順に並べ替え、cmapの format 4 セグメント・format 12 グループを少なくする
+
+    _drop_format4=True なら、format 12 があるとき format 4 を削除する
+    （古いWindows(GDI)は (3,1) の format 4 を使うので既定では残す）。
+    '''
+    for tag in FONTFORGE_PRIVATE_TABLES:
+        if tag in _font:
+            del _font[tag]
+
+    reorderGlyphs(_font, codepoint_glyph_order(_font))
+
+    cmap = _font['cmap']
+    if _drop_format4 and any(table.format == 12 for table in cmap.tables):
+        cmap.tables = [table for table in cmap.tables if table.format != 4]
+    return cmap_summary(_font)
+
+
+def cmap(_fontpath, _drop_format4=False):
+    '''フォントファイルのグリフ順とcmapを最適化して上書き保存する'''
+    font = TTFont(_fontpath)
+    before = cmap_summary(font)
+    after = optimize_cmap(font, _drop_format4)
+    save_font(font, _fontpath)
+
+    print('cmap: {}'.format(_fontpath))
+    runs_before = {key[:3]: key[3] for key in before}
+    for platform_id, encoding_id, format, runs in after:
+        print('  ({}, {}) format {:>2}: {} -> {} runs'.format(
+            platform_id, encoding_id, format, runs_before.get((platform_id, encoding_id, format)), runs))
+    return after
+
+
+def rename_font(_font, _label):
+    '''ファミリー名にラベルを加え、別のフォントとしてインストール・選択できる名前にする
+
+    ID 1/16（ファミリー名）の末尾に「 <ラベル>」、ID 3/4（固有名・フル名）の中のファミリー名にも
+    同じものを加える。ID 6（PostScript名）には空白などを除いたラベルを加える。
+    例: Utatane / Utatane-Regular -> Utatane JIS0208 / UtataneJIS0208-Regular
+    '''
+    name = _font['name']
+    family = name.getDebugName(16) or name.getDebugName(1)
+    ps_family = name.getDebugName(6).split('-', 1)[0]
+    ps_label = re.sub('[^A-Za-z0-9]', '', _label)
+    for record in name.names:
+        value = record.toUnicode()
+        if record.nameID in (1, 16):
+            value = '{} {}'.format(value, _label)
+        elif record.nameID in (3, 4):
+            value = value.replace(family, '{} {}'.format(family, _label), 1)
+        elif record.nameID == 6:
+            value = value.replace(ps_family, ps_family + ps_label, 1)
+        else:
+            continue
+        record.string = value
+    return _font
+
+
+def rename(_fontpath, _label):
+    '''フォントファイルの名前にラベルを加えて上書き保存する（部分集合版を通常版と区別する）'''
+    font = TTFont(_fontpath)
+    rename_font(font, _label)
+    save_font(font, _fontpath)
+    print('rename: {} ({})'.format(_fontpath, font['name'].getDebugName(4)))
+    return _fontpath
+
+
+def restricted_face(_basepath, _variant):
+    '''部分集合版を、通常版のグリフのまま cmap と name だけ部分集合版に合わせたフェイスにする
+
+    glyf/loca/hmtx/maxp などグリフ番号にひもづくテーブルは通常版と同じ内容になるので、
+    TTC では通常版のものを共有できる（輪郭は1回だけ格納される）。
+    '''
+    codes = set(_variant.getBestCmap())
+    face = TTFont(_basepath)
+    for subtable in face['cmap'].tables:
+        subtable.cmap = {code: name for code, name in subtable.cmap.items() if code in codes}
+    face['name'] = _variant['name']
+    return face
+
+
+def ttc(_output, _fontpaths):
+    '''同じウェイトのバリエーションを1つのTrueType Collectionにまとめる
+
+    内容が同じテーブルは1つだけ格納して共有する。先頭のフォントの文字の部分集合になっている
+    バリエーション（部分集合版）は restricted_face() で通常版のグリフを使うフェイスに置き換えるので、
+    glyf/loca/hmtx なども通常版と共有される。それ以外のバリエーションはそのまま格納する。
+    フル名・PostScript名が同じフェイスがあると選び分けられないので ValueError。
+    '''
+    base_codes = set(TTFont(_fontpaths[0], lazy=True).getBestCmap())
+    fonts = [TTFont(_fontpaths[0])]
+    for path in _fontpaths[1:]:
+        variant = TTFont(path)
+        if set(variant.getBestCmap()) <= base_codes:
+            fonts.append(restricted_face(_fontpaths[0], variant))
+            variant.close()
+        else:
+            fonts.append(variant)
+
+    seen = {}
+    for path, font in zip(_fontpaths, fonts):
+        for name_id in (4, 6):
+            key = (name_id, font['name'].getDebugName(name_id))
+            if key in seen:
+                raise ValueError('{} and {} have the same name ID {}: {!r}'.format(
+                    seen[key], path, name_id, key[1]))
+            seen[key] = path
+
+    collection = TTCollection()
+    collection.fonts = fonts
+    tmp_path = _output + '.tmp'
+    collection.save(tmp_path, shareTables=True)
+    collection.close()
+    os.replace(tmp_path, _output)
+
+    total = sum(os.path.getsize(path) for path in _fontpaths)
+    size = os.path.getsize(_output)
+    print('ttc: {} ({} fonts, {} -> {} bytes, {:.0%})'.format(
+        _output, len(_fontpaths), total, size, size / total if total else 0))
+    return _output
+
+
+def parse_widths(_text):
+    '''"500,1000" を送り幅のタプルにする'''
+    return tuple(int(width) for width in _text.split(','))
+
+
+def parse_ppem_range(_text):
+    '''"8-64" や "12" をppemのリストにする'''
+    start, _, end = _text.partition('-')
+    return list(range(int(start), int(end or start)+1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成後のフォントファイルの仕上げ処理')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    tables_parser = subparsers.add_parser('tables', help='hdmx・LTSH・VDMXを追加')
+    tables_parser.add_argument('fonts', nargs='+', help='対象のTTF（上書き）')
+    tables_parser.add_argument('--ppem', type=parse_ppem_range, default=DEFAULT_PPEMS,
+                               help='対象のppem範囲（例: 8-64）')
+
+    cmap_parser = subparsers.add_parser('cmap', help='グリフをコードポイント順に並べ替えてcmapを小さくする')
+    cmap_parser.add_argument('fonts', nargs='+', help='対象のTTF（上書き）')
+    cmap_parser.add_argument('--drop-format4', action='store_true',
+                             help='format 12 があるとき format 4 を削除する')
+
+    hmtx_parser = subparsers.add_parser('hmtx', help='送り幅を検査し、hmtxが小さくなるよう並べ替える')
+    hmtx_parser.add_argument('fonts', nargs='+', help='対象のTTF（上書き）')
+    hmtx_parser.add_argument('--widths', type=parse_widths, default=DEFAULT_WIDTH_CLASSES,
+                             help='許す送り幅（例: 500,1000）')
+
+    rename_parser = subparsers.add_parser('rename', help='ファミリー名にラベルを加える')
+    rename_parser.add_argument('label', help='加えるラベル（例: JIS0208）')
+    rename_parser.add_argument('fonts', nargs='+', help='対象のTTF（上書き）')
+
+    ttc_parser = subparsers.add_parser('ttc', help='TrueType Collection (.ttc) にまとめる')
+    ttc_parser.add_argument('output', help='出力する .ttc')
+    ttc_parser.add_argument('fonts', nargs='+', help='まとめるTTF')
+
+    args = parser.parse_args()
+
+    if args.command == 'tables':
+        for path in args.fonts:
+            try:
+                tables(path, args.ppem)
+            except ValueError as e:
+                print('{}: {}'.format(path, e))
+                return 1
+    elif args.command == 'cmap':
+        for path in args.fonts:
+            cmap(path, args.drop_format4)
+    elif args.command == 'hmtx':
+        for path in args.fonts:
+            try:
+                hmtx(path, args.widths)
+            except ValueError as e:
+                print('{}: {}'.format(path, e))
+                return 1
+    elif args.command == 'rename':
+        for path in args.fonts:
+            rename(path, args.label)
+    elif args.command == 'ttc':
+        try:
+            ttc(args.output, args.fonts)
+        except ValueError as e:
+            print('{}: {}'.format(args.output, e))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
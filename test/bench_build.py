@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ビルド処理のベンチマーク (FontForge専用)
+
+utatane.py のビルド処理（modify_and_save_jp, improved_width_adjustment, post_process）を
+固定のグリフ部分集合（ASCII・罫線・ブロック要素・漢字1000字）で実行し、
+処理時間と最大メモリ使用量を計測する。
+
+- 部分集合フォントは元フォントの内容ハッシュごとに tmp/cache/bench/ に保存し、再利用する
+- 計測結果は tmp/bench/history.jsonl に1行ずつ追記する
+- tmp/bench/baseline.json の基準値よりしきい値以上遅く（重く）なった処理があれば終了コード1
+
+各処理は fork した子プロセスで実行するため、メモリ使用量は処理ごとの最大値になる。
+post_process は build_font と同じく、加工済みの英字・日本語フォントをマージしたものに対して計測する
+（マージまでの準備は計測に含めない）。
+
+    fontforge -lang=py -script test/bench_build.py                    # 計測して基準と比較
+    fontforge -lang=py -script test/bench_build.py --update-baseline  # 今回の結果を基準にする
+    fontforge -lang=py -script test/bench_build.py --stage post_process --repeat 5
+"""
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import fontforge
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# utatane.py は LICENSE.txt などをカレントディレクトリから読む
+os.chdir(BASE_DIR)
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'analysis'))
+import utatane
+from font_catalog import get_catalog
+
+BENCH_DIR = os.path.join(BASE_DIR, 'tmp', 'bench')
+HISTORY_PATH = os.path.join(BENCH_DIR, 'history.jsonl')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# 部分集合に含める漢字の数（CJK統合漢字の先頭から、フォントにあるもの）
+KANJI_COUNT = 1000
+SUBSET_VERSION = 1
+
+STAGES = ['modify_and_save_jp', 'improved_width_adjustment', 'post_process']
+
+# 基準値からの増加率がこれを超えたら回帰とみなす
+THRESHOLDS = {
+    'seconds': 0.20,
+    'max_rss_kb': 0.20,
+}
+
+
+def bench_codes(font):
+    """部分集合に含めるコードポイント（ASCII・罫線・ブロック要素・漢字）"""
+    codes = list(range(0x21, 0x7E + 1)) + utatane.RULED_LINES + utatane.BLOCK_ELEMENTS
+    kanji = [code for code in utatane.FULLWIDTH_CJK_UNIFIED if code in font]
+    return codes + kanji[:KANJI_COUNT]
+
+
+def subset_font(source_path):
+    """元フォントから部分集合フォント（.sfd）を作る（内容ハッシュごとにキャッシュ）"""
+    suffix = f'-bench{SUBSET_VERSION}-{KANJI_COUNT}.sfd'
+    path = get_catalog().cache_path(source_path, 'bench', suffix)
+    if os.path.exists(path):
+        return path
+
+    print(f'部分集合フォントを作成: {source_path}')
+    font = fontforge.open(source_path)
+    font.selection.none()
+    for code in bench_codes(font):
+        if code in font:
+            font.selection.select(('more', 'unicode'), code)
+    # 削除するグリフへの参照が残らないよう、残すグリフの参照を輪郭にしておく
+    font.unlinkReferences()
+    font.selection.invert()
+    for glyph in list(font.selection.byGlyphs):
+        font.removeGlyph(glyph)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path[:-len('.sfd')] + '.tmp.sfd'
+    font.save(tmp_path)
+    font.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def prepare_subsets(font_info):
+    """ベンチマーク対象の部分集合フォント {'latin': path, 'japanese': path, 'mplus': path}"""
+    return {key: subset_font(os.path.join(utatane.SOURCE, font_info[key]))
+            for key in ('latin', 'japanese', 'mplus')}
+
+
+def with_subsets(font_info, subsets, func, *args):
+    """utatane.SOURCE を部分集合フォントの置き場所に切り替えて func(部分集合版の設定, *args) を呼ぶ"""
+    source = utatane.SOURCE
+    utatane.SOURCE = os.path.dirname(subsets['japanese'])
+    bench_info = dict(font_info, **{key: os.path.basename(path) for key, path in subsets.items()})
+    try:
+        return func(bench_info, *args)
+    finally:
+        utatane.SOURCE = source
+
+
+def stage_modify_and_save_jp(font_info, subsets):
+    """modify_and_save_jp を部分集合フォントで実行した時間"""
+    savepath = os.path.join(BENCH_DIR, 'jp_font.sfd')
+    start = time.perf_counter()
+    with_subsets(font_info, subsets, utatane.modify_and_save_jp, savepath)
+    return time.perf_counter() - start
+
+
+def stage_improved_width_adjustment(font_info, subsets):
+    """ビルドと同じ幅の決め方（policy_width）で全グリフを幅調整する時間（フォントを開く時間は含まない）"""
+    font = fontforge.open(subsets['japanese'])
+    glyphs = [g for g in font.glyphs() if g.isWorthOutputting()]
+    for g in glyphs:
+        # modify_and_save_jp と同じく、幅を決める前に縮小しておく
+        g.transform(utatane.JP_REDUCTION_MAT)
+    policy = utatane.width_policy.WidthPolicy(ambiguous=utatane.AMBIGUOUS_CELLS)
+    start = time.perf_counter()
+    for g in glyphs:
+        width, _ = utatane.policy_width(g, policy)
+        utatane.fit_to_width(g, width)
+        utatane.improved_width_adjustment(g, width)
+    elapsed = time.perf_counter() - start
+    font.close()
+    return elapsed
+
+
+def merged_font(font_info, subsets):
+    """build_font と同じく、加工済みの英字・日本語フォントをマージしたフォント（post_process の入力）"""
+    en_path = os.path.join(BENCH_DIR, 'en_font.sfd')
+    jp_path = os.path.join(BENCH_DIR, 'jp_font.sfd')
+    with_subsets(font_info, subsets, utatane.modify_and_save_latin, en_path)
+    with_subsets(font_info, subsets, utatane.modify_and_save_jp, jp_path)
+
+    font = fontforge.font()
+    font = utatane.set_height(font)
+    font.mergeFonts(en_path)
+    font.mergeFonts(jp_path)
+    return utatane.vertical_line_to_broken_bar(font)
+
+
+def stage_post_process(font_info, subsets):
+    """マージ後のフォントに対する post_process（重なり除去・丸め・ヒンティング）の時間"""
+    font = merged_font(font_info, subsets)
+    start = time.perf_counter()
+    utatane.post_process(font)
+    elapsed = time.perf_counter() - start
+    font.close()
+    return elapsed
+
+
+STAGE_FUNCTIONS = {
+    'modify_and_save_jp': stage_modify_and_save_jp,
+    'improved_width_adjustment': stage_improved_width_adjustment,
+    'post_process': stage_post_process,
+}
+
+
+def _run_stage(stage, font_info, subsets):
+    """子プロセス内で1回計測する -> (秒, 最大常駐メモリKB)"""
+    seconds = STAGE_FUNCTIONS[stage](font_info, subsets)
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_stage(stage, font_info, subsets, repeat):
+    """repeat 回計測し、最短時間と最大メモリを返す"""
+    ctx = multiprocessing.get_context('fork')
+    samples = []
+    for _ in range(repeat):
+        with ctx.Pool(1) as pool:
+            samples.append(pool.apply(_run_stage, (stage, font_info, subsets)))
+    return {
+        'seconds': round(min(s for s, _ in samples), 4),
+        'max_rss_kb': max(m for _, m in samples),
+    }
+
+
+def find_regressions(stages, baseline_stages, thresholds):
+    """基準値からしきい値を超えて増えた項目 -> [(処理, 項目, 基準値, 今回, 増加率)]"""
+    regressions = []
+    for stage, result in stages.items():
+        base = baseline_stages.get(stage)
+        if not base:
+            continue
+        for metric, threshold in thresholds.items():
+            if not base.get(metric):
+                continue
+            ratio = result[metric] / base[metric] - 1
+            if ratio > threshold:
+                regressions.append((stage, metric, base[metric], result[metric], ratio))
+    return regressions
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def append_history(record):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    with open(HISTORY_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(stages, baseline_stages):
+    print(f"\n{'処理':<28} {'時間(秒)':>10} {'基準':>10} {'メモリ(MB)':>11} {'基準':>9}")
+    for stage, result in stages.items():
+        base = baseline_stages.get(stage, {})
+        base_seconds = f"{base['seconds']:.3f}" if 'seconds' in base else '-'
+        base_rss = f"{base['max_rss_kb'] / 1024:.1f}" if 'max_rss_kb' in base else '-'
+        print(f"{stage:<28} {result['seconds']:>10.3f} {base_seconds:>10} "
+              f"{result['max_rss_kb'] / 1024:>11.1f} {base_rss:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ビルド処理のベンチマーク')
+    parser.add_argument('--stage', action='append', choices=STAGES,
+                        help='計測する処理（複数指定可能、省略時はすべて）')
+    parser.add_argument('--weight', choices=['regular', 'bold'], default='regular',
+                        help='計測に使うフォント設定')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='各処理の計測回数（最短時間を採用）')
+    parser.add_argument('--threshold', type=float,
+                        help='回帰とみなす増加率（例: 0.2 で20%%、省略時は時間・メモリとも既定値）')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='今回の結果を基準値として保存')
+    args = parser.parse_args()
+
+    font_info = utatane.fonts[0 if args.weight == 'regular' else 1]
+    stages = args.stage or STAGES
+    thresholds = {metric: args.threshold for metric in THRESHOLDS} if args.threshold is not None \
+        else THRESHOLDS
+
+    subsets = prepare_subsets(font_info)
+    subset_key = ','.join(os.path.basename(path) for path in subsets.values())
+
+    results = {}
+    for stage in stages:
+        utatane.timestamped_log(f'計測中: {stage}')
+        results[stage] = run_stage(stage, font_info, subsets, args.repeat)
+
+    baseline = load_baseline()
+    baseline_stages = {}
+    if baseline and baseline.get('subset') == subset_key and baseline.get('weight') == args.weight:
+        baseline_stages = baseline['stages']
+    elif baseline:
+        print('基準値の部分集合・フォント設定が今回と異なるため比較しません')
+
+    regressions = find_regressions(results, baseline_stages, thresholds)
+    print_results(results, baseline_stages)
+
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'weight': args.weight,
+        'subset': subset_key,
+        'repeat': args.repeat,
+        'stages': results,
+        'regressions': [stage for stage, *_ in regressions],
+    }
+    append_history(record)
+
+    if args.update_baseline or not baseline_stages:
+        merged = dict(baseline_stages, **results)
+        save_json(BASELINE_PATH, dict(record, stages=merged, regressions=[]))
+        print(f'\n基準値を保存しました: {os.path.relpath(BASELINE_PATH, BASE_DIR)}')
+        return 0
+
+    if regressions:
+        print('\n性能低下を検出しました:')
+        for stage, metric, base, current, ratio in regressions:
+            print(f'  {stage}: {metric} {base} -> {current} (+{ratio:.0%}, しきい値 {thresholds[metric]:.0%})')
+        return 1
+
+    print('\n性能低下はありません')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,35 +10,15 @@ import os
 import sys
 import argparse
 import subprocess
-import glob
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analysis'))
+from font_catalog import get_catalog
+
 
 def find_available_fonts():
-    """利用可能なフォントファイルを検索"""
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    patterns = [
-        "dist/*.ttf",
-        "dist/*/*.ttf", 
-        "sourceFonts/*.ttf"
-    ]
-    
-    fonts = {}
-    for pattern in patterns:
-        for font_path in glob.glob(os.path.join(base_dir, pattern)):
-            rel_path = os.path.relpath(font_path, base_dir)
-            font_name = os.path.splitext(os.path.basename(font_path))[0]
-            
-            # バージョン情報を含む場合
-            dir_name = os.path.dirname(rel_path)
-            if dir_name and dir_name != 'dist' and dir_name != 'sourceFonts':
-                key = f"{os.path.basename(dir_name)}_{font_name}"
-            else:
-                key = font_name
-                
-            fonts[key] = rel_path
-    
-    return fonts
+    """利用可能なフォントファイルを検索（analysis/font_catalog.py の索引を使用）"""
+    return get_catalog().fonts()
 
 
 def get_fontforge_command():
@@ -100,12 +80,53 @@ def run_matplotlib_comparison(args):
         os.chdir(current_dir)
 
 
+def run_server_comparison(args):
+    """解析サーバ (analysis/font_analysis_server.py) に幅を問い合わせて比較"""
+    from font_analysis_client import AnalysisClient
+
+    try:
+        with open(args.test_file, 'r', encoding='utf-8') as f:
+            chars = sorted({c for c in f.read() if c.isprintable() and ord(c) > 32})
+    except OSError as e:
+        print(f"テストファイル読み込みエラー: {e}")
+        return 1
+
+    client = AnalysisClient(args.server)
+    try:
+        widths = client.width([f"U+{ord(c):04X}" for c in chars], [args.font1, args.font2])
+    except (OSError, RuntimeError) as e:
+        print(f"解析サーバに問い合わせできません ({args.server}): {e}")
+        print("起動例: fontforge -lang=py -script analysis/font_analysis_server.py")
+        return 1
+    finally:
+        client.close()
+
+    diffs = []
+    for c in chars:
+        w = widths[f"U+{ord(c):04X}"]
+        w1, w2 = w[args.font1], w[args.font2]
+        if w1 != w2:
+            diffs.append((c, w1, w2))
+
+    lines = [f"比較文字数: {len(chars)}  幅の違い: {len(diffs)}"]
+    for c, w1, w2 in diffs:
+        lines.append(f"  U+{ord(c):04X} '{c}'  {w1} -> {w2}")
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser(description='フォント比較統一ツール')
     parser.add_argument('--list-fonts', action='store_true',
                         help='利用可能なフォントを一覧表示')
-    parser.add_argument('--method', choices=['fontforge', 'matplotlib', 'both'], 
+    parser.add_argument('--method', choices=['fontforge', 'matplotlib', 'both', 'server'], 
                         default='fontforge', help='比較方法')
+    parser.add_argument('--server', default='http://127.0.0.1:8765',
+                        help='--method server で使う解析サーバのURL')
     parser.add_argument('--font1', '-f1', help='比較元フォント')
     parser.add_argument('--font2', '-f2', help='比較先フォント')
     parser.add_argument('--test-file', '-t', default='test/font_disp.txt',
@@ -173,6 +194,9 @@ def main():
     elif args.method == 'matplotlib':
         return run_matplotlib_comparison(args)
     
+    elif args.method == 'server':
+        return run_server_comparison(args)
+    
     elif args.method == 'both':
         print("\n=== FontForge比較 ===")
         fontforge_result = run_fontforge_comparison(args, fontforge_cmd)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+フォントごとの輪郭キャッシュ
+
+get_glyph_data() の結果（輪郭・幅・バウンディングボックスなど）をフォントごとに保存し、
+次回以降はFontForgeでフォントを開かずに読み出す。
+M+ ややさしさゴシックのように実行ごとに変わらない元フォントで効果が大きい。
+
+キャッシュはチャンク形式の .utgd（glyph_data_format.py）で、
+tmp/cache/contours/<フォント内容ハッシュ>.utgd に保存する。
+フォントの内容が変わればハッシュも変わるため、古いキャッシュは使われない。
+存在しないグリフも「なし」として記録するので、同じ範囲を再度調べるときも開き直さない。
+読み出しは GlyphDataReader（標準ライブラリのみ）で必要なチャンクだけを読むので、
+numpy の無いFontForge付属Pythonでも動き、メモリ使用量も範囲の大きさによらない。
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analysis'))
+from font_catalog import get_catalog
+from glyph_data_format import GlyphDataReader, GlyphDataWriter
+
+CACHE_VERSION = 1
+CACHE_KEY = 'glyph'
+
+
+class ContourCache:
+    """1フォント分の輪郭キャッシュ
+
+    font_path のフォントは必要になったとき（キャッシュに無いグリフがあるとき）だけ開く。
+    """
+
+    def __init__(self, font_path, read_glyph):
+        """read_glyph(font, unicode_val) はグリフ情報のdict（グリフが無ければNone）を返す関数"""
+        self.font_path = str(font_path)
+        self.read_glyph = read_glyph
+        self.path = get_catalog().cache_path(self.font_path, 'contours', '.utgd')
+        self.info = None
+        self.reader = None
+        self.pending = {}  # 追記したがまだファイルに書き出されていないグリフ（1チャンク分まで）
+        self.cached_codes = set()
+        self.font = None
+        self.writer = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            reader = GlyphDataReader(self.path)
+        except (OSError, ValueError, KeyError):
+            return
+        if reader.metadata.get('cache_version') != CACHE_VERSION or CACHE_KEY not in reader.fonts:
+            return
+        self.reader = reader
+        self.info = reader.fonts[CACHE_KEY]
+        self.cached_codes = set(reader.codes())
+
+    def open_font(self):
+        """FontForgeでフォントを開く（開いたものは使い回す）"""
+        if self.font is None:
+            import fontforge
+            self.font = fontforge.open(self.font_path)
+        return self.font
+
+    def _open_writer(self, font):
+        """キャッシュファイルへの追記を開始（実行中は開いたままにし、close()で索引を書く）"""
+        self.info = {
+            'fontname': font.fontname,
+            'ascent': float(font.ascent),
+            'descent': float(font.descent)
+        }
+        append = bool(self.cached_codes) and os.path.exists(self.path)
+        if not append:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        metadata = {'cache_version': CACHE_VERSION, 'font': self.font_path, 'glyph_list': [],
+                    'total_glyphs': 0}
+        self.writer = GlyphDataWriter(self.path, metadata, {CACHE_KEY: self.info}, append=append)
+
+    def count_cached(self, glyph_list):
+        return sum(1 for code in glyph_list if code in self.cached_codes)
+
+    def fill(self, glyph_list):
+        """キャッシュに無いグリフをフォントから読み込んで追記する。読み込んだ件数を返す"""
+        missing = [code for code in glyph_list if code not in self.cached_codes]
+        if not missing and self.info is not None:
+            return 0
+
+        font = self.open_font()
+        if self.writer is None:
+            self._open_writer(font)
+        for code in missing:
+            glyph_data = self.read_glyph(font, code)
+            flushed = len(self.writer.chunks)
+            self.writer.add(code, {CACHE_KEY: glyph_data})
+            self.pending[code] = glyph_data
+            self.cached_codes.add(code)
+            if len(self.writer.chunks) != flushed:
+                # チャンクが書き出されたので、以降はファイルから読む
+                self._refresh_reader()
+        return len(missing)
+
+    def _refresh_reader(self):
+        if self.reader is None:
+            self.reader = GlyphDataReader(self.path)
+        else:
+            self.reader.refresh()
+        self.pending = {}
+
+    def get(self, unicode_val):
+        """グリフ情報（輪郭は点リストのリスト）。グリフが無ければNone"""
+        if unicode_val in self.pending:
+            return self.pending[unicode_val]
+        if self.reader is None:
+            return None
+        return self.reader.get(unicode_val, CACHE_KEY)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.font is not None:
+            self.font.close()
+            self.font = None
+
+
+class UncachedFont:
+    """キャッシュを使わない場合の ContourCache 互換クラス（毎回フォントから読む）"""
+
+    def __init__(self, font_path, read_glyph):
+        self.font_path = str(font_path)
+        self.read_glyph = read_glyph
+        self.info = None
+        self.font = None
+
+    def fill(self, glyph_list):
+        import fontforge
+        if self.font is None:
+            self.font = fontforge.open(self.font_path)
+            self.info = {
+                'fontname': self.font.fontname,
+                'ascent': float(self.font.ascent),
+                'descent': float(self.font.descent)
+            }
+        return len(glyph_list)
+
+    def open_font(self):
+        self.fill([])
+        return self.font
+
+    def count_cached(self, glyph_list):
+        return 0
+
+    def get(self, unicode_val):
+        return self.read_glyph(self.font, unicode_val)
+
+    def close(self):
+        if self.font is not None:
+            self.font.close()
+            self.font = None
+
+
+def open_font_sources(font_paths, read_glyph, use_cache=True):
+    """フォントキー -> グリフ取得元（ContourCache、use_cache=False なら UncachedFont）
+
+    内容が同じフォントは同じキャッシュファイルになるため、1つのキャッシュを共有する。
+    """
+    if not use_cache:
+        return {key: UncachedFont(path, read_glyph) for key, path in font_paths.items()}
+    caches = {}
+    sources = {}
+    for key, path in font_paths.items():
+        cache = ContourCache(path, read_glyph)
+        sources[key] = caches.setdefault(cache.path, cache)
+    return sources
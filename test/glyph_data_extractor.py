@@ -5,7 +5,13 @@
 グリフデータ抽出ツール (FontForge専用)
 
 3つのフォント（M+、やさしさゴシック、Utatane）からグリフデータを抽出し、
-JSONファイルに出力する。後で別のスクリプトで可視化する。
+ファイルに出力する。後で別のスクリプトで可視化する。
+出力形式は拡張子で切り替える（.json: JSON、それ以外: バイナリ形式 .utgd）。
+--output - を指定すると、グリフごとにストリーム形式で標準出力へ書き出す
+（ログは標準エラーへ）。可視化側は抽出と並行して描画できる:
+
+    fontforge -lang=py -script test/glyph_data_extractor.py --output - | \
+        uv run python test/glyph_visualizer.py - --output out.pdf
 """
 
 import fontforge
@@ -15,6 +21,11 @@ import argparse
 import json
 from pathlib import Path
 
+from glyph_data_format import (GlyphDataWriter, is_binary_path,
+                               write_stream_header, write_stream_record, write_stream_end)
+from glyph_hash_index import changed_codepoints, load_hash_index
+from glyph_contour_cache import open_font_sources
+
 # 判定ロジック副作用の184件グリフリスト
 PROBLEMATIC_GLYPHS = {
     'ipa': [0x025D, 0x026F, 0x0270, 0x0271, 0x0276, 0x0277, 0x028D, 0x0298,
@@ -46,18 +57,12 @@ def get_default_fonts():
     return {
         'mplus': base_dir / 'sourceFonts' / 'mplus-1m-regular.ttf',
         'yasashisa': base_dir / 'sourceFonts' / 'YasashisaGothicBold-V2.ttf', 
-        'utatane': base_dir / 'dist' / 'Utatane-Regular.ttf'
+        'utatane': base_dir / 'dist' / 'Utatane-Regular.ttf',
+        'ubuntu': base_dir / 'sourceFonts' / 'UbuntuMono-Regular_modify.ttf'
     }
 
-def load_font_safely(font_path):
-    """フォントを安全に読み込み"""
-    try:
-        if not os.path.exists(font_path):
-            return None, f"フォントファイルが見つかりません: {font_path}"
-        font = fontforge.open(str(font_path))
-        return font, None
-    except Exception as e:
-        return None, f"フォント読み込みエラー: {e}"
+# 比較パネルには出さず、--skip-unchanged の判定にだけ使うフォント（無ければ読まない）
+REFERENCE_FONT_KEYS = ['ubuntu']
 
 def get_glyph_data(font, unicode_val):
     """グリフのデータを取得"""
@@ -93,22 +98,61 @@ def get_glyph_data(font, unicode_val):
         'exists': True
     }
 
-def extract_font_data(font, glyph_list):
+def extract_font_data(source, glyph_list):
     """フォントからグリフデータを抽出"""
-    font_data = {
-        'fontname': font.fontname,
-        'ascent': float(font.ascent),
-        'descent': float(font.descent),
-        'glyphs': {}
-    }
+    font_data = dict(source.info, glyphs={})
     
     for unicode_val in glyph_list:
-        glyph_data = get_glyph_data(font, unicode_val)
+        glyph_data = source.get(unicode_val)
         if glyph_data:
             font_data['glyphs'][str(unicode_val)] = glyph_data
     
     return font_data
 
+def iter_glyph_records(sources, glyph_list, batch_size=64):
+    """コードポイントごとに全フォントのグリフデータを順に返す（ストリーム出力用）
+
+    キャッシュに無いグリフは batch_size 件ずつフォントから読むため、出力側は待たずに処理を始められる。
+    """
+    for start in range(0, len(glyph_list), batch_size):
+        batch = glyph_list[start:start + batch_size]
+        for source in sources.values():
+            source.fill(batch)
+        for unicode_val in batch:
+            yield unicode_val, {
+                font_key: source.get(unicode_val) for font_key, source in sources.items()
+            }
+
+def stream_glyph_data(out, sources, metadata):
+    """グリフデータをストリーム形式で書き出す（1グリフごとにflush）"""
+    glyph_list = metadata['glyph_list']
+    write_stream_header(out, metadata, {
+        font_key: source.info for font_key, source in sources.items()
+    })
+    count = 0
+    for unicode_val, glyphs in iter_glyph_records(sources, glyph_list):
+        write_stream_record(out, unicode_val, glyphs)
+        count += 1
+        if count % 100 == 0:
+            print(f"進捗: {count}/{len(glyph_list)} グリフ送信")
+    write_stream_end(out, count)
+
+def write_glyph_data_chunked(path, sources, metadata, append=False):
+    """グリフデータをチャンク単位で逐次書き出す（メモリ使用量は範囲の大きさによらず一定）
+
+    append=True では既存ファイルに書き込み済みのグリフを飛ばして続きから抽出する。
+    """
+    glyph_list = metadata['glyph_list']
+    font_infos = {font_key: source.info for font_key, source in sources.items()}
+    with GlyphDataWriter(path, metadata, font_infos, append=append) as writer:
+        todo = [code for code in glyph_list if code not in writer.existing_codes]
+        if writer.existing_codes:
+            print(f"既存のデータ {len(writer.existing_codes)}件 に追記します（残り {len(todo)}件）")
+        for count, (unicode_val, glyphs) in enumerate(iter_glyph_records(sources, todo), 1):
+            writer.add(unicode_val, glyphs)
+            if count % 1000 == 0:
+                print(f"進捗: {count}/{len(todo)} グリフ抽出")
+
 def read_test_file_chars(test_file_path, section=None):
     """テストファイルから文字を読み込み"""
     if not os.path.exists(test_file_path):
@@ -209,6 +253,15 @@ def get_glyph_selection(args):
     
     return sorted(selected_glyphs)
 
+def resolve_baseline_path(baseline, utatane_path):
+    """前回ビルドの指定（ファイルまたは dist/v1.3.1 のようなディレクトリ）からフォントパスを決める"""
+    baseline = Path(baseline)
+    if baseline.is_dir():
+        baseline = baseline / Path(utatane_path).name
+    if not baseline.exists():
+        return None
+    return baseline
+
 def main():
     parser = argparse.ArgumentParser(description='グリフデータ抽出ツール')
     
@@ -216,6 +269,7 @@ def main():
     parser.add_argument('--mplus', help='M+フォントパス')
     parser.add_argument('--yasashisa', help='やさしさゴシックフォントパス')
     parser.add_argument('--utatane', help='Utataneフォントパス')
+    parser.add_argument('--ubuntu', help='Ubuntu Monoフォントパス（英数字が変更なしかの判定用）')
     
     # グリフ選択
     parser.add_argument('--category', action='append', 
@@ -233,15 +287,28 @@ def main():
     parser.add_argument('--range', action='append', metavar='U+XXXX-U+YYYY',
                        help='Unicode範囲指定（U+2400-U+2425形式、複数指定可能）')
     parser.add_argument('--chars', help='文字直接指定')
+    parser.add_argument('--baseline', metavar='PATH',
+                       help='前回ビルドのフォントまたはディレクトリ（例: dist/v1.3.1）。'
+                            'Utataneの輪郭・幅が変わったグリフだけを出力')
     
     # 出力設定
-    parser.add_argument('--output', '-o', default='glyph_data.json',
-                       help='JSON出力ファイル名')
+    parser.add_argument('--output', '-o', default='glyph_data.utgd',
+                       help='出力ファイル名（.json ならJSON、- なら標準出力へストリーム、それ以外はバイナリ形式）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='輪郭キャッシュ（tmp/cache/contours）を使わずフォントから読む')
+    parser.add_argument('--append', action='store_true',
+                       help='既存のバイナリ出力に追記（中断した抽出の続きから再開）')
     parser.add_argument('--list-categories', action='store_true',
                        help='利用可能なカテゴリ一覧表示')
     
     args = parser.parse_args()
     
+    # ストリーム出力時は標準出力をデータ専用にし、ログは標準エラーへ
+    stream_out = None
+    if args.output == '-':
+        stream_out = sys.stdout
+        sys.stdout = sys.stderr
+    
     # カテゴリ一覧表示
     if args.list_categories:
         print("利用可能なカテゴリ:")
@@ -256,19 +323,18 @@ def main():
         'yasashisa': args.yasashisa or default_fonts['yasashisa'], 
         'utatane': args.utatane or default_fonts['utatane']
     }
+    for key in REFERENCE_FONT_KEYS:
+        path = getattr(args, key) or default_fonts[key]
+        if os.path.exists(path):
+            font_paths[key] = path
     
-    fonts_data = {}
     for key, path in font_paths.items():
-        font, error = load_font_safely(path)
-        if error:
-            print(f"エラー ({key}): {error}")
+        if not os.path.exists(path):
+            print(f"エラー ({key}): フォントファイルが見つかりません: {path}")
             return 1
-        fonts_data[key] = font
     
-    print("フォント読み込み完了:")
-    for key, font in fonts_data.items():
-        if font:
-            print(f"  {key}: {font.fontname}")
+    # フォントは輪郭キャッシュに無いグリフがあるときだけ開く
+    sources = open_font_sources(font_paths, get_glyph_data, use_cache=not args.no_cache)
     
     # グリフ選択
     selected_glyphs = get_glyph_selection(args)
@@ -278,31 +344,71 @@ def main():
     
     print(f"\n抽出対象グリフ: {len(selected_glyphs)}件")
     
-    # グリフデータ抽出
-    result_data = {
-        'metadata': {
+    metadata = {}
+    
+    # 前回ビルドとの差分のみに絞り込み
+    if args.baseline:
+        baseline_path = resolve_baseline_path(args.baseline, font_paths['utatane'])
+        if baseline_path is None:
+            print(f"エラー: 前回ビルドのフォントが見つかりません: {args.baseline}")
+            return 1
+        baseline_index = load_hash_index(baseline_path)
+        changed = changed_codepoints(sources['utatane'].open_font(), selected_glyphs, baseline_index)
+        print(f"前回ビルドとの比較 ({baseline_path}): 変更 {len(changed)}件 / 変更なし {len(selected_glyphs) - len(changed)}件")
+        metadata['baseline'] = str(baseline_path)
+        metadata['unchanged_glyphs'] = len(selected_glyphs) - len(changed)
+        selected_glyphs = changed
+    
+    print("フォント読み込み完了:")
+    try:
+        for key, source in sources.items():
+            source.fill([])
+            if args.no_cache:
+                print(f"  {key}: {source.info['fontname']}")
+            else:
+                print(f"  {key}: {source.info['fontname']} "
+                      f"(キャッシュ済み {source.count_cached(selected_glyphs)}/{len(selected_glyphs)}件)")
+    except Exception as e:
+        print(f"フォント読み込みエラー: {e}")
+        return 1
+    
+    if stream_out is not None:
+        stream_glyph_data(stream_out, sources, {
             'total_glyphs': len(selected_glyphs),
-            'glyph_list': selected_glyphs
-        },
-        'fonts': {}
+            'glyph_list': selected_glyphs,
+            **metadata
+        })
+        print("\nグリフデータ送信完了")
+        for source in sources.values():
+            source.close()
+        return 0
+    
+    metadata = {
+        'total_glyphs': len(selected_glyphs),
+        'glyph_list': selected_glyphs,
+        **metadata
     }
     
-    for font_key, font in fonts_data.items():
-        if font:
+    # グリフデータ抽出・ファイル出力
+    if is_binary_path(args.output):
+        # バイナリ形式はグリフごとに抽出してチャンク単位で追記
+        print("グリフデータ抽出中...")
+        write_glyph_data_chunked(args.output, sources, metadata, append=args.append)
+    else:
+        result_data = {'metadata': metadata, 'fonts': {}}
+        for font_key, source in sources.items():
             print(f"{font_key} からデータ抽出中...")
-            result_data['fonts'][font_key] = extract_font_data(font, selected_glyphs)
-    
-    # JSON出力
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(result_data, f, ensure_ascii=False, indent=2)
+            source.fill(selected_glyphs)
+            result_data['fonts'][font_key] = extract_font_data(source, selected_glyphs)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result_data, f, ensure_ascii=False, indent=2)
     
     print(f"\nグリフデータ抽出完了: {args.output}")
     print(f"次のコマンドでPDF生成: uv run python test/glyph_visualizer.py {args.output}")
     
     # フォントクローズ
-    for font in fonts_data.values():
-        if font:
-            font.close()
+    for source in sources.values():
+        source.close()
     
     return 0
 
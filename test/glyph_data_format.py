@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+グリフデータのバイナリ形式 (.utgd)
+
+glyph_data_extractor.py の出力を、輪郭点をfloat32の平坦な配列として保存する。
+JSONに比べてファイルが小さく、読み込み側は numpy.memmap でコピーせずに参照できる。
+
+バージョン2はグリフを一定数ずつのチャンクに分けて順に追記する形式で、
+抽出中もメモリ使用量が一定に保たれる。書き込みが途中で止まったファイルも、
+書き終わったチャンクまでは読み込める（--append で続きから再開できる）。
+
+ファイル構成（リトルエンディアン、各ブロックは4バイト境界）:
+    magic       4s   b'UTGD'
+    version     u16  2
+    reserved    u16
+    header_len  u32
+    header      JSON (UTF-8)  メタデータ・フォント情報（グリフは含まない）
+
+    チャンク（繰り返し）:
+        tag         4s   b'CHNK'
+        json_len    u32
+        n_contours  u32
+        n_points    u32
+        records     JSON  [[コードポイント, {フォントキー: グリフ情報 または null}], ...]
+        contour_ends  int32[n_contours]   チャンク内の各輪郭の終端点インデックス（累積、排他的）
+        points        float32[n_points*2] x, y の交互
+
+    索引（正常終了時のみ）:
+        tag         4s   b'INDX'
+        json_len    u32
+        index       JSON  {"chunks": [[オフセット, グリフ数, 先頭コード, 末尾コード], ...]}
+        trailer     4s + u64  b'UTIX', 索引のオフセット
+
+グリフ情報の 'contour_start' / 'contour_count' でチャンク内の contour_ends の範囲を指す。
+索引が無い場合（途中で止まったファイル）は先頭からチャンクを順にたどる。
+バージョン1（全グリフを1ブロックに格納）も読み込める。
+書き込みは標準ライブラリのみ（FontForge付属Pythonで動く）、読み込みは numpy を使う。
+GlyphDataReader はバージョン2を標準ライブラリだけで1チャンクずつ読む（輪郭キャッシュ用）。
+
+ストリーム形式（パイプ渡し用、1行1JSON）:
+    1行目    {"format": "utgd-stream", "version": 1, "metadata": ..., "fonts": {キー: フォント情報}}
+    グリフ行 {"code": コードポイント, "glyphs": {キー: グリフ情報 または null}}
+    最終行   {"end": true, "count": グリフ数}
+抽出側はグリフごとに書き出してflushし、可視化側は届いた順に描画する。
+"""
+
+import array
+import json
+import os
+import struct
+import sys
+
+MAGIC = b'UTGD'
+VERSION = 2
+STREAM_FORMAT = 'utgd-stream'
+STREAM_VERSION = 1
+PREAMBLE = struct.Struct('<4sHHI')
+CHUNK_HEAD = struct.Struct('<4sIII')
+INDEX_HEAD = struct.Struct('<4sI')
+TRAILER = struct.Struct('<4sQ')
+CHUNK_TAG = b'CHNK'
+INDEX_TAG = b'INDX'
+TRAILER_TAG = b'UTIX'
+DEFAULT_CHUNK_SIZE = 256
+
+
+def is_binary_path(path):
+    """出力パスの拡張子からバイナリ形式かを判定"""
+    return not str(path).lower().endswith('.json')
+
+
+def _little_endian(arr):
+    if sys.byteorder == 'big':
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+
+def _json_block(obj):
+    """4バイト境界に合わせたJSONバイト列"""
+    data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return data + b' ' * (-len(data) % 4)
+
+
+def _read_preamble(f, path):
+    magic, version, _reserved, header_len = PREAMBLE.unpack(f.read(PREAMBLE.size))
+    if magic != MAGIC:
+        raise ValueError(f"グリフデータ形式ではありません: {path}")
+    if version not in (1, VERSION):
+        raise ValueError(f"未対応のバージョンです: {version}")
+    header = json.loads(f.read(header_len).decode('utf-8'))
+    return version, header, PREAMBLE.size + header_len
+
+
+def _scan_chunks(f, offset, file_size):
+    """先頭から完全なチャンクをたどり、(オフセット, ヘッダ値) のリストと終端を返す"""
+    chunks = []
+    while offset + CHUNK_HEAD.size <= file_size:
+        f.seek(offset)
+        tag, json_len, n_contours, n_points = CHUNK_HEAD.unpack(f.read(CHUNK_HEAD.size))
+        if tag != CHUNK_TAG:
+            break
+        end = offset + CHUNK_HEAD.size + json_len + 4 * n_contours + 8 * n_points
+        if end > file_size:
+            break  # 書き込み途中のチャンク
+        chunks.append(offset)
+        offset = end
+    return chunks, offset
+
+
+def _read_index(f, file_size):
+    """末尾の索引からチャンクのオフセットを読む（無い・壊れている場合はNone）"""
+    if file_size < TRAILER.size:
+        return None
+    f.seek(file_size - TRAILER.size)
+    tag, index_offset = TRAILER.unpack(f.read(TRAILER.size))
+    if tag != TRAILER_TAG or index_offset + INDEX_HEAD.size > file_size:
+        return None
+    f.seek(index_offset)
+    tag, json_len = INDEX_HEAD.unpack(f.read(INDEX_HEAD.size))
+    if tag != INDEX_TAG:
+        return None
+    return [entry[0] for entry in json.loads(f.read(json_len).decode('utf-8'))['chunks']]
+
+
+class GlyphDataWriter:
+    """グリフを1件ずつ受け取り、チャンク単位でファイルに追記する
+
+    append=True で既存ファイル（バージョン2）の続きに書き込む。
+    既に書き込まれたコードポイントは existing_codes で参照できる。
+    close() で索引を書く。close() されなかったファイルも書き終わったチャンクまでは読める。
+    """
+
+    def __init__(self, path, metadata, fonts, chunk_size=DEFAULT_CHUNK_SIZE, append=False):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.existing_codes = set()
+        self.chunks = []  # [オフセット, グリフ数, 先頭コード, 末尾コード]
+        self._reset_chunk()
+
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.f = open(path, 'r+b')
+            self._open_existing()
+        else:
+            self.f = open(path, 'wb')
+            header = _json_block({'metadata': metadata, 'fonts': fonts})
+            self.f.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(header)))
+            self.f.write(header)
+            self.f.flush()
+
+    def _open_existing(self):
+        """既存ファイルの完全なチャンクを読み取り、索引と書きかけの部分を切り詰める"""
+        f = self.f
+        version, _header, offset = _read_preamble(f, self.path)
+        if version != VERSION:
+            raise ValueError(f"バージョン{version}のファイルには追記できません: {self.path}")
+        offsets, end = _scan_chunks(f, offset, os.path.getsize(self.path))
+        for chunk_offset in offsets:
+            f.seek(chunk_offset)
+            _tag, json_len, _nc, _np = CHUNK_HEAD.unpack(f.read(CHUNK_HEAD.size))
+            codes = [code for code, _glyphs in json.loads(f.read(json_len).decode('utf-8'))]
+            self.existing_codes.update(codes)
+            self.chunks.append([chunk_offset, len(codes), codes[0], codes[-1]])
+        f.seek(end)
+        f.truncate()
+
+    def _reset_chunk(self):
+        self._records = []
+        self._contour_ends = array.array('i')
+        self._points = array.array('f')
+
+    def add(self, code, glyphs):
+        """1コードポイント分（フォントキー -> 'contours' を含むグリフ情報 または None）を追加"""
+        entries = {}
+        for font_key, glyph in glyphs.items():
+            if not glyph:
+                entries[font_key] = None
+                continue
+            entry = {k: v for k, v in glyph.items() if k != 'contours'}
+            entry['contour_start'] = len(self._contour_ends)
+            entry['contour_count'] = len(glyph['contours'])
+            for contour in glyph['contours']:
+                for x, y in contour:
+                    self._points.append(x)
+                    self._points.append(y)
+                self._contour_ends.append(len(self._points) // 2)
+            entries[font_key] = entry
+        self._records.append([code, entries])
+        if len(self._records) >= self.chunk_size:
+            self.flush_chunk()
+
+    def flush_chunk(self):
+        """バッファ中のグリフを1チャンクとして書き出す"""
+        if not self._records:
+            return
+        records = _json_block(self._records)
+        offset = self.f.tell()
+        self.f.write(CHUNK_HEAD.pack(CHUNK_TAG, len(records), len(self._contour_ends),
+                                     len(self._points) // 2))
+        self.f.write(records)
+        _little_endian(self._contour_ends).tofile(self.f)
+        _little_endian(self._points).tofile(self.f)
+        self.f.flush()
+        self.chunks.append([offset, len(self._records), self._records[0][0], self._records[-1][0]])
+        self._reset_chunk()
+
+    def close(self):
+        """残りのチャンクと索引を書いて閉じる"""
+        if self.f.closed:
+            return
+        self.flush_chunk()
+        index_offset = self.f.tell()
+        index = _json_block({'chunks': self.chunks})
+        self.f.write(INDEX_HEAD.pack(INDEX_TAG, len(index)))
+        self.f.write(index)
+        self.f.write(TRAILER.pack(TRAILER_TAG, index_offset))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 異常終了時は索引を書かない（書き終わったチャンクは読める）
+            self.flush_chunk()
+            self.f.close()
+        return False
+
+
+def write_glyph_data(path, data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """extractor形式のdict（'contours' は点リストのリスト）をバイナリで書き出す"""
+    fonts = {key: {k: v for k, v in font_data.items() if k != 'glyphs'}
+             for key, font_data in data['fonts'].items()}
+    with GlyphDataWriter(path, data['metadata'], fonts, chunk_size) as writer:
+        for code in data['metadata']['glyph_list']:
+            writer.add(code, {key: font_data['glyphs'].get(str(code))
+                              for key, font_data in data['fonts'].items()})
+
+
+def _contour_views(glyph, contour_ends, points):
+    """グリフ情報の contour_start/count を (n, 2) のビューのリストに置き換える"""
+    first = glyph.pop('contour_start')
+    count = glyph.pop('contour_count')
+    contours = []
+    for i in range(first, first + count):
+        start = contour_ends[i - 1] if i > 0 else 0
+        contours.append(points[start:contour_ends[i]])
+    glyph['contours'] = contours
+
+
+def _read_v1(path, header, offset):
+    import numpy as np
+
+    n_contours = header['n_contours']
+    n_points = header['n_points']
+    if n_contours:
+        contour_ends = np.memmap(path, dtype='<i4', mode='r', offset=offset, shape=(n_contours,))
+        points = np.memmap(path, dtype='<f4', mode='r', offset=offset + 4 * n_contours,
+                           shape=(n_points, 2))
+    else:
+        contour_ends = np.zeros(0, dtype='<i4')
+        points = np.zeros((0, 2), dtype='<f4')
+
+    for font_data in header['fonts'].values():
+        for glyph in font_data['glyphs'].values():
+            _contour_views(glyph, contour_ends, points)
+
+    return {'metadata': header['metadata'], 'fonts': header['fonts']}
+
+
+def _read_v2(path, f, header, offset):
+    import numpy as np
+
+    file_size = os.path.getsize(path)
+    offsets = _read_index(f, file_size)
+    complete = offsets is not None
+    if not complete:
+        offsets, _end = _scan_chunks(f, offset, file_size)
+
+    buf = np.memmap(path, dtype=np.uint8, mode='r') if offsets else None
+    fonts = {key: dict(info, glyphs={}) for key, info in header['fonts'].items()}
+    glyph_list = []
+    for chunk_offset in offsets:
+        f.seek(chunk_offset)
+        _tag, json_len, n_contours, n_points = CHUNK_HEAD.unpack(f.read(CHUNK_HEAD.size))
+        records = json.loads(f.read(json_len).decode('utf-8'))
+        data_offset = chunk_offset + CHUNK_HEAD.size + json_len
+        contour_ends = buf[data_offset:data_offset + 4 * n_contours].view('<i4')
+        points_offset = data_offset + 4 * n_contours
+        points = buf[points_offset:points_offset + 8 * n_points].view('<f4').reshape(n_points, 2)
+        for code, glyphs in records:
+            glyph_list.append(code)
+            for font_key, glyph in glyphs.items():
+                if glyph and font_key in fonts:
+                    _contour_views(glyph, contour_ends, points)
+                    fonts[font_key]['glyphs'][str(code)] = glyph
+
+    metadata = dict(header['metadata'])
+    metadata['requested_glyphs'] = metadata.get('total_glyphs', len(glyph_list))
+    metadata['glyph_list'] = glyph_list
+    metadata['total_glyphs'] = len(glyph_list)
+    metadata['complete'] = complete
+    return {'metadata': metadata, 'fonts': fonts}
+
+
+class GlyphDataReader:
+    """バージョン2のファイルからグリフを1件ずつ読む（標準ライブラリのみ）
+
+    開くときは各チャンクのコードポイントだけを読み、グリフ情報は get() で必要になった
+    チャンクから取り出す（保持するのは直近の1チャンクだけ）。
+    GlyphDataWriter で追記中のファイルも、refresh() で書き終わったチャンクを追加で読める。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.chunk_of = {}  # コードポイント -> チャンクのオフセット
+        self._end = None
+        self._cached = (None, None)
+        with open(path, 'rb') as f:
+            version, header, offset = _read_preamble(f, path)
+            if version != VERSION:
+                raise ValueError(f"バージョン{version}のファイルは読めません: {path}")
+            self.metadata = header['metadata']
+            self.fonts = header['fonts']
+            offsets = _read_index(f, os.path.getsize(path))
+            if offsets is None:
+                offsets, _end = _scan_chunks(f, offset, os.path.getsize(path))
+            for chunk_offset in offsets:
+                self._add_chunk(f, chunk_offset)
+            if self._end is None:
+                self._end = offset
+
+    def _add_chunk(self, f, chunk_offset):
+        f.seek(chunk_offset)
+        _tag, json_len, n_contours, n_points = CHUNK_HEAD.unpack(f.read(CHUNK_HEAD.size))
+        for code, _glyphs in json.loads(f.read(json_len).decode('utf-8')):
+            self.chunk_of[code] = chunk_offset
+        self._end = chunk_offset + CHUNK_HEAD.size + json_len + 4 * n_contours + 8 * n_points
+
+    def refresh(self):
+        """前回読んだ位置より後ろに書き足されたチャンクを読む"""
+        with open(self.path, 'rb') as f:
+            offsets, _end = _scan_chunks(f, self._end, os.path.getsize(self.path))
+            for chunk_offset in offsets:
+                self._add_chunk(f, chunk_offset)
+
+    def codes(self):
+        return list(self.chunk_of)
+
+    def _read_chunk(self, chunk_offset):
+        with open(self.path, 'rb') as f:
+            f.seek(chunk_offset)
+            _tag, json_len, n_contours, n_points = CHUNK_HEAD.unpack(f.read(CHUNK_HEAD.size))
+            records = json.loads(f.read(json_len).decode('utf-8'))
+            contour_ends = array.array('i')
+            contour_ends.frombytes(f.read(4 * n_contours))
+            points = array.array('f')
+            points.frombytes(f.read(8 * n_points))
+        return dict(records), _little_endian(contour_ends), _little_endian(points)
+
+    def get(self, code, font_key):
+        """グリフ情報（輪郭は [x, y] のリストのリスト）。グリフが無ければNone"""
+        chunk_offset = self.chunk_of.get(code)
+        if chunk_offset is None:
+            return None
+        if self._cached[0] != chunk_offset:
+            self._cached = (chunk_offset, self._read_chunk(chunk_offset))
+        records, contour_ends, points = self._cached[1]
+        glyph = (records.get(code) or {}).get(font_key)
+        if not glyph:
+            return None
+        glyph = dict(glyph)
+        first = glyph.pop('contour_start')
+        count = glyph.pop('contour_count')
+        contours = []
+        for i in range(first, first + count):
+            start = contour_ends[i - 1] if i > 0 else 0
+            contours.append([[points[2 * j], points[2 * j + 1]] for j in range(start, contour_ends[i])])
+        glyph['contours'] = contours
+        return glyph
+
+
+def read_glyph_data(path):
+    """バイナリ形式を読み込む（輪郭は memmap 上の (n, 2) float32 ビュー）
+
+    途中で止まったファイルは書き終わったグリフだけを返す（metadata['complete'] が False）。
+    """
+    with open(path, 'rb') as f:
+        version, header, offset = _read_preamble(f, path)
+        if version == 1:
+            return _read_v1(path, header, offset)
+        return _read_v2(path, f, header, offset)
+
+
+def load_glyph_data(path):
+    """JSON / バイナリのどちらでも読み込む（先頭のマジックで判定）"""
+    with open(path, 'rb') as f:
+        head = f.read(len(MAGIC))
+    if head == MAGIC:
+        return read_glyph_data(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_stream_header(f, metadata, fonts):
+    """ストリームの先頭行（fonts はグリフを含まないフォント情報）"""
+    header = {'format': STREAM_FORMAT, 'version': STREAM_VERSION,
+              'metadata': metadata, 'fonts': fonts}
+    f.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')) + '\n')
+    f.flush()
+
+
+def write_stream_record(f, code, glyphs):
+    """1コードポイント分のグリフ情報（フォントキー -> グリフ情報）を1行で書き出す"""
+    f.write(json.dumps({'code': code, 'glyphs': glyphs}, ensure_ascii=False,
+                       separators=(',', ':')) + '\n')
+    f.flush()
+
+
+def write_stream_end(f, count):
+    f.write(json.dumps({'end': True, 'count': count}) + '\n')
+    f.flush()
+
+
+def read_stream(f):
+    """ストリームを読み込み、(ヘッダ, (code, glyphs) のイテレータ) を返す
+
+    最終行が届く前に入力が切れた場合は ValueError を送出する。
+    """
+    line = f.readline()
+    if not line:
+        raise ValueError("グリフデータのストリームが空です")
+    header = json.loads(line)
+    if header.get('format') != STREAM_FORMAT:
+        raise ValueError("グリフデータのストリーム形式ではありません")
+    if header.get('version') != STREAM_VERSION:
+        raise ValueError(f"未対応のバージョンです: {header.get('version')}")
+
+    def records():
+        for line in f:
+            record = json.loads(line)
+            if record.get('end'):
+                return
+            yield record['code'], record['glyphs']
+        raise ValueError("グリフデータのストリームが途中で終了しました")
+
+    return header, records()
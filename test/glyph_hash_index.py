@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+グリフのハッシュ索引（変更検出用）
+
+グリフごとに、正規化した輪郭とメトリクスからハッシュを作り、
+{コードポイント: ハッシュ} の索引としてフォントファイルごとに保存する。
+前回ビルド（例: dist/v1.3.1/Utatane-Regular.ttf）の索引と比べることで、
+輪郭・幅が変わったグリフだけを比較対象にできる。
+
+索引は analysis/font_catalog.py のキャッシュディレクトリ
+（tmp/cache/glyph_hash/<フォント内容ハッシュ>.json）に保存するため、
+同じ内容のフォントは2回目以降FontForgeで開かずに済む。
+
+FontForge付属Pythonで実行:
+    fontforge -lang=py -script test/glyph_hash_index.py dist/v1.3.1/Utatane-Regular.ttf
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analysis'))
+from font_catalog import get_catalog
+
+INDEX_VERSION = 3
+
+
+def normalize_contour(contour):
+    """輪郭を (x, y, on_curve) の整数タプル列にし、開始点を最小のオンカーブ点にそろえる
+
+    フォント生成のたびに開始点がずれても同じ形状なら同じ結果になる。
+    """
+    points = [(int(round(p.x)), int(round(p.y)), bool(p.on_curve)) for p in contour]
+    on_curve = [i for i, p in enumerate(points) if p[2]] or range(len(points))
+    start = min(on_curve, key=lambda i: points[i])
+    return tuple(points[start:] + points[:start])
+
+
+def glyph_hash(glyph, memo=None):
+    """正規化した輪郭と幅・参照からグリフのハッシュを作る
+
+    glyph.references の要素は (グリフ名, 変換行列, 選択状態) の3要素なので先頭2つだけ使う。
+    参照は名前ではなく参照先グリフのハッシュ（再帰的に計算）で表すので、
+    参照先の輪郭が変われば複合グリフのハッシュも変わる。
+    memo は グリフ名 -> ハッシュ の辞書で、同じフォントのグリフ間で使い回せる。
+    """
+    if memo is None:
+        memo = {}
+    if glyph.glyphname in memo:
+        return memo[glyph.glyphname]
+    memo[glyph.glyphname] = None  # 循環参照の目印
+
+    contours = sorted(normalize_contour(c) for c in glyph.foreground if len(c))
+    references = sorted((glyph_hash(glyph.font[ref[0]], memo), tuple(round(v, 3) for v in ref[1]))
+                        for ref in glyph.references)
+    payload = repr((int(round(glyph.width)), contours, references))
+    memo[glyph.glyphname] = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+    return memo[glyph.glyphname]
+
+
+def build_hash_index(font, glyph_list=None):
+    """フォントのハッシュ索引を作る（glyph_list省略時はUnicodeを持つ全グリフ）"""
+    index = {}
+    memo = {}
+    if glyph_list is None:
+        for glyph in font.glyphs():
+            if glyph.unicode >= 0:
+                index[glyph.unicode] = glyph_hash(glyph, memo)
+    else:
+        for code in glyph_list:
+            if code in font:
+                index[code] = glyph_hash(font[code], memo)
+    return index
+
+
+def index_cache_path(font_path):
+    """索引の保存先（フォント内容のハッシュで区別）"""
+    return get_catalog().cache_path(str(font_path), 'glyph_hash', '.json')
+
+
+def load_hash_index(font_path, font=None):
+    """フォントファイルのハッシュ索引を読み込む（無ければ作って保存）
+
+    font に開いたフォントを渡すとそれを使う。索引がキャッシュにあればフォントは開かない。
+    """
+    cache_path = index_cache_path(font_path)
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == INDEX_VERSION:
+            return {int(code): h for code, h in data['glyphs'].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import fontforge
+    opened = font is None
+    if opened:
+        font = fontforge.open(str(font_path))
+    try:
+        index = build_hash_index(font)
+    finally:
+        if opened:
+            font.close()
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION,
+                   'glyphs': {str(code): h for code, h in sorted(index.items())}}, f)
+    os.replace(tmp_path, cache_path)
+    return index
+
+
+def changed_codepoints(font, glyph_list, baseline_index):
+    """前回ビルドの索引と比べて、追加・削除・変更のあったコードポイントを返す"""
+    current = build_hash_index(font, glyph_list)
+    return [code for code in glyph_list if current.get(code) != baseline_index.get(code)]
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("使用方法: fontforge -lang=py -script test/glyph_hash_index.py FONT [FONT ...]")
+        return 2
+    for font_path in sys.argv[1:]:
+        index = load_hash_index(font_path)
+        print(f"{font_path}: {len(index)}グリフ -> {index_cache_path(font_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
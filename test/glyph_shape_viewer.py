@@ -18,6 +18,9 @@ import argparse
 from pathlib import Path
 import math
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from glyph_contour_cache import open_font_sources
+
 # matplotlibとPDF出力用ライブラリ
 try:
     import sys
@@ -44,7 +47,8 @@ try:
     matplotlib.use('Agg')  # バックエンドをAggに設定（GUI不要）
     import matplotlib.pyplot as plt
     from matplotlib.backends.backend_pdf import PdfPages
-    import matplotlib.patches as patches
+    # 描画はglyph_visualizerと共通（Figureを使い回し、輪郭はコレクションで描画）
+    from glyph_visualizer import create_renderer, filter_unchanged, parse_grid
     MATPLOTLIB_AVAILABLE = True
 except ImportError as e:
     MATPLOTLIB_AVAILABLE = False
@@ -118,17 +122,6 @@ def get_default_fonts():
         'utatane': base_dir / 'dist' / 'Utatane-Regular.ttf'
     }
 
-def load_font_safely(font_path):
-    """フォントを安全に読み込み"""
-    try:
-        if not os.path.exists(font_path):
-            return None, f"フォントファイルが見つかりません: {font_path}"
-        
-        font = fontforge.open(str(font_path))
-        return font, None
-    except Exception as e:
-        return None, f"フォント読み込みエラー: {e}"
-
 def get_glyph_data(font, unicode_val):
     """グリフのデータを取得"""
     if unicode_val not in font:
@@ -163,145 +156,72 @@ def get_glyph_data(font, unicode_val):
         'exists': True
     }
 
-def draw_glyph_shape(ax, glyph_data, font_ascent, font_descent, color='black', alpha=0.7):
-    """グリフ形状を描画"""
-    if not glyph_data or not glyph_data['contours']:
-        return
-    
-    # 輪郭を描画
-    for contour in glyph_data['contours']:
-        if len(contour) < 2:
-            continue
-        
-        # 閉じた輪郭として描画
-        xs = [p[0] for p in contour] + [contour[0][0]]
-        ys = [p[1] for p in contour] + [contour[0][1]]
-        
-        ax.plot(xs, ys, color=color, alpha=alpha, linewidth=1.5)
-        ax.fill(xs, ys, color=color, alpha=alpha*0.3)
+def collect_glyph_data(sources, glyph_list):
+    """フォントごとのグリフデータをglyph_visualizerと同じ形式にまとめる
 
-def draw_metrics_boxes(ax, glyph_data, font_ascent, font_descent):
-    """メトリクス情報のボックスを描画"""
-    if not glyph_data:
-        return
-    
-    width = glyph_data['width']
-    bbox = glyph_data['bbox']
-    
-    # グリフ幅の矩形（薄い灰色）
-    width_rect = patches.Rectangle(
-        (0, -font_descent), width, font_ascent + font_descent,
-        linewidth=1, edgecolor='gray', facecolor='lightgray', alpha=0.2
-    )
-    ax.add_patch(width_rect)
-    
-    # バウンディングボックス（赤い枠線）
-    if bbox != (0, 0, 0, 0):
-        bbox_rect = patches.Rectangle(
-            (bbox[0], bbox[1]), bbox[2] - bbox[0], bbox[3] - bbox[1],
-            linewidth=2, edgecolor='red', facecolor='none', alpha=0.8
-        )
-        ax.add_patch(bbox_rect)
-    
-    # ベースライン（黒い線）
-    ax.axhline(y=0, color='black', linewidth=1, alpha=0.5)
-    
-    # アセントライン（点線）
-    ax.axhline(y=font_ascent, color='blue', linewidth=1, linestyle='--', alpha=0.5)
-    
-    # ディセントライン（点線）
-    ax.axhline(y=-font_descent, color='blue', linewidth=1, linestyle='--', alpha=0.5)
+    輪郭キャッシュにあるグリフはフォントを開かずに読み出す。
+    """
+    collected = {}
+    for font_key, source in sources.items():
+        source.fill(glyph_list)
+        glyphs = {}
+        for unicode_val in glyph_list:
+            glyph_data = source.get(unicode_val)
+            if glyph_data:
+                glyphs[str(unicode_val)] = glyph_data
+        collected[font_key] = {
+            'ascent': source.info['ascent'],
+            'descent': source.info['descent'],
+            'glyphs': glyphs
+        }
+    return collected
 
-def create_glyph_comparison_plot(fonts_data, glyph_list, output_pdf=None):
+def create_glyph_comparison_plot(sources, glyph_list, output_pdf=None,
+                                 layout='page', grid=(4, 6), skip_unchanged=False):
     """グリフ比較プロットを作成"""
     if not MATPLOTLIB_AVAILABLE:
         print("matplotlib が利用できないため、PDF出力をスキップします。")
         return False
     
-    # フォント名とカラーマップ
-    font_colors = {
-        'mplus': 'blue',
-        'yasashisa': 'green', 
-        'utatane': 'red'
-    }
-    
     font_names = {
         'mplus': 'M+ 1m Regular',
         'yasashisa': 'やさしさゴシック Bold V2',
         'utatane': 'Utatane Regular'
     }
     
+    glyph_list = [g for g in glyph_list if g is not None]
+    page_data = collect_glyph_data(sources, glyph_list)
+    if skip_unchanged:
+        glyph_list = filter_unchanged(page_data, glyph_list)
+        if not glyph_list:
+            print("変更のあるグリフがないため、出力をスキップします")
+            return True
+    
+    # Figureは1つだけ作り、ページごとに中身を差し替える
+    renderer = create_renderer(font_names, layout, grid)
+    per_page = getattr(renderer, 'glyphs_per_page', 1)
+    
     # PDF出力の準備
     if output_pdf:
         pdf_pages = PdfPages(output_pdf)
     
-    # グリフごとに比較ページを作成
-    for i, unicode_val in enumerate(glyph_list):
-        if unicode_val is None:
-            continue
-            
-        # 3x1のサブプロット作成
-        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-        fig.suptitle(f'グリフ比較: U+{unicode_val:04X} ({chr(unicode_val)})', fontsize=16)
-        
-        # 各フォントのデータを取得・描画
-        all_glyph_data = {}
-        font_metrics = {}
-        
-        for j, (font_key, font) in enumerate(fonts_data.items()):
-            if font is None:
-                continue
-                
-            ax = axes[j]
-            glyph_data = get_glyph_data(font, unicode_val)
-            all_glyph_data[font_key] = glyph_data
-            
-            # フォントメトリクス
-            font_metrics[font_key] = {
-                'ascent': font.ascent,
-                'descent': font.descent
-            }
-            
-            if glyph_data:
-                # グリフ形状を描画
-                draw_glyph_shape(ax, glyph_data, font.ascent, font.descent, 
-                               font_colors[font_key])
-                
-                # メトリクスボックスを描画
-                draw_metrics_boxes(ax, glyph_data, font.ascent, font.descent)
-                
-                # タイトルと情報
-                ax.set_title(f'{font_names[font_key]}\n'
-                           f'幅: {glyph_data["width"]}, LSB: {glyph_data["left_side_bearing"]:.0f}')
-                
-                # 軸設定
-                width = glyph_data['width']
-                margin = width * 0.1
-                ax.set_xlim(-margin, width + margin)
-                ax.set_ylim(-font.descent - 50, font.ascent + 50)
-                
-            else:
-                ax.set_title(f'{font_names[font_key]}\n（グリフなし）')
-                ax.set_xlim(-100, 600)
-                ax.set_ylim(-250, 850)
-            
-            ax.grid(True, alpha=0.3)
-            ax.set_aspect('equal')
-        
-        # レイアウト調整
-        plt.tight_layout()
+    # ページごとに比較図を作成
+    for start in range(0, len(glyph_list), per_page):
+        codes = glyph_list[start:start + per_page]
+        page = codes if per_page > 1 else codes[0]
         
         if output_pdf:
-            pdf_pages.savefig(fig, dpi=150)
+            renderer.save_page(pdf_pages, page_data, page)
         else:
+            renderer.render(page_data, page)
             plt.show()
         
-        plt.close(fig)
-        
         # プログレス表示
-        if (i + 1) % 10 == 0:
-            print(f"進捗: {i + 1}/{len(glyph_list)} グリフ処理完了")
+        done = start + len(codes)
+        if done % 10 < len(codes) or done == len(glyph_list):
+            print(f"進捗: {done}/{len(glyph_list)} グリフ処理完了")
     
+    renderer.close()
     if output_pdf:
         pdf_pages.close()
         print(f"PDF出力完了: {output_pdf}")
@@ -406,6 +326,9 @@ def main():
 
   # カスタムフォント指定
   fontforge -lang=py -script glyph_shape_viewer.py --mplus custom.ttf
+
+  # 全184件を1ページ4x6のグリッドで、変更のないグリフを除いて出力
+  fontforge -lang=py -script glyph_shape_viewer.py --priority all --layout grid --skip-unchanged
         """
     )
     
@@ -433,9 +356,24 @@ def main():
     parser.add_argument('--output', '-o', help='PDF出力ファイル名')
     parser.add_argument('--list-categories', action='store_true',
                        help='利用可能なカテゴリ一覧表示')
+    parser.add_argument('--layout', choices=['page', 'grid'], default='page',
+                       help='page: 1グリフ1ページ, grid: 複数グリフを1ページに並べる')
+    parser.add_argument('--grid', default='4x6', metavar='行x列',
+                       help='グリッド表示の1ページあたりのグリフ数（デフォルト: 4x6）')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                       help='Utataneが元フォントと幅・形状とも同一のグリフを省く')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='輪郭キャッシュ（tmp/cache/contours）を使わずフォントから読む')
     
     args = parser.parse_args()
     
+    grid = (4, 6)
+    if MATPLOTLIB_AVAILABLE:
+        try:
+            grid = parse_grid(args.grid)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+    
     # カテゴリ一覧表示
     if args.list_categories:
         print("利用可能なカテゴリ:")
@@ -451,18 +389,13 @@ def main():
         'utatane': args.utatane or default_fonts['utatane']
     }
     
-    fonts_data = {}
     for key, path in font_paths.items():
-        font, error = load_font_safely(path)
-        if error:
-            print(f"エラー ({key}): {error}")
+        if not os.path.exists(path):
+            print(f"エラー ({key}): フォントファイルが見つかりません: {path}")
             return 1
-        fonts_data[key] = font
     
-    print("フォント読み込み完了:")
-    for key, font in fonts_data.items():
-        if font:
-            print(f"  {key}: {font.fontname}")
+    # フォントは輪郭キャッシュに無いグリフがあるときだけ開く
+    sources = open_font_sources(font_paths, get_glyph_data, use_cache=not args.no_cache)
     
     # グリフ選択
     selected_glyphs = get_glyph_selection(args)
@@ -473,17 +406,28 @@ def main():
     print(f"\n比較対象グリフ: {len(selected_glyphs)}件")
     print(f"最初の10件: {', '.join([f'U+{g:04X}' for g in selected_glyphs[:10]])}")
     
+    print("フォント読み込み:")
+    try:
+        for key, source in sources.items():
+            cached = source.count_cached(selected_glyphs)
+            source.fill([])
+            print(f"  {key}: {source.info['fontname']} (キャッシュ済み {cached}/{len(selected_glyphs)}件)")
+    except Exception as e:
+        print(f"フォント読み込みエラー: {e}")
+        return 1
+    
     # 出力ファイル名決定
     if not args.output:
         args.output = f"glyph_comparison_{len(selected_glyphs)}glyphs.pdf"
     
     # 比較プロット作成
-    success = create_glyph_comparison_plot(fonts_data, selected_glyphs, args.output)
+    success = create_glyph_comparison_plot(sources, selected_glyphs, args.output,
+                                           layout=args.layout, grid=grid,
+                                           skip_unchanged=args.skip_unchanged)
     
-    # フォントクローズ
-    for font in fonts_data.values():
-        if font:
-            font.close()
+    # フォントクローズ（キャッシュへの追記もここで確定）
+    for source in sources.values():
+        source.close()
     
     return 0 if success else 1
 
@@ -4,15 +4,20 @@
 """
 グリフ可視化ツール
 
-JSONファイルから読み込んだグリフデータを用いて、
+glyph_data_extractor.py が出力したグリフデータ（JSON またはバイナリ形式）を用いて、
 3フォント比較のPDFを生成する。
 """
 
-import json
+import os
 import sys
+import math
 import argparse
+import tempfile
+import multiprocessing
 from pathlib import Path
 
+from glyph_data_format import load_glyph_data, read_stream
+
 try:
     import matplotlib
     matplotlib.use('Agg')
@@ -20,6 +25,8 @@ try:
     from matplotlib.backends.backend_pdf import PdfPages
     import matplotlib.patches as patches
     import matplotlib.font_manager as fm
+    from matplotlib.collections import PolyCollection
+    import numpy as np
     MATPLOTLIB_AVAILABLE = True
     
     # Utataneフォントを日本語表示用に設定
@@ -63,177 +70,609 @@ except ImportError as e:
     print(f"エラー: matplotlib が利用できません: {e}")
     sys.exit(1)
 
-def draw_glyph_shape(ax, glyph_data, font_ascent, font_descent, color='black', alpha=0.7):
-    """グリフ形状を描画"""
-    if not glyph_data or not glyph_data.get('contours'):
-        return
+# 並列描画したPDFの連結に使用（無ければ1プロセスで描画）
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+def contour_arrays(glyph_data):
+    """輪郭を (n, 2) の numpy 配列のリストにする（memmap のビューはそのまま使う）"""
+    return [np.asarray(contour, dtype=float) for contour in glyph_data.get('contours') or []
+            if len(contour) >= 2]
+
+class GlyphPanel:
+    """1フォント分のAxesとアーティスト一式
+
+    アーティストは最初に1回だけ作り、ページごとに座標や文字列だけ更新する。
+    輪郭はグリフ全体で1つの PolyCollection にまとめて描画する。
+    compact=True ではグリッド表示用に目盛り・タイトルを省き、線を細くする。
+    """
     
-    # 輪郭を描画
-    for contour in glyph_data['contours']:
-        if len(contour) < 2:
-            continue
+    def __init__(self, ax, alpha=0.7, compact=False):
+        self.ax = ax
+        self.alpha = alpha
+        self.compact = compact
+        scale = 0.5 if compact else 1.0
         
-        # 閉じた輪郭として描画
-        xs = [p[0] for p in contour] + [contour[0][0]]
-        ys = [p[1] for p in contour] + [contour[0][1]]
-        
-        ax.plot(xs, ys, color=color, alpha=alpha, linewidth=1.5)
-        ax.fill(xs, ys, color=color, alpha=alpha*0.3)
-
-def draw_metrics_boxes(ax, glyph_data, font_ascent, font_descent):
-    """メトリクス情報のボックスを描画"""
-    if not glyph_data:
-        return
-    
-    width = glyph_data['width']
-    bbox = glyph_data['bbox']
-    
-    # グリフ幅の矩形（薄い灰色）
-    width_rect = patches.Rectangle(
-        (0, -font_descent), width, font_ascent + font_descent,
-        linewidth=1, edgecolor='gray', facecolor='lightgray', alpha=0.2
-    )
-    ax.add_patch(width_rect)
-    
-    # バウンディングボックス（赤い枠線）
-    if bbox != [0, 0, 0, 0]:
-        bbox_rect = patches.Rectangle(
-            (bbox[0], bbox[1]), bbox[2] - bbox[0], bbox[3] - bbox[1],
-            linewidth=2, edgecolor='red', facecolor='none', alpha=0.8
-        )
-        ax.add_patch(bbox_rect)
-    
-    # ベースライン（黒い線）
-    ax.axhline(y=0, color='black', linewidth=1, alpha=0.5)
+        # グリフ幅の矩形（薄い灰色）
+        self.width_rect = ax.add_patch(patches.Rectangle(
+            (0, 0), 0, 0, linewidth=1 * scale, edgecolor='gray', facecolor='lightgray', alpha=0.2
+        ))
+        # バウンディングボックス（赤い枠線）
+        self.bbox_rect = ax.add_patch(patches.Rectangle(
+            (0, 0), 0, 0, linewidth=2 * scale, edgecolor='red', facecolor='none', alpha=0.8
+        ))
+        # 輪郭（塗りと線を1つのコレクションで描く）
+        self.outline = ax.add_collection(PolyCollection([], closed=True, linewidths=1.5 * scale))
+        # ベースライン（黒い線）、アセント・ディセントライン（点線）
+        self.baseline = ax.axhline(y=0, color='black', linewidth=1 * scale, alpha=0.5)
+        self.ascent_line = ax.axhline(y=0, color='blue', linewidth=1 * scale, linestyle='--', alpha=0.5)
+        self.descent_line = ax.axhline(y=0, color='blue', linewidth=1 * scale, linestyle='--', alpha=0.5)
+        
+        if compact:
+            # タイトルの代わりに左上へ小さく幅などを表示
+            self.label = ax.text(0.03, 0.97, '', transform=ax.transAxes, fontsize=5,
+                                 va='top', ha='left', fontfamily=get_font_family())
+            ax.set_xticks([])
+            ax.set_yticks([])
+        else:
+            ax.grid(True, alpha=0.3)
+        ax.set_aspect('equal')
     
-    # アセントライン（点線）
-    ax.axhline(y=font_ascent, color='blue', linewidth=1, linestyle='--', alpha=0.5)
+    def _set_title(self, title):
+        if self.compact:
+            self.label.set_text(title)
+        else:
+            self.ax.set_title(title, fontfamily=get_font_family(), fontsize=10)
     
-    # ディセントライン（点線）
-    ax.axhline(y=-font_descent, color='blue', linewidth=1, linestyle='--', alpha=0.5)
+    def update(self, glyph_data, font_ascent, font_descent, color, title, xlim=None, ylim=None):
+        """グリフ1つ分の表示に更新（glyph_data が None ならグリフなし表示）
 
-def create_glyph_comparison_plot(data, output_pdf):
-    """グリフ比較プロットを作成"""
-    # フォント名とカラーマップ
-    font_colors = {
-        'mplus': 'blue',
-        'yasashisa': 'green', 
-        'utatane': 'red'
-    }
-    
-    glyph_list = data['metadata']['glyph_list']
-    fonts_data = data['fonts']
+        xlim / ylim を渡すと表示範囲を固定する（グリッド表示でセル間の縮尺をそろえるため）。
+        """
+        ax = self.ax
+        has_glyph = bool(glyph_data)
+        
+        for artist in (self.width_rect, self.bbox_rect, self.outline,
+                       self.baseline, self.ascent_line, self.descent_line):
+            artist.set_visible(has_glyph)
+        
+        if not has_glyph:
+            self._set_title(title)
+            if xlim is not None:
+                ax.set_xlim(*xlim)
+                ax.set_ylim(*(ylim or (-font_descent - 50, font_ascent + 50)))
+            else:
+                ax.set_xlim(-100, 600)
+                ax.set_ylim(-250, 850)
+            return
+        
+        width = glyph_data['width']
+        bbox = glyph_data['bbox']
+        
+        self.outline.set_verts(contour_arrays(glyph_data))
+        self.outline.set_facecolor(matplotlib.colors.to_rgba(color, self.alpha * 0.3))
+        self.outline.set_edgecolor(matplotlib.colors.to_rgba(color, self.alpha))
+        
+        self.width_rect.set_bounds(0, -font_descent, width, font_ascent + font_descent)
+        if tuple(bbox) != (0, 0, 0, 0):
+            self.bbox_rect.set_bounds(bbox[0], bbox[1], bbox[2] - bbox[0], bbox[3] - bbox[1])
+        else:
+            self.bbox_rect.set_visible(False)
+        
+        self.ascent_line.set_ydata([font_ascent, font_ascent])
+        self.descent_line.set_ydata([-font_descent, -font_descent])
+        
+        self._set_title(title)
+        
+        # 軸設定
+        if xlim is None:
+            margin = width * 0.1 if width > 0 else 50
+            xlim = (-margin, width + margin)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*(ylim or (-font_descent - 50, font_ascent + 50)))
+
+FONT_KEYS = ['mplus', 'yasashisa', 'utatane']
+
+# フォント名とカラーマップ
+FONT_COLORS = {
+    'mplus': 'blue',
+    'yasashisa': 'green', 
+    'utatane': 'red'
+}
+
+DEFAULT_DISPLAY_NAMES = {
+    'mplus': 'M+ 1m Regular',
+    'yasashisa': 'やさしさゴシック Bold V2',
+    'utatane': 'Utatane Regular'
+}
 
-    # JSON に含まれる実フォント名を優先的に使用（指定パスのフォントが反映される）
-    default_display_names = {
-        'mplus': 'M+ 1m Regular',
-        'yasashisa': 'やさしさゴシック Bold V2',
-        'utatane': 'Utatane Regular'
-    }
+def get_font_display_names(fonts_data):
+    """グリフデータに含まれる実フォント名を優先的に使用（指定パスのフォントが反映される）"""
     font_display_names = {}
-    for key in ['mplus', 'yasashisa', 'utatane']:
+    for key in FONT_KEYS:
         try:
-            font_display_names[key] = fonts_data.get(key, {}).get('fontname') or default_display_names[key]
+            font_display_names[key] = fonts_data.get(key, {}).get('fontname') or DEFAULT_DISPLAY_NAMES[key]
         except Exception:
-            font_display_names[key] = default_display_names.get(key, key)
+            font_display_names[key] = DEFAULT_DISPLAY_NAMES.get(key, key)
+    return font_display_names
+
+class GlyphPageRenderer:
+    """3フォント比較ページの描画（Figure/Axesを1つだけ作って使い回す）"""
     
-    # PDF出力の準備
-    with PdfPages(output_pdf) as pdf_pages:
-        # グリフごとに比較ページを作成
-        for i, unicode_val in enumerate(glyph_list):
-            unicode_str = str(unicode_val)
+    def __init__(self, font_display_names):
+        self.font_display_names = font_display_names
+        
+        # 3x1のサブプロット作成
+        self.fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        self.panels = {key: GlyphPanel(ax) for key, ax in zip(FONT_KEYS, axes)}
+        self.suptitle = self.fig.suptitle('', fontsize=16, fontfamily=get_font_family())
+        self._layout_done = False
+    
+    def render(self, fonts_data, unicode_val):
+        """1グリフ分の表示に更新して Figure を返す"""
+        unicode_str = str(unicode_val)
+        try:
+            char_display = chr(unicode_val)
+        except ValueError:
+            char_display = f'[U+{unicode_val:04X}]'
+        self.suptitle.set_text(f'グリフ比較: U+{unicode_val:04X} ({char_display})')
+        
+        # 各フォントのデータを取得・描画
+        for font_key, panel in self.panels.items():
+            font_data = fonts_data.get(font_key)
+            if font_data is None:
+                panel.ax.set_visible(False)
+                continue
+            panel.ax.set_visible(True)
             
-            # 3x1のサブプロット作成
-            fig, axes = plt.subplots(1, 3, figsize=(15, 5))
-            try:
-                char_display = chr(unicode_val)
-            except ValueError:
-                char_display = f'[U+{unicode_val:04X}]'
+            glyph_data = font_data['glyphs'].get(unicode_str)
+            display_name = self.font_display_names[font_key]
+            if glyph_data:
+                # タイトルと情報（グリフ名を追加）
+                glyph_name = glyph_data.get('glyphname', 'Unknown')
+                title = (f'{display_name}\n'
+                         f'幅: {glyph_data["width"]:.0f}, LSB: {glyph_data["left_side_bearing"]:.0f}\n'
+                         f'グリフ名: {glyph_name}')
+            else:
+                title = f'{display_name}\n（グリフなし）'
+            panel.update(glyph_data, font_data['ascent'], font_data['descent'],
+                         FONT_COLORS[font_key], title)
+        
+        # レイアウト調整（タイトル行数はページ間で同じなので初回のみ）
+        if not self._layout_done:
+            self.fig.tight_layout()
+            self._layout_done = True
+        return self.fig
+    
+    def save_page(self, pdf_pages, fonts_data, unicode_val):
+        """1グリフ分の比較ページをPDFに追加"""
+        pdf_pages.savefig(self.render(fonts_data, unicode_val), dpi=150)
+    
+    def save_glyphs(self, pdf_pages, fonts_data, codes):
+        """グリフ列をPDFに追加（1グリフ1ページ）"""
+        for unicode_val in codes:
+            self.save_page(pdf_pages, fonts_data, unicode_val)
+    
+    def close(self):
+        plt.close(self.fig)
+
+class GlyphGridRenderer:
+    """複数グリフを1ページに並べるグリッド描画
+
+    rows x cols 個のセルを1ページに配置し、各セルはフォントごとに縦3段のAxesを持つ。
+    縦方向は全フォントのアセント・ディセントを含む共通の範囲、横方向はセル内の最大幅にそろえる。
+    フォント名は左端の列にだけ表示し、セル見出しはコードポイントと文字のみにする。
+    """
+    
+    def __init__(self, font_display_names, rows=4, cols=6):
+        self.font_display_names = font_display_names
+        self.rows = rows
+        self.cols = cols
+        self.glyphs_per_page = rows * cols
+        
+        n_fonts = len(FONT_KEYS)
+        self.fig = plt.figure(figsize=(cols * 1.8, rows * n_fonts * 1.0 + 0.6))
+        grid = self.fig.add_gridspec(rows * n_fonts, cols, left=0.05, right=0.99,
+                                     top=1 - 0.45 / (rows * n_fonts * 1.0 + 0.6), bottom=0.01,
+                                     wspace=0.08, hspace=0.12)
+        self.suptitle = self.fig.suptitle('', fontsize=10, fontfamily=get_font_family())
+        
+        # cells[i] = {font_key: GlyphPanel}
+        self.cells = []
+        for row in range(rows):
+            for col in range(cols):
+                cell = {}
+                for k, font_key in enumerate(FONT_KEYS):
+                    ax = self.fig.add_subplot(grid[row * n_fonts + k, col])
+                    cell[font_key] = GlyphPanel(ax, compact=True)
+                    if col == 0:
+                        ax.set_ylabel(self._short_name(font_key), fontsize=5,
+                                      fontfamily=get_font_family(), color=FONT_COLORS[font_key])
+                self.cells.append(cell)
+        self.page_count = 0
+    
+    def _short_name(self, font_key):
+        name = self.font_display_names[font_key]
+        return name if len(name) <= 18 else name[:17] + '…'
+    
+    def render(self, fonts_data, codes):
+        """最大 rows x cols 個のグリフを1ページ分に配置して Figure を返す"""
+        self.page_count += 1
+        self.suptitle.set_text(
+            f'グリフ比較 {self.page_count}ページ: U+{codes[0]:04X} 〜 U+{codes[-1]:04X} ({len(codes)}件)'
+        )
+        ylim = (-max(f['descent'] for f in fonts_data.values()) - 50,
+                max(f['ascent'] for f in fonts_data.values()) + 50)
+        
+        for i, cell in enumerate(self.cells):
+            if i >= len(codes):
+                for panel in cell.values():
+                    panel.ax.set_visible(False)
+                continue
+            
+            unicode_val = codes[i]
+            unicode_str = str(unicode_val)
+            glyphs = {key: fonts_data[key]['glyphs'].get(unicode_str)
+                      for key in FONT_KEYS if key in fonts_data}
             
-            fig.suptitle(f'グリフ比較: U+{unicode_val:04X} ({char_display})', fontsize=16, 
-                        fontfamily=get_font_family())
+            # セル内の3フォントは同じ横幅で表示する
+            max_width = max([g['width'] for g in glyphs.values() if g] + [500])
+            xlim = (-max_width * 0.05, max_width * 1.05)
             
-            # 各フォントのデータを取得・描画
-            for j, font_key in enumerate(['mplus', 'yasashisa', 'utatane']):
-                if j >= len(axes) or font_key not in fonts_data:
+            for k, (font_key, panel) in enumerate(cell.items()):
+                font_data = fonts_data.get(font_key)
+                if font_data is None:
+                    panel.ax.set_visible(False)
                     continue
+                panel.ax.set_visible(True)
                 
-                ax = axes[j]
-                font_data = fonts_data[font_key]
-                glyph_data = font_data['glyphs'].get(unicode_str)
-                
-                font_ascent = font_data['ascent']
-                font_descent = font_data['descent']
-                
-                if glyph_data:
-                    # グリフ形状を描画
-                    draw_glyph_shape(ax, glyph_data, font_ascent, font_descent, 
-                                   font_colors[font_key])
-                    
-                    # メトリクスボックスを描画
-                    draw_metrics_boxes(ax, glyph_data, font_ascent, font_descent)
-                    
-                    # タイトルと情報（グリフ名を追加）
-                    glyph_name = glyph_data.get('glyphname', 'Unknown')
-                    ax.set_title(f'{font_display_names[font_key]}\n'
-                               f'幅: {glyph_data["width"]:.0f}, LSB: {glyph_data["left_side_bearing"]:.0f}\n'
-                               f'グリフ名: {glyph_name}',
-                               fontfamily=get_font_family(), fontsize=10)
-                    
-                    # 軸設定
-                    width = glyph_data['width']
-                    margin = width * 0.1 if width > 0 else 50
-                    ax.set_xlim(-margin, width + margin)
-                    ax.set_ylim(-font_descent - 50, font_ascent + 50)
-                    
-                else:
-                    ax.set_title(f'{font_display_names[font_key]}\n（グリフなし）',
-                               fontfamily=get_font_family())
-                    ax.set_xlim(-100, 600)
-                    ax.set_ylim(-250, 850)
-                
-                ax.grid(True, alpha=0.3)
-                ax.set_aspect('equal')
-            
-            # レイアウト調整
-            plt.tight_layout()
-            pdf_pages.savefig(fig, dpi=150)
-            plt.close(fig)
+                glyph_data = glyphs[font_key]
+                label = f'{glyph_data["width"]:.0f}' if glyph_data else 'なし'
+                panel.update(glyph_data, font_data['ascent'], font_data['descent'],
+                             FONT_COLORS[font_key], label, xlim=xlim, ylim=ylim)
+                if k == 0:
+                    try:
+                        char_display = chr(unicode_val)
+                    except ValueError:
+                        char_display = ''
+                    panel.ax.set_title(f'U+{unicode_val:04X} {char_display}', fontsize=6,
+                                       fontfamily=get_font_family(), pad=2)
+        return self.fig
+    
+    def save_page(self, pdf_pages, fonts_data, codes):
+        """1ページ分（最大 rows x cols 件）をPDFに追加"""
+        pdf_pages.savefig(self.render(fonts_data, codes), dpi=150)
+    
+    def save_glyphs(self, pdf_pages, fonts_data, codes):
+        """グリフ列をページ単位に分けてPDFに追加"""
+        for start in range(0, len(codes), self.glyphs_per_page):
+            self.save_page(pdf_pages, fonts_data, codes[start:start + self.glyphs_per_page])
+    
+    def close(self):
+        plt.close(self.fig)
+
+def parse_grid(text):
+    """'4x6' 形式のグリッド指定を (rows, cols) に変換"""
+    try:
+        rows, cols = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"グリッドは 行x列 で指定してください: {text}")
+    if rows < 1 or cols < 1:
+        raise argparse.ArgumentTypeError(f"グリッドの行・列は1以上にしてください: {text}")
+    return rows, cols
+
+def create_renderer(font_display_names, layout='page', grid=(4, 6)):
+    """レイアウト指定に応じた描画クラスを作成"""
+    if layout == 'grid':
+        return GlyphGridRenderer(font_display_names, *grid)
+    return GlyphPageRenderer(font_display_names)
+
+# utatane.py の合成で元フォントのグリフに掛かる変換 (縮小率, 縦の移動量)
+# やさしさゴシックは JP_REDUCTION_MAT で縮小、M+はUtatane座標系に合わせて下移動、Ubuntu Monoはそのまま。
+# 横位置は improved_width_adjustment で送り幅に合わせて動くので、比較時に左端をそろえる。
+SOURCE_TRANSFORMS = {
+    'yasashisa': (800 / 880, 0.0),    # LATIN_ASCENT / JP_ASCENT
+    'mplus': (1.0, -(200 - 140)),     # -(DESCENT - MPLUS_DESCENT)
+    'ubuntu': (1.0, 0.0),
+}
+
+# 丸め（round）と単純化（SIMPLIFY_ERROR）で動く座標の許容差（font unit）
+UNCHANGED_TOLERANCE = 1.5
+
+def _placed_contours(glyph_data, scale=1.0, dy=0.0):
+    """変換を掛け、全体の左端を x=0 にそろえた輪郭のリスト"""
+    contours = [contour * scale + (0.0, dy) for contour in contour_arrays(glyph_data)]
+    if contours:
+        xmin = min(contour[:, 0].min() for contour in contours)
+        contours = [contour - (xmin, 0.0) for contour in contours]
+    return contours
+
+def _distance_to_polygon(points, polygon):
+    """各点から閉じた折れ線（輪郭の点を結んだもの）までの最短距離"""
+    a = polygon
+    ab = np.roll(polygon, -1, axis=0) - a
+    ap = points[:, None, :] - a[None, :, :]
+    length2 = np.maximum((ab * ab).sum(axis=1), 1e-12)
+    t = np.clip((ap * ab[None]).sum(axis=2) / length2, 0.0, 1.0)
+    nearest = a[None] + t[..., None] * ab[None]
+    return np.sqrt(((points[:, None, :] - nearest) ** 2).sum(axis=2)).min(axis=1)
+
+def _same_outline(target_contours, source_contours, tolerance=UNCHANGED_TOLERANCE):
+    """輪郭が許容差内で同じ形か
+
+    単純化で直線上の点が減ったり、重なり除去で開始点・向きが変わったりしても同じとみなすため、
+    点の一致ではなく、互いの点が相手の輪郭線上（許容差内）にあるかで比べる。
+    """
+    if len(target_contours) != len(source_contours):
+        return False
+    remaining = list(source_contours)
+    for target in target_contours:
+        for i, source in enumerate(remaining):
+            if (np.abs(target.min(axis=0) - source.min(axis=0)).max() <= tolerance and
+                    np.abs(target.max(axis=0) - source.max(axis=0)).max() <= tolerance and
+                    _distance_to_polygon(target, source).max() <= tolerance and
+                    _distance_to_polygon(source, target).max() <= tolerance):
+                del remaining[i]
+                break
+        else:
+            return False
+    return True
+
+def _cells(glyph_data, font_data):
+    """送り幅が半角いくつ分か"""
+    half = (font_data['ascent'] + font_data['descent']) / 2
+    return round(glyph_data['width'] / half)
+
+def is_unchanged_glyph(fonts_data, unicode_val, target='utatane'):
+    """Utataneのグリフが、元フォントのグリフに合成時の標準の変換を掛けただけのものか
+
+    元フォント（M+・やさしさゴシック・Ubuntu Mono）のグリフに SOURCE_TRANSFORMS の変換を掛けたものと
+    形状が許容差内で一致し、送り幅が同じ半角/全角ならレビュー対象から外せる。
+    """
+    unicode_str = str(unicode_val)
+    target_font = fonts_data.get(target, {})
+    target_glyph = target_font.get('glyphs', {}).get(unicode_str)
+    if not target_glyph:
+        return False
+    target_contours = _placed_contours(target_glyph)
+    for font_key, (scale, dy) in SOURCE_TRANSFORMS.items():
+        font_data = fonts_data.get(font_key)
+        glyph = font_data and font_data['glyphs'].get(unicode_str)
+        if not glyph or _cells(glyph, font_data) != _cells(target_glyph, target_font):
+            continue
+        if _same_outline(target_contours, _placed_contours(glyph, scale, dy)):
+            return True
+    return False
+
+def filter_unchanged(fonts_data, glyph_list):
+    """変更のないグリフを除いたリストを返す"""
+    changed = [code for code in glyph_list if not is_unchanged_glyph(fonts_data, code)]
+    skipped = len(glyph_list) - len(changed)
+    if skipped:
+        print(f"変更のないグリフを {skipped}件 スキップ（残り {len(changed)}件）")
+    return changed
+
+# 並列描画のワーカープロセス用（_init_worker で設定）
+_worker_data = None
+
+_worker_layout = ('page', (4, 6))
+
+def _init_worker(data_source, layout='page', grid=(4, 6)):
+    """ワーカープロセスでグリフデータを用意（パスなら各プロセスでmemmapし直す）"""
+    global _worker_data, _worker_layout
+    if isinstance(data_source, dict):
+        _worker_data = data_source
+    else:
+        _worker_data = load_glyph_data(data_source)
+    _worker_layout = (layout, grid)
+
+_worker_renderer = None
+
+def _render_chunk(task):
+    """グリフの塊を1つの一時PDFに描画（描画テンプレートはプロセス内で使い回す）"""
+    global _worker_renderer
+    index, codes, chunk_pdf, first_page = task
+    fonts_data = _worker_data['fonts']
+    if _worker_renderer is None:
+        _worker_renderer = create_renderer(get_font_display_names(fonts_data), *_worker_layout)
+    # ページ番号はワーカーごとではなく、出力PDF全体での通し番号にする
+    _worker_renderer.page_count = first_page - 1
+    with PdfPages(chunk_pdf) as pdf_pages:
+        _worker_renderer.save_glyphs(pdf_pages, fonts_data, codes)
+    return index, len(codes)
+
+def create_glyph_comparison_plot_parallel(data, output_pdf, jobs, data_path=None, chunk_size=None,
+                                          glyph_list=None, layout='page', grid=(4, 6)):
+    """グリフを塊に分けてワーカープロセスで描画し、最後に順番どおり連結する"""
+    if glyph_list is None:
+        glyph_list = data['metadata']['glyph_list']
+    total = len(glyph_list)
+    per_page = grid[0] * grid[1] if layout == 'grid' else 1
+    if chunk_size is None:
+        # 進捗を細かく出せるよう、ワーカー数の4倍程度に分割
+        chunk_size = max(4, math.ceil(total / (jobs * 4)))
+    # ページの途中で分割しないよう、1ページの件数の倍数にそろえる
+    chunk_size = math.ceil(chunk_size / per_page) * per_page
+    chunks = [glyph_list[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    
+    with tempfile.TemporaryDirectory(prefix='glyph_pages_') as tmp_dir:
+        tasks = [(i, codes, os.path.join(tmp_dir, f'chunk_{i:05d}.pdf'), i * chunk_size // per_page + 1)
+                 for i, codes in enumerate(chunks)]
+        
+        data_source = data_path if data_path else data
+        done = 0
+        with multiprocessing.Pool(jobs, initializer=_init_worker,
+                                  initargs=(data_source, layout, grid)) as pool:
+            for _index, count in pool.imap_unordered(_render_chunk, tasks):
+                done += count
+                print(f"進捗: {done}/{total} グリフ処理完了")
+        
+        writer = PdfWriter()
+        for _index, _codes, chunk_pdf, _first_page in tasks:
+            writer.append(chunk_pdf)
+        with open(output_pdf, 'wb') as f:
+            writer.write(f)
+    
+    print(f"PDF出力完了: {output_pdf} ({jobs}プロセス)")
+    return True
+
+def create_glyph_comparison_plot(data, output_pdf, jobs=1, data_path=None,
+                                 layout='page', grid=(4, 6), skip_unchanged=False):
+    """グリフ比較プロットを作成
+
+    jobs > 1 のときはワーカープロセスで並列に描画する（pypdf が必要）。
+    data_path を渡すと、各ワーカーはデータをpickleで受け取らずファイルから読み直す。
+    layout='grid' では grid=(行, 列) 個のグリフを1ページにまとめる。
+    """
+    glyph_list = data['metadata']['glyph_list']
+    fonts_data = data['fonts']
+    
+    if skip_unchanged:
+        glyph_list = filter_unchanged(fonts_data, glyph_list)
+    if not glyph_list:
+        print("比較するグリフがないため、PDF出力をスキップします")
+        return True
+    
+    if jobs > 1 and len(glyph_list) > 1:
+        if PdfWriter is not None:
+            return create_glyph_comparison_plot_parallel(
+                data, output_pdf, jobs, data_path,
+                glyph_list=glyph_list, layout=layout, grid=grid
+            )
+        print("警告: pypdf が利用できないため、1プロセスで描画します（uv add pypdf）")
+    
+    renderer = create_renderer(get_font_display_names(fonts_data), layout, grid)
+    per_page = getattr(renderer, 'glyphs_per_page', 1)
+    step = max(10, per_page)
+    
+    # PDF出力の準備
+    with PdfPages(output_pdf) as pdf_pages:
+        # ページ単位で比較ページを作成
+        for start in range(0, len(glyph_list), step):
+            codes = glyph_list[start:start + step]
+            renderer.save_glyphs(pdf_pages, fonts_data, codes)
             
             # プログレス表示
-            if (i + 1) % 10 == 0:
-                print(f"進捗: {i + 1}/{len(glyph_list)} グリフ処理完了")
+            print(f"進捗: {start + len(codes)}/{len(glyph_list)} グリフ処理完了")
+    renderer.close()
     
     print(f"PDF出力完了: {output_pdf}")
     return True
 
+def create_glyph_comparison_plot_stream(stream, output_pdf, layout='page', grid=(4, 6),
+                                        skip_unchanged=False):
+    """ストリーム形式のグリフデータを受け取りながら描画
+
+    1ページ分のグリフが届くたびに描画するため、抽出側と並行して処理が進む。
+    描画済みのグリフは保持しない。
+    """
+    header, records = read_stream(stream)
+    total = header['metadata']['total_glyphs']
+    fonts_data = {key: dict(info, glyphs={}) for key, info in header['fonts'].items()}
+    
+    renderer = create_renderer(get_font_display_names(fonts_data), layout, grid)
+    per_page = getattr(renderer, 'glyphs_per_page', 1)
+    pending = []
+    received = rendered = skipped = 0
+    
+    def flush(pdf_pages, codes):
+        renderer.save_glyphs(pdf_pages, fonts_data, codes)
+        for font_data in fonts_data.values():
+            for code in codes:
+                font_data['glyphs'].pop(str(code), None)
+    
+    with PdfPages(output_pdf) as pdf_pages:
+        for unicode_val, glyphs in records:
+            received += 1
+            for font_key, glyph_data in glyphs.items():
+                if glyph_data and font_key in fonts_data:
+                    fonts_data[font_key]['glyphs'][str(unicode_val)] = glyph_data
+            
+            if skip_unchanged and is_unchanged_glyph(fonts_data, unicode_val):
+                skipped += 1
+                for font_data in fonts_data.values():
+                    font_data['glyphs'].pop(str(unicode_val), None)
+                continue
+            
+            pending.append(unicode_val)
+            if len(pending) >= per_page:
+                flush(pdf_pages, pending)
+                rendered += len(pending)
+                pending = []
+                if rendered % max(10, per_page) < per_page:
+                    print(f"進捗: {received}/{total} グリフ受信, {rendered}件描画")
+        
+        if pending:
+            flush(pdf_pages, pending)
+            rendered += len(pending)
+    renderer.close()
+    
+    if skipped:
+        print(f"変更のないグリフを {skipped}件 スキップ")
+    if not rendered:
+        # 空のPDFは残さない
+        if os.path.exists(output_pdf):
+            os.remove(output_pdf)
+        print("比較するグリフがないため、PDF出力をスキップします")
+        return True
+    print(f"PDF出力完了: {output_pdf} ({rendered}件)")
+    return True
+
 def main():
     parser = argparse.ArgumentParser(description='グリフ可視化ツール')
-    parser.add_argument('json_file', help='グリフデータJSONファイル')
+    parser.add_argument('data_file', help='グリフデータファイル（.utgd または .json、- で標準入力のストリーム）')
     parser.add_argument('--output', '-o', help='PDF出力ファイル名')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='描画プロセス数（0: CPUコア数）')
+    parser.add_argument('--layout', choices=['page', 'grid'], default='page',
+                       help='page: 1グリフ1ページ, grid: 複数グリフを1ページに並べる')
+    parser.add_argument('--grid', type=parse_grid, default=(4, 6), metavar='行x列',
+                       help='グリッド表示の1ページあたりのグリフ数（デフォルト: 4x6）')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                       help='Utataneが元フォントのグリフを合成時の変換どおりに取り込んだだけのグリフを省く')
     
     args = parser.parse_args()
     
-    # JSONファイル読み込み
-    if not Path(args.json_file).exists():
-        print(f"エラー: JSONファイルが見つかりません: {args.json_file}")
+    # 標準入力からのストリーム（抽出と並行して描画）
+    if args.data_file == '-':
+        if not args.output:
+            args.output = 'glyph_stream_comparison.pdf'
+        if args.jobs != 1:
+            print("注意: ストリーム入力では1プロセスで描画します")
+        try:
+            success = create_glyph_comparison_plot_stream(
+                sys.stdin, args.output, layout=args.layout, grid=args.grid,
+                skip_unchanged=args.skip_unchanged
+            )
+        except ValueError as e:
+            print(f"エラー: グリフデータ読み込み失敗: {e}")
+            return 1
+        return 0 if success else 1
+    
+    # グリフデータ読み込み
+    if not Path(args.data_file).exists():
+        print(f"エラー: グリフデータファイルが見つかりません: {args.data_file}")
         return 1
     
     try:
-        with open(args.json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_glyph_data(args.data_file)
     except Exception as e:
-        print(f"エラー: JSONファイル読み込み失敗: {e}")
+        print(f"エラー: グリフデータ読み込み失敗: {e}")
         return 1
     
     # 出力ファイル名決定
     if not args.output:
-        json_stem = Path(args.json_file).stem
-        args.output = f"{json_stem}_comparison.pdf"
+        data_stem = Path(args.data_file).stem
+        args.output = f"{data_stem}_comparison.pdf"
     
     # グリフ比較プロット作成
     print(f"グリフ可視化開始: {len(data['metadata']['glyph_list'])}件のグリフ")
-    success = create_glyph_comparison_plot(data, args.output)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    success = create_glyph_comparison_plot(data, args.output, jobs=jobs, data_path=args.data_file,
+                                           layout=args.layout, grid=args.grid,
+                                           skip_unchanged=args.skip_unchanged)
     
     return 0 if success else 1
 
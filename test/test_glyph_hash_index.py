@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import fontforge
+
+from glyph_hash_index import build_hash_index, glyph_hash
+
+
+REGULAR_FONT = 'Utatane-Regular.ttf'
+
+
+class TestGlyphHash(unittest.TestCase):
+    """glyph_hash_index のハッシュが輪郭・参照の違いを区別するか
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.font = fontforge.open(REGULAR_FONT)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.font.close()
+
+    def test_different_outlines(self):
+        """同じ送り幅で輪郭の違うグリフは別のハッシュ
+        """
+        for a, b in [(' ', '%'), ('0', 'O'), ('l', '1')]:
+            with self.subTest(pair=a + b):
+                self.assertEqual(self.font[ord(a)].width, self.font[ord(b)].width)
+                self.assertNotEqual(glyph_hash(self.font[ord(a)]), glyph_hash(self.font[ord(b)]))
+
+    def test_same_outline(self):
+        """同じグリフは何度計算しても同じハッシュ
+        """
+        glyph = self.font[ord('A')]
+        self.assertEqual(glyph_hash(glyph), glyph_hash(glyph))
+
+    def test_references(self):
+        """参照先の違う複合グリフは別のハッシュ
+        """
+        composites = {}
+        for glyph in self.font.glyphs():
+            if glyph.references and not len(glyph.foreground):
+                composites.setdefault(glyph.references[0][0], glyph)
+        if len(composites) < 2:
+            self.skipTest('参照先の違う複合グリフが2つ以上ない')
+        hashes = {glyph_hash(glyph) for glyph in composites.values()}
+        self.assertEqual(len(composites), len(hashes))
+
+    def test_reference_outline(self):
+        """参照先の輪郭が変われば複合グリフのハッシュも変わる（参照先のハッシュを含める）
+        """
+        composite = next((glyph for glyph in self.font.glyphs() if glyph.references), None)
+        if composite is None:
+            self.skipTest('複合グリフがない')
+        base = composite.references[0][0]
+        self.assertNotEqual(glyph_hash(composite, {base: 'before'}),
+                            glyph_hash(composite, {base: 'after'}))
+
+    def test_index_distinct(self):
+        """輪郭を持つ英数字のハッシュはすべて異なる
+        """
+        codes = [code for code in range(0x21, 0x7E + 1) if code in self.font]
+        index = build_hash_index(self.font, codes)
+        self.assertEqual(len(codes), len(set(index.values())))
+
+
+if __name__ == "__main__":
+    unittest.main()
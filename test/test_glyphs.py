@@ -1,24 +1,114 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import multiprocessing
+import os
+import unicodedata
 import unittest
+
 import fontforge
 
 
 REGULAR_FONT = 'Utatane-Regular.ttf'
 BOLD_FONT = 'Utatane-Bold.ttf'
 
+# グリフのバウンディングボックスの上限（縦横とも）
+MAX_GLYPH_SIZE = 1024
+# 半角・全角の送り幅
+WIDTH_CLASSES = (500, 1000)
+# 送り幅0を許す文字（結合文字・書式制御文字）
+ZERO_WIDTH_CATEGORIES = ('Mn', 'Me', 'Cf')
+# 輪郭が空でよい文字（空白・制御文字・書式制御文字）
+BLANK_CATEGORIES = ('Zs', 'Zl', 'Zp', 'Cc', 'Cf')
+
+RULES = ('overflow', 'width', 'vertical', 'empty')
+
+# 1ワーカーあたりのチャンク数（細かく分けるほど早期終了が早く効く）
+CHUNKS_PER_JOB = 4
+
+# 親プロセスで開いたフォント（fork したワーカーはこれをそのまま使う）
+_worker_font = None
+
+
+def vertical_limits(font):
+    """縦方向の上限・下限（Windowsはこの範囲外を描画しない）"""
+    ascent = font.os2_winascent + (font.ascent if font.os2_winascent_add else 0)
+    descent = font.os2_windescent + (font.descent if font.os2_windescent_add else 0)
+    return ascent, descent
+
+
+def collect_glyph_metrics(names):
+    """指定したグリフのメトリクス -> [(グリフ名, コードポイント, 送り幅, bbox, 輪郭が空か)]"""
+    font = _worker_font
+    metrics = []
+    for name in names:
+        g = font[name]
+        empty = len(g.foreground) == 0 and not g.references
+        metrics.append((name, g.unicode, g.width, g.boundingBox(), empty))
+    return metrics
+
+
+def find_violations(metrics, limits, rules=RULES):
+    """メトリクスから規則違反を調べ、(規則, コードポイント, グリフ名, 詳細) のリストを返す"""
+    ascent, descent = limits
+    violations = []
+    for name, code, width, (xmin, ymin, xmax, ymax), empty in metrics:
+        category = unicodedata.category(chr(code)) if code >= 0 else ''
+        checks = {
+            'overflow': (xmax - xmin > MAX_GLYPH_SIZE or ymax - ymin > MAX_GLYPH_SIZE,
+                         lambda: f'{xmax - xmin:g} x {ymax - ymin:g} > {MAX_GLYPH_SIZE}'),
+            'width': (width not in WIDTH_CLASSES
+                      and not (width == 0 and category in ZERO_WIDTH_CATEGORIES),
+                      lambda: f'width {width:g} not in {WIDTH_CLASSES}'),
+            'vertical': (not empty and (ymax > ascent or ymin < -descent),
+                         lambda: f'y {ymin:g}..{ymax:g} outside {-descent}..{ascent}'),
+            'empty': (empty and code >= 0 and category not in BLANK_CATEGORIES,
+                      lambda: 'no outline'),
+        }
+        for rule in rules:
+            failed, detail = checks[rule]
+            if failed:
+                violations.append((rule, code, name, detail()))
+    return violations
+
+
+def check_glyph_invariants(ttfpath, rules=RULES, jobs=None, stop_on_first=False):
+    """グリフをワーカープロセスに分けて調べ、全違反を返す
+
+    フォントは親プロセスで1回だけ開き、fork したワーカーには担当するグリフ名だけを渡す。
+    stop_on_first=True なら違反のあるチャンクが見つかった時点で残りを打ち切る。
+    """
+    global _worker_font
+    jobs = jobs or os.cpu_count() or 1
+    _worker_font = fontforge.open(ttfpath)
+    try:
+        names = [g.glyphname for g in _worker_font.glyphs() if g.isWorthOutputting()]
+        limits = vertical_limits(_worker_font)
+        n_chunks = jobs * CHUNKS_PER_JOB
+        tasks = [names[chunk::n_chunks] for chunk in range(n_chunks)]
+        violations = []
+        with multiprocessing.get_context('fork').Pool(jobs) as pool:
+            for metrics in pool.imap_unordered(collect_glyph_metrics, tasks):
+                violations.extend(find_violations(metrics, limits, rules))
+                if violations and stop_on_first:
+                    break
+    finally:
+        _worker_font.close()
+        _worker_font = None
+    return sorted(violations, key=lambda v: (RULES.index(v[0]), v[1], v[2]))
+
+
+def format_violations(violations):
+    """違反の一覧表"""
+    lines = [f'{len(violations)} violation(s):']
+    for rule, code, name, detail in violations:
+        codepoint = f'U+{code:04X}' if code >= 0 else '-'
+        lines.append(f'  {rule:<9} {codepoint:<8} {name:<24} {detail}')
+    return '\n'.join(lines)
+
 
 def check_overflow(ttfpath):
-    f = fontforge.open(ttfpath)
-    for g in f.glyphs():
-        if g.isWorthOutputting():
-            bb = g.boundingBox()
-            overflowX = bb[2] - bb[0]
-            overflowY = bb[3] - bb[1]
-            if overflowX > 1024 or overflowY > 1024:
-                return False
-    return True
+    return not check_glyph_invariants(ttfpath, rules=('overflow',), stop_on_first=True)
 
 
 
@@ -38,5 +128,19 @@ class TestGlyphs(unittest.TestCase):
         actual = check_overflow(BOLD_FONT)
         self.assertEqual(True, actual)
 
+    def test_regular_invariants(self):
+        """overflow / width / vertical / empty for regular
+        """
+        violations = check_glyph_invariants(REGULAR_FONT)
+        if violations:
+            self.fail(format_violations(violations))
+
+    def test_bold_invariants(self):
+        """overflow / width / vertical / empty for bold
+        """
+        violations = check_glyph_invariants(BOLD_FONT)
+        if violations:
+            self.fail(format_violations(violations))
+
 if __name__ == "__main__":
     unittest.main()
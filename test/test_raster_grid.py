@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""端末グリッド適合テスト（matplotlib の FreeType バインディングでラスタライズ）
+
+test/font_disp.txt と test/width_improvement.txt の文字を複数のピクセルサイズで描画し、
+- 送り幅がセル幅（'0' の送り幅）のちょうど1倍か2倍になっているか
+- 罫線素片がセルの端まで届き、隣のセルの罫線と継ぎ目なくつながるか
+を確認する。
+
+セル端の判定をはっきりさせるため、描画は白黒2値（ヒンティングあり）で行う。
+描画したタイルと送り幅はピクセルサイズとグリフごとのハッシュ（glyf のデータ・hmtx・ヒンティング用の
+共通テーブル）をキーに tmp/cache/raster に保存する。フォントを作り直しても、変わったグリフだけを描画し直す。
+今回の実行で使わなかったタイルは保存時に捨てる。
+
+    python test/test_raster_grid.py
+"""
+
+import hashlib
+import math
+import os
+import re
+import unicodedata
+import unittest
+
+try:
+    import numpy as np
+    from matplotlib.ft2font import FT2Font, LoadFlags
+    FT2FONT_AVAILABLE = True
+except ImportError:
+    FT2FONT_AVAILABLE = False
+
+try:
+    from fontTools.ttLib import TTFont
+    FONTTOOLS_AVAILABLE = True
+except ImportError:
+    FONTTOOLS_AVAILABLE = False
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(TEST_DIR)
+
+FONT_DIR = os.path.join(BASE_DIR, 'dist')
+REGULAR_FONT = 'Utatane-Regular.ttf'
+BOLD_FONT = 'Utatane-Bold.ttf'
+
+TEST_TEXT_FILES = ['font_disp.txt', 'width_improvement.txt']
+
+# 半角(500)・全角(1000)が整数ピクセルになるサイズ（UPM 1000 で偶数ppem）
+PPEM_SIZES = (12, 14, 16, 20, 24)
+
+# 白黒2値で描画する（アンチエイリアスの中間調だとセル端の判定があいまいになる）
+LOAD_FLAGS = LoadFlags.TARGET_MONO if FT2FONT_AVAILABLE else None
+
+TILE_CACHE_PATH = os.path.join(BASE_DIR, 'tmp', 'cache', 'raster', 'tiles.npz')
+
+FULL_BLOCK_CODE = 0x2588
+BOX_DRAWING_CODES = range(0x2500, 0x257F + 1)
+
+# 見出しの「（幅: 500）」「（幅変更: 500→1000に正規化）」から期待する幅を読む
+SECTION_WIDTH_RE = re.compile(r'幅[^0-9（）()]*?(?:\d+→)?(\d+)')
+
+
+def read_test_chars(path):
+    """テスト文字列ファイルから {文字: 期待セル数 または None} を作る
+
+    見出しに幅の指定があり「一部」の例外がないセクションは、その幅を期待値にする。
+    """
+    chars = {}
+    expected = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('#'):
+                match = SECTION_WIDTH_RE.search(line)
+                expected = None
+                if match and '一部' not in line:
+                    expected = int(match.group(1)) // 500
+                continue
+            for char in line:
+                if char.isspace() or ord(char) <= 0x20:
+                    continue
+                if chars.get(char) is None:
+                    chars[char] = expected
+    return chars
+
+
+def box_drawing_connections(code):
+    """罫線素片の名前から (線の種類, つながる方向の集合) を返す（対象外は None）
+
+    例: BOX DRAWINGS LIGHT DOWN AND RIGHT -> ('LIGHT', {'down', 'right'})
+    線種が混在するもの・点線・弧・斜線は対象外。
+    """
+    try:
+        words = unicodedata.name(chr(code)).split()
+    except ValueError:
+        return None
+    if words[:2] != ['BOX', 'DRAWINGS'] or len(words) < 4:
+        return None
+    weight = words[2]
+    if weight not in ('LIGHT', 'HEAVY', 'DOUBLE'):
+        return None
+    directions = set()
+    for word in words[3:]:
+        if word == 'HORIZONTAL':
+            directions |= {'left', 'right'}
+        elif word == 'VERTICAL':
+            directions |= {'up', 'down'}
+        elif word in ('LEFT', 'RIGHT', 'UP', 'DOWN'):
+            directions.add(word.lower())
+        elif word != 'AND':
+            return None
+    return weight, directions
+
+
+class TileCache:
+    """描画結果の保存先（キー: ppem:種類:グリフのハッシュ、値: numpy配列）
+
+    保存済みのタイルは使うときに1つずつ読む。save() では今回の実行で使ったタイルだけを書き、
+    使わなかったもの（作り直す前のフォントのグリフなど）は捨てる。
+    """
+
+    def __init__(self, path=TILE_CACHE_PATH):
+        self.path = path
+        self.tiles = {}
+        self.stored = None
+        self.stored_keys = set()
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                self.stored = np.load(path)
+                self.stored_keys = set(self.stored.files)
+            except (OSError, ValueError):
+                self.stored = None
+
+    def get(self, key):
+        if key not in self.tiles and key in self.stored_keys:
+            self.tiles[key] = self.stored[key]
+        return self.tiles.get(key)
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.dirty = True
+
+    def save(self):
+        if self.stored is not None:
+            self.stored.close()
+            self.stored = None
+        if not self.dirty and self.stored_keys == set(self.tiles):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path[:-len('.npz')] + '.tmp.npz'
+        np.savez_compressed(tmp_path, **self.tiles)
+        os.replace(tmp_path, self.path)
+        self.stored_keys = set(self.tiles)
+        self.dirty = False
+
+
+class GlyphKeys:
+    """コードポイント -> 描画結果が変わりうる内容のハッシュ
+
+    グリフの glyf データ（複合グリフは部品のハッシュと配置）・hmtx と、
+    ヒンティングに使う共通テーブル（fpgm/prep/cvt/gasp, maxp の上限, upem, ascender/descender）から作る。
+    グリフ番号は含めないので、グリフが増えて番号がずれても変わらないグリフのキーは同じ。
+    """
+
+    def __init__(self, path):
+        self.font = TTFont(path, lazy=True)
+        self.cmap = self.font.getBestCmap()
+        self.glyf = self.font['glyf']
+        self.hmtx = self.font['hmtx']
+        self.memo = {}
+        maxp = self.font['maxp']
+        common = [self.font.reader[tag] if tag in self.font.reader else b''
+                  for tag in ('fpgm', 'prep', 'cvt ', 'gasp')]
+        common.append(repr((self.font['head'].unitsPerEm,
+                            self.font['hhea'].ascent, self.font['hhea'].descent,
+                            maxp.maxZones, maxp.maxTwilightPoints, maxp.maxStorage,
+                            maxp.maxFunctionDefs, maxp.maxInstructionDefs,
+                            maxp.maxStackElements, maxp.maxSizeOfInstructions)).encode())
+        self.common = hashlib.sha1(b'\0'.join(common)).digest()
+
+    def glyph_hash(self, name):
+        if name not in self.memo:
+            glyph = self.glyf[name]
+            if glyph.isComposite():
+                program = glyph.program.getBytecode() if hasattr(glyph, 'program') else b''
+                parts = [(self.glyph_hash(c.glyphName), c.x, c.y, getattr(c, 'transform', None), c.flags)
+                         for c in glyph.components]
+                data = repr(parts).encode() + program
+            else:
+                data = glyph.compile(self.glyf, recalcBBoxes=False)
+            self.memo[name] = hashlib.sha1(self.common + data + repr(self.hmtx[name]).encode()).hexdigest()
+        return self.memo[name]
+
+    def key(self, code):
+        name = self.cmap.get(code)
+        return self.glyph_hash(name)[:16] if name is not None else 'none'
+
+
+class RasterFont:
+    """1つのフォント・1つのピクセルサイズでの描画"""
+
+    def __init__(self, path, ppem, cache, keys):
+        self.path = path
+        self.ppem = ppem
+        self.cache = cache
+        self.font = FT2Font(path)
+        self.font.set_size(ppem, 72)  # 72dpi で pt = px
+        upem = self.font.units_per_EM
+        self.ascent = math.ceil(self.font.ascender * ppem / upem)
+        self.descent = math.ceil(-self.font.descender * ppem / upem)
+        self.cell_height = self.ascent + self.descent
+        self.keys = keys
+        self.rendered = 0
+        self.cell_width = self.advance(ord('0'))
+
+    def has_glyph(self, code):
+        return self.font.get_char_index(code) != 0
+
+    def advance(self, code):
+        """ヒンティング後の送り幅（ピクセル、キャッシュ優先）"""
+        key = f'{self.ppem}:advance:{self.keys.key(code)}'
+        advance = self.cache.get(key)
+        if advance is None:
+            advance = np.array(self.font.load_char(code, LOAD_FLAGS).horiAdvance / 64)
+            self.cache.put(key, advance)
+        return float(advance)
+
+    def tile(self, code):
+        """送り幅 x 行の高さ のセルにグリフを描画したインクの真偽値配列（キャッシュ優先）
+
+        キーはグリフを読み込む前に決まるので、キャッシュにあればヒンティングも描画もしない。
+        """
+        key = f'{self.ppem}:tile:{self.keys.key(code)}'
+        tile = self.cache.get(key)
+        if tile is None:
+            glyph = self.font.load_char(code, LOAD_FLAGS)
+            width = int(round(glyph.horiAdvance / 64))
+            canvas = np.zeros((self.cell_height, max(width, 1)), dtype=np.uint8)
+            self.font.draw_glyph_to_bitmap(canvas, 0, self.ascent - glyph.horiBearingY // 64, glyph,
+                                           antialiased=False)
+            tile = canvas > 0
+            self.cache.put(key, tile)
+            self.rendered += 1
+        return tile
+
+    def vertical_extent(self):
+        """█ FULL BLOCK のインクの上端・下端の行（罫線の上下端の基準）"""
+        if self.has_glyph(FULL_BLOCK_CODE):
+            rows = np.nonzero(self.tile(FULL_BLOCK_CODE).any(axis=1))[0]
+            if len(rows):
+                return rows[0], rows[-1]
+        return 0, self.cell_height - 1
+
+
+def check_advances(raster, chars):
+    """送り幅がセル幅の1倍・2倍（見出しに幅指定があればその倍数）かを調べて違反を返す"""
+    violations = []
+    cell = raster.cell_width
+    for char, expected in chars.items():
+        code = ord(char)
+        if not raster.has_glyph(code):
+            continue
+        advance = raster.advance(code)
+        label = f"{raster.ppem}px U+{code:04X} '{char}'"
+        if advance not in (cell, cell * 2):
+            violations.append(f"{label}: 送り幅 {advance:g}px がセル幅 {cell:g}px の1倍・2倍でない")
+        elif expected is not None and advance != cell * expected:
+            violations.append(f"{label}: 送り幅 {advance:g}px （期待: {expected}セル = {cell * expected:g}px）")
+    return violations
+
+
+def check_box_seams(raster, codes):
+    """罫線素片がつながる方向のセル端までインクがあり、基準の罫線と同じ太さ・位置かを調べる"""
+    violations = []
+    top, bottom = raster.vertical_extent()
+
+    targets = {}
+    for code in codes:
+        connections = box_drawing_connections(code)
+        if connections and raster.has_glyph(code):
+            targets[code] = connections
+
+    # 線種ごとの基準（─ ━ ═ と │ ┃ ║）
+    references = {}
+    for code, (weight, directions) in targets.items():
+        name = unicodedata.name(chr(code))
+        if name == f'BOX DRAWINGS {weight} HORIZONTAL':
+            references[(weight, 'h')] = raster.tile(code)
+        elif name == f'BOX DRAWINGS {weight} VERTICAL':
+            references[(weight, 'v')] = raster.tile(code)
+
+    edges = {
+        'left': (lambda ink: ink[:, 0], 'h'),
+        'right': (lambda ink: ink[:, -1], 'h'),
+        'up': (lambda ink: ink[top, :], 'v'),
+        'down': (lambda ink: ink[bottom, :], 'v'),
+    }
+
+    for code, (weight, directions) in sorted(targets.items()):
+        ink = raster.tile(code)
+        label = f"{raster.ppem}px U+{code:04X} '{chr(code)}'"
+        for direction in sorted(directions):
+            edge, axis = edges[direction]
+            profile = edge(ink)
+            if not profile.any():
+                violations.append(f"{label}: {direction} 側のセル端にインクがない")
+                continue
+            reference = references.get((weight, axis))
+            if reference is not None and reference.shape == ink.shape:
+                if not np.array_equal(profile, edge(reference)):
+                    violations.append(f"{label}: {direction} 側の端の線が基準の {weight} 罫線と一致しない")
+
+    # 直線の罫線は自分自身と継ぎ目なくつながる（左端と右端、上端と下端が一致）
+    for (weight, axis), ink in sorted(references.items()):
+        if axis == 'h' and not np.array_equal(ink[:, 0], ink[:, -1]):
+            violations.append(f"{raster.ppem}px {weight} 横線: 左端と右端の線の位置が一致しない")
+        if axis == 'v' and not np.array_equal(ink[top, :], ink[bottom, :]):
+            violations.append(f"{raster.ppem}px {weight} 縦線: 上端と下端の線の位置が一致しない")
+    return violations
+
+
+@unittest.skipUnless(FT2FONT_AVAILABLE and FONTTOOLS_AVAILABLE, 'matplotlib (ft2font) と fontTools が必要です')
+class TestRasterGrid(unittest.TestCase):
+    """ラスタライズ結果が端末のセルグリッドに収まるか"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.chars = {}
+        for name in TEST_TEXT_FILES:
+            for char, expected in read_test_chars(os.path.join(TEST_DIR, name)).items():
+                if cls.chars.get(char) is None:
+                    cls.chars[char] = expected
+        cls.box_codes = sorted(ord(c) for c in cls.chars if ord(c) in BOX_DRAWING_CODES)
+        cls.cache = TileCache()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cache.save()
+
+    def _run_check(self, font_name, check):
+        path = os.path.join(FONT_DIR, font_name)
+        if not os.path.exists(path):
+            self.skipTest(f'{path} がありません（先に utatane.py でビルド）')
+        keys = GlyphKeys(path)
+        for ppem in PPEM_SIZES:
+            with self.subTest(font=font_name, ppem=ppem):
+                violations = check(RasterFont(path, ppem, self.cache, keys))
+                self.assertEqual([], violations, f'{len(violations)}件の違反:\n' + '\n'.join(violations))
+
+    def test_regular_advances(self):
+        """regular: 送り幅がセルグリッドに乗る"""
+        self._run_check(REGULAR_FONT, lambda raster: check_advances(raster, self.chars))
+
+    def test_bold_advances(self):
+        """bold: 送り幅がセルグリッドに乗る"""
+        self._run_check(BOLD_FONT, lambda raster: check_advances(raster, self.chars))
+
+    def test_regular_box_seams(self):
+        """regular: 罫線素片がセル端で継ぎ目なくつながる"""
+        self._run_check(REGULAR_FONT, lambda raster: check_box_seams(raster, self.box_codes))
+
+    def test_bold_box_seams(self):
+        """bold: 罫線素片がセル端で継ぎ目なくつながる"""
+        self._run_check(BOLD_FONT, lambda raster: check_box_seams(raster, self.box_codes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,6 +12,8 @@ import sys
 import math
 import datetime
 
+import width_policy
+
 VERSION = '1.3.2'
 FONTNAME = 'Utatane'
 
@@ -81,6 +83,15 @@ FULLWIDTH_CODES = FULLWIDTH_HIRAGANA_KATAKANA + \
     FULLWIDTH_CJK_UNIFIED_EX_D + \
     FULLWIDTH_CJK_COMPATI_SUPP
 
+# 部分集合版で絞り込む対象の漢字（これ以外の文字は部分集合版にもすべて残す）
+CJK_IDEOGRAPH_CODES = set(FULLWIDTH_CJK_UNIFIED +
+                          FULLWIDTH_CJK_COMPATI +
+                          FULLWIDTH_CJK_UNIFIED_EX_A +
+                          FULLWIDTH_CJK_UNIFIED_EX_B +
+                          FULLWIDTH_CJK_UNIFIED_EX_C +
+                          FULLWIDTH_CJK_UNIFIED_EX_D +
+                          FULLWIDTH_CJK_COMPATI_SUPP)
+
 # 日本語フォントの縮小率
 JP_A_RAT = (LATIN_ASCENT/JP_ASCENT) # 高さの比でいいはず
 JP_REDUCTION_MAT = psMat.scale(JP_A_RAT, JP_A_RAT)
@@ -103,6 +114,56 @@ DECO_CHAR = '-'
 
 DEBUG = False
 
+# 重複する輪郭を参照（複合グリフ）にまとめるときに同一とみなす座標の誤差（font unit）
+# 0 なら位置以外が完全に一致する輪郭だけをまとめる
+DEDUP_TOLERANCE = 0
+
+# 輪郭の単純化で許す誤差（font unit）。0 なら単純化しない
+# 直線上の点・ほぼ重なる点・ごく短い線分を取り除く（極値の点は残す）
+SIMPLIFY_ERROR = 1
+SIMPLIFY_FLAGS = ('mergelines', 'removesingletonpoints')
+
+# 生成後にグリフをコードポイント順に並べ替え、cmapの範囲数を減らす（post_generate.py cmap）
+OPTIMIZE_CMAP = True
+
+# 生成後に送り幅が半角・全角だけか検査し、全角のグリフを末尾にまとめて hmtx を小さくする
+# （post_generate.py hmtx）。半角・全角以外の送り幅があればビルドを失敗させる
+OPTIMIZE_HMTX = True
+
+# hdmx・VDMX を生成するppemの範囲（空なら hdmx・LTSH・VDMX を生成しない）
+# LTSH はこの範囲によらず 1-255 ppem のヒンティング後の送り幅を確かめて作る（1フォント1分ほど）
+# require: `sudo pip install fonttools` or `uv tool install fonttools`
+DEVICE_TABLE_PPEMS = list(range(8, 64+1))
+
+# 通常版に加えて生成する部分集合版（dist/<プロファイル名>/ に出力）
+# 漢字だけをプロファイルの範囲に絞り、それ以外の文字（かな・記号・英数字など）はすべて残す
+# ファミリー名にはプロファイル名を大文字にして加える（例: Utatane JIS0208）
+#   'jis0208'        : JIS X 0208 の漢字（第1・第2水準）
+#   'file:<パス>'    : ファイルに列挙した漢字（U+XXXX, U+XXXX-U+YYYY または文字そのもの。#以降はコメント）
+#                      ファイル中の漢字以外の文字は無視する（かなや記号は絞れない）
+# 例: SUBSET_PROFILES = ['jis0208', 'file:./tmp/joyo.txt']
+# require: `uv tool install fonttools` (pyftsubset)
+SUBSET_PROFILES = []
+
+# TTFに加えてCFF形式のOTF (dist/<フォント名>.otf) も生成する
+# 加工済みのフォントから続けて出力するので、合成処理はやり直さない
+GENERATE_OTF = False
+
+# 通常版と部分集合版を、ウェイトごとに1つの .ttc (dist/<フォント名>.ttc) にまとめる
+# 同じ内容のテーブルは1つだけ格納される
+BUILD_TTC = False
+
+# 生成後に送り幅と比べる端末の文字幅表（data/terminal_widths.json。空なら比べない）
+# 食い違いは ./tmp/terminal_widths_<フォント名>.json に出力する（analysis/terminal_width_check.py）
+TERMINAL_WIDTH_TABLES = ['glibc', 'xterm', 'eaw-narrow', 'eaw-wide']
+
+# East_Asian_Width=A（曖昧）で data/width_overrides.txt にない文字のセル数
+# None なら元グリフの幅に従う（1: 半角, 2: 全角）
+AMBIGUOUS_CELLS = None
+
+# 字面が送り幅より広いグリフを横に縮めて収めるときの、左右それぞれの余白
+FIT_BEARING = 25
+
 # 設定可能な罫線描画モードを実装予定
 BOX_DRAWING_MODE = "console_optimized"  # default (現在仕様)
 # BOX_DRAWING_MODE = "mplus_compatible"  # M+完全準拠
@@ -177,6 +238,33 @@ def improved_width_adjustment(glyph, target_width):
     return glyph
 
 
+def policy_width(_glyph, _policy):
+    """グリフの送り幅 -> (送り幅, 決め方)
+
+    width_policy の表で半角・全角を決める。表で決まらない文字（East_Asian_Width=A で
+    上書き設定のないもの、結合文字、グリフ名だけのグリフなど）は元グリフの幅に従う。
+    """
+    cells, source = _policy.decide(_glyph.unicode)
+    if cells is None:
+        cells = 2 if _glyph.width > WIDTH * 0.7 else 1
+    return int(WIDTH//2) * cells, source
+
+
+def fit_to_width(_glyph, _width):
+    """字面が送り幅より広いグリフを横に縮めて収める -> 横の倍率（縮めなければ 1.0）
+
+    表で元グリフより狭い幅になった記号（✓ ☐ ➀ ﬀ など）は、そのままだと
+    improved_width_adjustment で負のサイドベアリングになり、隣のセルにはみ出す。
+    """
+    xmin, _, xmax, _ = _glyph.boundingBox()
+    if xmax - xmin <= _width:
+        return 1.0
+    ratio = (_width - FIT_BEARING * 2) / (xmax - xmin)
+    _glyph.transform(psMat.compose(psMat.compose(
+        psMat.translate(-xmin, 0), psMat.scale(ratio, 1)), psMat.translate(xmin, 0)))
+    return ratio
+
+
 def indent_print(_str):
     print('')
     print('++ ' + _str)
@@ -329,6 +417,46 @@ def set_height(_font):
     return _font
 
 
+def count_points(_glyph):
+    return sum(len(c) for c in _glyph.foreground)
+
+
+def simplify_outlines(_font):
+    '''輪郭の冗長な点を SIMPLIFY_ERROR の誤差内で取り除く
+    縮小(JP_REDUCTION_MAT)・round()・removeOverlap()で増えた点を減らす。
+    グリフごとの削減点数は ./tmp/simplify_<フォント名>.tsv に出力する。
+    '''
+    if SIMPLIFY_ERROR <= 0:
+        return _font
+
+    indent_print('simplify outlines ... (error: {})'.format(SIMPLIFY_ERROR))
+
+    savings = []
+    total_before = total_after = 0
+    for g in _font.glyphs():
+        before = count_points(g)
+        if before == 0:
+            continue
+        g.simplify(SIMPLIFY_ERROR, SIMPLIFY_FLAGS)
+        g.round()
+        after = count_points(g)
+        total_before += before
+        total_after += after
+        if after < before:
+            savings.append((before - after, g.glyphname, before, after))
+
+    savings.sort(key=lambda s: (-s[0], s[1]))
+    report_path = './tmp/simplify_{}.tsv'.format(_font.fullname)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write('glyph\tbefore\tafter\tsaved\n')
+        for saved, name, before, after in savings:
+            f.write('{}\t{}\t{}\t{}\n'.format(name, before, after, saved))
+
+    print('points: {} -> {} ({} glyphs simplified, report: {})'.format(
+        total_before, total_after, len(savings), report_path))
+    return _font
+
+
 def post_process(_font):
     '''座標値などをいい感じに処理する。
     removeOverlap()を実行しないと文字が消えることがある。
@@ -339,6 +467,7 @@ def post_process(_font):
     _font.selection.all()
     _font.removeOverlap()
     _font.round()
+    _font = simplify_outlines(_font)
     _font.autoHint()
     _font.autoInstr()
     _font.selection.none()
@@ -346,6 +475,53 @@ def post_process(_font):
     return _font
 
 
+def outline_key(_glyph):
+    '''位置をそろえた輪郭の比較用キーと、その基準位置(bboxの左下)を返す
+    参照を含むグリフや空のグリフは対象外で (None, None)
+    '''
+    layer = _glyph.foreground
+    if _glyph.references or len(layer) == 0:
+        return None, None
+
+    xmin, ymin, _, _ = _glyph.boundingBox()
+    step = DEDUP_TOLERANCE*2 + 1
+    contours = []
+    for c in layer:
+        points = [(int(round((p.x-xmin)/step)), int(round((p.y-ymin)/step)), p.on_curve) for p in c]
+        # 開始点の違いは無視する
+        start = points.index(min(points))
+        contours.append(tuple(points[start:] + points[:start]))
+    return tuple(sorted(contours)), (xmin, ymin)
+
+
+def dedup_glyphs(_font):
+    '''同じ輪郭のグリフを、最初に現れたグリフへの参照（TrueTypeの複合グリフ）に置き換える
+    CJK互換漢字や vertical_line_to_broken_bar でコピーしたグリフなどが対象。
+    '''
+    indent_print('dedup glyphs ...')
+
+    bases = {}
+    replaced = 0
+    for g in _font.glyphs():
+        key, origin = outline_key(g)
+        if key is None:
+            continue
+        if key not in bases:
+            bases[key] = (g.glyphname, origin)
+            continue
+
+        base_name, base_origin = bases[key]
+        width = g.width
+        g.clear()
+        g.ttinstrs = b''
+        g.addReference(base_name, psMat.translate(origin[0]-base_origin[0], origin[1]-base_origin[1]))
+        g.width = width
+        replaced += 1
+
+    print('{} glyphs replaced with references'.format(replaced))
+    return _font
+
+
 def modify_and_save_latin(_f, _savepath):
     deco_print('modify latin : {}'.format(_f.get('latin')))
 
@@ -422,6 +598,8 @@ def modify_and_save_jp(_f, _savepath):
     mplus_font.close()
 
 
+    policy = width_policy.WidthPolicy(ambiguous=AMBIGUOUS_CELLS)
+    report = []
     for g in jp_font.glyphs():
         if not g.isWorthOutputting:
             # 不要っぽいやつは消しちゃう
@@ -436,47 +614,29 @@ def modify_and_save_jp(_f, _savepath):
             # g.stroke("circular", _f.get('japanese_weight_add'), 'butt', 'round', 'removeinternal')
 
         # 個別の拡大縮小処理
-        width = None
-        if g.encoding in HALFWIDTH_CJK_KANA:
-            # 半角カナは半角へ
-            g.transform(JP_REDUCTION_MAT)  # いい塩梅で縮小
-            width = int(WIDTH//2)
-        elif g.encoding in FULLWIDTH_CODES:
-            # 全角文字は全角へ
+        # 罫線・ブロック要素はM+から持ってきたものなので縮小しない
+        if g.encoding not in RULED_LINES and g.encoding not in BLOCK_ELEMENTS:
             g.transform(JP_REDUCTION_MAT)  # いい塩梅で縮小
-            width = WIDTH
-        elif g.encoding in RULED_LINES:
-            width = int(WIDTH//2)
-        elif g.encoding in BLOCK_ELEMENTS:
-            # NOTE: M+で全角幅だったやつをいったん全角にしている
-            #       ░ LIGHT SHADE, ▒ MEDIUM SHADE, ▓ DARK SHADE
-            if g.encoding in [0x2591, 0x2592, 0x2593]:
-                width = int(WIDTH)
-            else:
-                width = int(WIDTH//2)
-        elif (
-            g.encoding in ROMAN_NUMERALS or
-            g.encoding in ARROWS or
-            g.encoding in SPECIAL_PUNCTUATION
-        ):
-            # ローマ数字は全角維持
-            g.transform(JP_REDUCTION_MAT)  # いい塩梅で縮小
-            width = WIDTH
-        else:
-            g.transform(JP_REDUCTION_MAT)  # いい塩梅で縮小
-            if g.width > WIDTH * 0.7:
-                width = WIDTH
-            else:
-                width = int(WIDTH//2)
+
+        # 半角・全角は width_policy の表（East_Asian_Width と data/width_overrides.txt）で決める
+        width, source = policy_width(g, policy)
+        # 字面が収まらなければ横に縮める（縮めた文字は scale 列に倍率が出る）
+        scale = fit_to_width(g, width)
+        report.append((g.unicode, g.glyphname, width // int(WIDTH//2), source, scale))
 
         # 幅の微調整(微妙に幅が違うやつがいるので)
-        if width is not None:
-            g = improved_width_adjustment(g, width)
+        g = improved_width_adjustment(g, width)
 
         if _f.get('italic'):
             # FIXME: 動作確認未
             g.transform(SKEW_MAT)
 
+    report_path = './tmp/width_policy_{}.tsv'.format(_f.get('name'))
+    mismatches = width_policy.write_report(report_path, [r for r in report if r[0] >= 0])
+    squeezed = sum(1 for r in report if r[4] != 1.0)
+    print('width policy: Unicode {}, {} glyphs differ from wcwidth, {} glyphs squeezed to fit (report: {})'.format(
+        policy.unicode_version, mismatches, squeezed, report_path))
+
     jp_font.save(_savepath)
     jp_font.close()
 
@@ -540,6 +700,186 @@ def fix_xAvgCharWidth(_src_ttf, _dst_ttf):
         os.remove(dst_root + '.ttx')
 
 
+def optimize_cmap(_fontpath):
+    '''連続するコードポイントが連続するグリフ番号になるよう並べ替え、cmapを小さくする
+    詳細は post_generate.py を参照
+    '''
+    if not OPTIMIZE_CMAP:
+        return
+    import post_generate
+
+    deco_print('optimize cmap: {}'.format(_fontpath))
+    post_generate.cmap(_fontpath)
+
+
+def optimize_hmtx(_fontpath):
+    '''送り幅が半角・全角だけであることを確かめ、hmtxのnumberOfHMetricsを減らす
+    詳細は post_generate.py を参照
+    '''
+    if not OPTIMIZE_HMTX:
+        return
+    import post_generate
+
+    deco_print('optimize hmtx: {}'.format(_fontpath))
+    try:
+        post_generate.hmtx(_fontpath, (int(WIDTH//2), WIDTH))
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+
+def check_terminal_widths(_fontpath):
+    '''送り幅を端末の文字幅表（glibc・xterm の wcwidth など）と比べ、表ごとの食い違いを報告する
+    ビルドは止めない。詳細は analysis/terminal_width_check.py を参照
+    '''
+    if not TERMINAL_WIDTH_TABLES:
+        return
+    import json
+    sys.path.insert(0, './analysis')
+    import terminal_width_check
+
+    deco_print('check terminal widths: {}'.format(_fontpath))
+    _, tables, results = terminal_width_check.check(_fontpath, TERMINAL_WIDTH_TABLES)
+    for table in tables:
+        result = results[table.name]
+        print('{:<12} known: {:>4}, unexpected: {:>4}'.format(
+            table.name, len(result['known']), len(result['unexpected'])))
+
+    name, _ = os.path.splitext(os.path.basename(_fontpath))
+    report_path = './tmp/terminal_widths_{}.json'.format(name)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(terminal_width_check.results_to_json(results), f, ensure_ascii=False, indent=1)
+    print('report: {}'.format(report_path))
+
+
+def add_device_tables(_fontpath):
+    '''hdmx・LTSH・VDMXを追加する（Windowsが送り幅を知るためにヒンティングしなくて済む）
+    詳細は post_generate.py を参照
+    '''
+    if not DEVICE_TABLE_PPEMS:
+        return
+    import post_generate
+
+    deco_print('add device tables: {}'.format(_fontpath))
+    try:
+        post_generate.tables(_fontpath, DEVICE_TABLE_PPEMS)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+
+def jis0208_codes():
+    """JIS X 0208 の文字のコードポイント（EUC-JPの2バイト領域を全て復号して求める）"""
+    codes = set()
+    for hi in range(0xA1, 0xFE+1):
+        for lo in range(0xA1, 0xFE+1):
+            try:
+                codes.add(ord(bytes([hi, lo]).decode('euc_jp')))
+            except UnicodeDecodeError:
+                pass
+    return codes
+
+
+def read_codepoint_file(_path):
+    """コードポイント一覧ファイルを読む（U+XXXX, U+XXXX-U+YYYY, 文字そのもの。#以降はコメント）"""
+    codes = set()
+    with open(_path, encoding='utf-8') as f:
+        for line in f:
+            for token in line.split('#', 1)[0].split():
+                if token.upper().startswith('U+'):
+                    start, _, end = token.upper().partition('-')
+                    start = int(start[2:], 16)
+                    end = int(end[2:], 16) if end else start
+                    codes.update(range(start, end+1))
+                else:
+                    codes.update(ord(c) for c in token)
+    return codes
+
+
+def subset_profile(_profile):
+    """プロファイル指定から (出力ディレクトリ名, 残す漢字のコードポイント) を返す
+
+    file: のファイルに漢字以外の文字があっても無視する（漢字以外はプロファイルによらずすべて残す）。
+    """
+    if _profile == 'jis0208':
+        return _profile, jis0208_codes() & CJK_IDEOGRAPH_CODES
+    if _profile.startswith('file:'):
+        path = _profile[len('file:'):]
+        name = os.path.splitext(os.path.basename(path))[0]
+        return name, read_codepoint_file(path) & CJK_IDEOGRAPH_CODES
+    raise ValueError('unknown subset profile: {}'.format(_profile))
+
+
+def subset_font(_fontpath, _codes, _profile):
+    '''生成したフォントから、漢字をプロファイルの範囲に絞った部分集合版を作る
+    cmap・hmtxなどはpyftsubsetが残したグリフに合わせて作り直す。
+    require: `sudo pip install fonttools` or `uv tool install fonttools`
+    '''
+    name, kanji = subset_profile(_profile)
+    keep = sorted(c for c in _codes if c not in CJK_IDEOGRAPH_CODES or c in kanji)
+
+    subset_dir = DIST + '/{}'.format(name)
+    os.makedirs(subset_dir, exist_ok=True)
+    subset_path = subset_dir + '/{}'.format(os.path.basename(_fontpath))
+    deco_print('subset {} ({}): {} -> {} chars'.format(_fontpath, name, len(_codes), len(keep)))
+
+    unicodes_path = './tmp/subset_{}.txt'.format(name)
+    with open(unicodes_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join('U+{:04X}'.format(c) for c in keep))
+
+    # レイアウト機能・名前・ヒンティングは元のフォントのまま残す
+    err = os.system('pyftsubset "' + _fontpath + '"'
+                    + ' --unicodes-file="' + unicodes_path + '"'
+                    + ' --output-file="' + subset_path + '"'
+                    + ' --layout-features="*" --name-IDs="*" --name-languages="*" --name-legacy'
+                    + ' --glyph-names --notdef-outline --notdef-glyph --hinting --legacy-kern')
+    if not DEBUG:
+        os.remove(unicodes_path)
+
+    if err != 0:
+        print('subset failed: {}'.format(subset_path))
+        return None
+
+    # 通常版と同時にインストールしても区別できるよう、ファミリー名にプロファイル名を加える
+    import post_generate
+    post_generate.rename(subset_path, name.upper())
+
+    # pyftsubsetはLTSHを落とすので作り直す
+    add_device_tables(subset_path)
+    return subset_path
+
+
+def build_ttc(_fontpath, _variant_paths):
+    '''通常版とバリエーションを1つの .ttc にまとめる（詳細は post_generate.py を参照）'''
+    import post_generate
+
+    ttc_path = os.path.splitext(_fontpath)[0] + '.ttc'
+    deco_print('build ttc: {}'.format(ttc_path))
+    try:
+        post_generate.ttc(ttc_path, [_fontpath] + _variant_paths)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+
+def generate_otf(_font, _fontpath):
+    '''TTFを出力したあとのフォントからCFF形式のOTFを出力する
+    3次ベジェに変換し、TrueType命令(autoInstr)ではなくPostScriptヒント(autoHint)を付け直す。
+    _font の輪郭は3次に変わるので、TTFの出力後に呼ぶこと。
+    '''
+    otfpath = os.path.splitext(_fontpath)[0] + '.otf'
+    deco_print('generate otf: {}'.format(otfpath))
+
+    _font.is_quadratic = False
+    _font.selection.all()
+    _font.round()
+    _font.autoHint()
+    _font.selection.none()
+
+    _font.generate(otfpath, flags=('opentype',))
+    return otfpath
+
+
 def build_font(_f):
 
     modify_and_save_latin(_f, EN_TEMP)
@@ -572,15 +912,34 @@ def build_font(_f):
     # 全角をいじるのはマージ前に行う
 
     target_font = post_process(target_font)
+    target_font = dedup_glyphs(target_font)
 
     fontpath = DIST + '/{}'.format(_f.get('filename'))
     if DEBUG:
         print_pdf(target_font, fontpath + '.pdf')
 
     target_font.generate(fontpath)
+    font_codes = [g.unicode for g in target_font.glyphs() if g.unicode >= 0]
+    if GENERATE_OTF:
+        otfpath = generate_otf(target_font, fontpath)
     target_font.close()
 
     fix_xAvgCharWidth(SOURCE + '/{}'.format(_f.get('japanese')), fontpath)
+    if GENERATE_OTF:
+        fix_xAvgCharWidth(SOURCE + '/{}'.format(_f.get('japanese')), otfpath)
+    optimize_cmap(fontpath)
+    optimize_hmtx(fontpath)
+    check_terminal_widths(fontpath)
+    add_device_tables(fontpath)
+
+    variant_paths = []
+    for profile in SUBSET_PROFILES:
+        subset_path = subset_font(fontpath, font_codes, profile)
+        if subset_path:
+            variant_paths.append(subset_path)
+
+    if BUILD_TTC and variant_paths:
+        build_ttc(fontpath, variant_paths)
 
     deco_print('Generate {} completed.'.format(_f.get('name')))
 
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文字幅の方針（半角・全角）をコードポイントごとに決める
+
+Unicode の East_Asian_Width と wcwidth（端末が文字に割り当てるセル数）を
+data/east_asian_width.txt に範囲ごとに書き出しておき、読み込み時に
+コードポイントを添字にした表へ展開する（1文字あたりの参照は O(1)）。
+Utatane として意図的に変えている文字は data/width_overrides.txt で上書きする。
+
+utatane.py の modify_and_save_jp() と analysis/font_analysis.py mismatch --against-policy が
+同じ表を使う。単体でも実行できる:
+
+    python width_policy.py generate                # data/east_asian_width.txt を作り直す
+    python width_policy.py show ─ … あ U+2591      # 文字ごとの分類と方針を表示
+
+標準ライブラリだけで動く（FontForge の Python からも読み込める）。
+"""
+
+import argparse
+import os
+import sys
+import unicodedata
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_PATH = os.path.join(BASE_DIR, 'data', 'east_asian_width.txt')
+OVERRIDES_PATH = os.path.join(BASE_DIR, 'data', 'width_overrides.txt')
+
+MAX_CODEPOINT = 0x10FFFF
+
+# East_Asian_Width の値（表では添字で持つ）
+EAW_CLASSES = ('N', 'Na', 'H', 'W', 'F', 'A')
+
+# 幅の決め方（適合レポートの source 列）
+SOURCE_OVERRIDE = 'override'  # data/width_overrides.txt
+SOURCE_EAW = 'eaw'            # East_Asian_Width / wcwidth
+SOURCE_GLYPH = 'glyph'        # 決まらないので元グリフの幅に従う
+
+
+def wcwidth(_code):
+    '''端末で使われる wcwidth() 相当のセル数（Markus Kuhn の実装と同じ規則）
+
+    NUL は 0、制御文字は -1、結合文字・書式制御文字・ハングル中声/終声は 0、
+    East_Asian_Width が W/F なら 2、それ以外は 1。
+    '''
+    if _code == 0:
+        return 0
+    ch = chr(_code)
+    category = unicodedata.category(ch)
+    if category == 'Cc':
+        return -1
+    if _code == 0x00AD:  # SOFT HYPHEN は表示される
+        return 1
+    if category in ('Mn', 'Me', 'Cf') or 0x1160 <= _code <= 0x11FF or _code == 0x200B:
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1
+
+
+def format_range(_start, _end):
+    if _start == _end:
+        return '{:04X}'.format(_start)
+    return '{:04X}..{:04X}'.format(_start, _end)
+
+
+def parse_range(_text):
+    '''"2500..257F" や "2591" を (開始, 終了) にする'''
+    start, _, end = _text.strip().partition('..')
+    return int(start, 16), int(end or start, 16)
+
+
+def generate_table(_path=TABLE_PATH):
+    '''実行中の Python の unicodedata から表を作り、範囲ごとにまとめて書き出す'''
+    runs = []
+    for code in range(MAX_CODEPOINT + 1):
+        key = (unicodedata.east_asian_width(chr(code)), wcwidth(code))
+        if runs and runs[-1][2] == key:
+            runs[-1][1] = code
+        else:
+            runs.append([code, code, key])
+
+    os.makedirs(os.path.dirname(_path), exist_ok=True)
+    tmp_path = _path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('# East_Asian_Width and wcwidth, Unicode {}\n'.format(unicodedata.unidata_version))
+        f.write('# generated by `python width_policy.py generate`. Do not edit.\n')
+        f.write('# range;East_Asian_Width;wcwidth\n')
+        for start, end, (eaw, cells) in runs:
+            f.write('{};{};{}\n'.format(format_range(start, end), eaw, cells))
+    os.replace(tmp_path, _path)
+    return len(runs)
+
+
+def read_overrides(_path=OVERRIDES_PATH):
+    '''上書き設定を読む -> [(開始, 終了, セル数)]
+
+    1行1範囲で「範囲;セル数」。# 以降はコメント。
+    '''
+    overrides = []
+    with open(_path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                code_range, cells = line.split(';')
+                start, end = parse_range(code_range)
+                cells = int(cells)
+            except ValueError:
+                raise ValueError('{}:{}: invalid line: {!r}'.format(_path, lineno, line))
+            if cells not in (1, 2) or not 0 <= start <= end <= MAX_CODEPOINT:
+                raise ValueError('{}:{}: invalid override: {!r}'.format(_path, lineno, line))
+            overrides.append((start, end, cells))
+    return overrides
+
+
+class WidthPolicy(object):
+    '''コードポイント -> East_Asian_Width・wcwidth・Utatane での幅（セル数）
+
+    表は bytearray 1つ（1コードポイント1バイト）:
+      bit 0-2: East_Asian_Width の添字, bit 3-4: wcwidth+1, bit 5-6: 上書きしたセル数
+    '''
+
+    def __init__(self, table_path=TABLE_PATH, overrides_path=OVERRIDES_PATH, ambiguous=None):
+        '''ambiguous: 上書きのない East_Asian_Width=A の文字のセル数（None なら元グリフの幅に従う）'''
+        self.ambiguous = ambiguous
+        self.unicode_version = None
+        self._table = bytearray(MAX_CODEPOINT + 1)
+
+        with open(table_path, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    if 'Unicode' in line and self.unicode_version is None:
+                        self.unicode_version = line.rsplit(' ', 1)[1].strip()
+                    continue
+                code_range, eaw, cells = line.rstrip('\n').split(';')
+                start, end = parse_range(code_range)
+                value = EAW_CLASSES.index(eaw) | (int(cells) + 1) << 3
+                self._table[start:end+1] = bytes((value,)) * (end - start + 1)
+
+        if overrides_path:
+            for start, end, cells in read_overrides(overrides_path):
+                for code in range(start, end + 1):
+                    self._table[code] = self._table[code] & 0x1F | cells << 5
+
+    def east_asian_width(self, _code):
+        return EAW_CLASSES[self._table[_code] & 0x07]
+
+    def wcwidth(self, _code):
+        return (self._table[_code] >> 3 & 0x03) - 1
+
+    def override(self, _code):
+        '''上書き設定のセル数（なければ None）'''
+        return self._table[_code] >> 5 or None
+
+    def decide(self, _code):
+        '''Utatane での幅 -> (セル数 1/2 または None, 決め方)
+
+        上書き設定があればそれに従う。East_Asian_Width=A は ambiguous に従う。
+        wcwidth が 0（結合文字など）や -1（制御文字）の文字はフォントの幅を決められないので
+        None（元グリフの幅に従う）とする。
+        '''
+        if _code is None or not 0 <= _code <= MAX_CODEPOINT:
+            return None, SOURCE_GLYPH
+        value = self._table[_code]
+        if value >> 5:
+            return value >> 5, SOURCE_OVERRIDE
+        if EAW_CLASSES[value & 0x07] == 'A':
+            if self.ambiguous is None:
+                return None, SOURCE_GLYPH
+            return self.ambiguous, SOURCE_EAW
+        cells = (value >> 3 & 0x03) - 1
+        if cells <= 0:
+            return None, SOURCE_GLYPH
+        return cells, SOURCE_EAW
+
+    def cells(self, _code):
+        '''Utatane での幅（セル数）。決まらなければ None'''
+        return self.decide(_code)[0]
+
+
+_default_policy = None
+
+
+def default_policy():
+    '''data/ の表と上書き設定から作った WidthPolicy（プロセス内で使い回す）'''
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = WidthPolicy()
+    return _default_policy
+
+
+def write_report(_path, _rows):
+    '''適合レポートを書き出す
+
+    _rows: [(コードポイント, グリフ名, 送り幅のセル数, 決め方, 横の倍率)]
+    端末の wcwidth と異なるセル数になった文字（mismatch 列）と、字面が送り幅に収まらず
+    横に縮めた文字（scale 列）を確認するためのもの。
+    '''
+    policy = default_policy()
+    mismatches = 0
+    with open(_path, 'w', encoding='utf-8') as f:
+        f.write('code\tglyph\teaw\twcwidth\tcells\tsource\tscale\tmismatch\n')
+        for code, name, cells, source, scale in sorted(_rows):
+            eaw = policy.east_asian_width(code)
+            expected = policy.wcwidth(code)
+            mismatch = expected > 0 and cells != expected
+            mismatches += mismatch
+            f.write('U+{:04X}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n'.format(
+                code, name, eaw, expected, cells, source,
+                '{:.2f}'.format(scale) if scale != 1.0 else '', 'x' if mismatch else ''))
+    return mismatches
+
+
+def parse_chars(_args):
+    '''"U+2591", "2591" 形式や文字そのものをコードポイントの列にする'''
+    codes = []
+    for arg in _args:
+        if arg.upper().startswith('U+'):
+            codes.append(int(arg[2:], 16))
+        else:
+            codes.extend(ord(ch) for ch in arg)
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文字幅の方針表（East_Asian_Width / wcwidth）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='unicodedata から表を作り直す')
+    generate_parser.add_argument('--output', default=TABLE_PATH, help='出力先')
+
+    show_parser = subparsers.add_parser('show', help='文字ごとの分類と方針を表示')
+    show_parser.add_argument('chars', nargs='+', help='文字または U+XXXX')
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        runs = generate_table(args.output)
+        print('{}: {} ranges (Unicode {})'.format(args.output, runs, unicodedata.unidata_version))
+    elif args.command == 'show':
+        policy = default_policy()
+        for code in parse_chars(args.chars):
+            cells, source = policy.decide(code)
+            print('U+{:04X} {} eaw={} wcwidth={} cells={} ({})'.format(
+                code, unicodedata.name(chr(code), '-'), policy.east_asian_width(code),
+                policy.wcwidth(code), cells if cells is not None else '-', source))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())